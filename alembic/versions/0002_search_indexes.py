@@ -0,0 +1,130 @@
+"""Search indexes
+
+Patient name search (a pg_trgm GIN index on PostgreSQL, an FTS5 trigram
+table on SQLite) and note content full-text search (a GIN index on the
+content's tsvector on PostgreSQL, an FTS5 table on SQLite).
+
+On PostgreSQL both indexes are built with CREATE INDEX CONCURRENTLY and no
+column is added, so the tables are neither rewritten nor locked against
+writes; a build that fails leaves an INVALID index to drop before running
+the upgrade again. On SQLite the FTS5 tables are kept in sync by triggers,
+filled from the existing rows when created, and skipped where SQLite lacks
+FTS5 (or, for names, the trigram tokenizer of SQLite 3.34+).
+
+The DDL is written out here rather than taken from app/models/search.py, so
+later changes there do not alter this revision.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:05:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+PATIENT_NAME_SEARCH_SQLITE = [
+    "CREATE VIRTUAL TABLE patients_fts USING fts5("
+    "name, content='patients', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER patients_fts_ai AFTER INSERT ON patients BEGIN "
+    "INSERT INTO patients_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER patients_fts_ad AFTER DELETE ON patients BEGIN "
+    "INSERT INTO patients_fts(patients_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER patients_fts_au AFTER UPDATE OF name ON patients BEGIN "
+    "INSERT INTO patients_fts(patients_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); "
+    "INSERT INTO patients_fts(rowid, name) VALUES (new.id, new.name); END",
+    # External-content tables start empty; index the rows already there
+    "INSERT INTO patients_fts(patients_fts) VALUES ('rebuild')",
+]
+
+NOTE_CONTENT_SEARCH_SQLITE = [
+    "CREATE VIRTUAL TABLE patient_notes_fts USING fts5("
+    "content, content='patient_notes', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER patient_notes_fts_ai AFTER INSERT ON patient_notes BEGIN "
+    "INSERT INTO patient_notes_fts(rowid, content) VALUES (new.id, new.content); "
+    "END",
+    "CREATE TRIGGER patient_notes_fts_ad AFTER DELETE ON patient_notes BEGIN "
+    "INSERT INTO patient_notes_fts(patient_notes_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER patient_notes_fts_au AFTER UPDATE OF content ON patient_notes "
+    "BEGIN "
+    "INSERT INTO patient_notes_fts(patient_notes_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); "
+    "INSERT INTO patient_notes_fts(rowid, content) VALUES (new.id, new.content); "
+    "END",
+    "INSERT INTO patient_notes_fts(patient_notes_fts) VALUES ('rebuild')",
+]
+
+SQLITE_SEARCH_TABLES = ("patients_fts", "patient_notes_fts")
+
+
+def _sqlite_search_statements() -> list[str]:
+    # Feature checks against the SQLite library the database is opened with
+    bind = op.get_bind()
+    options = {
+        row[0] for row in bind.exec_driver_sql("PRAGMA compile_options").fetchall()
+    }
+    if "ENABLE_FTS5" not in options:
+        return []
+    version = bind.exec_driver_sql("SELECT sqlite_version()").scalar()
+    statements = []
+    if tuple(int(part) for part in version.split(".")[:2]) >= (3, 34):
+        statements += PATIENT_NAME_SEARCH_SQLITE
+    return statements + NOTE_CONTENT_SEARCH_SQLITE
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        # CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            op.create_index(
+                "ix_patients_name_trgm",
+                "patients",
+                ["name"],
+                postgresql_using="gin",
+                postgresql_ops={"name": "gin_trgm_ops"},
+                postgresql_concurrently=True,
+            )
+            op.create_index(
+                "ix_patient_notes_content_tsv",
+                "patient_notes",
+                [sa.text("to_tsvector('english', content)")],
+                postgresql_using="gin",
+                postgresql_concurrently=True,
+            )
+    elif dialect == "sqlite":
+        for statement in _sqlite_search_statements():
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index(
+                "ix_patient_notes_content_tsv",
+                table_name="patient_notes",
+                postgresql_concurrently=True,
+            )
+            op.drop_index(
+                "ix_patients_name_trgm",
+                table_name="patients",
+                postgresql_concurrently=True,
+            )
+    elif dialect == "sqlite":
+        for table in SQLITE_SEARCH_TABLES:
+            # The triggers are on the content tables, so they go first
+            for suffix in ("ai", "ad", "au"):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {table}")
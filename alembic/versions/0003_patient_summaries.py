@@ -0,0 +1,41 @@
+"""Cached patient summaries
+
+The `patient_summaries` table behind the summary cache, and an index on
+patient_notes.patient_id for the per-patient note watermark it is checked
+against.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:10:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_patient_notes_patient_id", "patient_notes", ["patient_id"])
+    op.create_table(
+        "patient_summaries",
+        sa.Column("patient_id", sa.Integer(), nullable=False),
+        sa.Column("note_count", sa.Integer(), nullable=False),
+        sa.Column("max_note_id", sa.Integer(), nullable=True),
+        sa.Column("notes_updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("patient_info", sa.Text(), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=False),
+        sa.Column("generated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["patient_id"], ["patients.id"]),
+        sa.PrimaryKeyConstraint("patient_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("patient_summaries")
+    op.drop_index("ix_patient_notes_patient_id", table_name="patient_notes")
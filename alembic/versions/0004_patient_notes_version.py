@@ -0,0 +1,32 @@
+"""Patient notes version
+
+`patients.notes_version`, bumped by every note write so note list ETags can
+be checked without reading the notes.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 09:20:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A plain ALTER TABLE, not a batch copy, which would drop the search
+    # triggers defined on patients
+    op.add_column(
+        "patients",
+        sa.Column("notes_version", sa.Integer(), server_default="0", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("patients", "notes_version")
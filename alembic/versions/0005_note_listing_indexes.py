@@ -0,0 +1,72 @@
+"""Composite indexes for note listings
+
+One `(patient_id, <sort column> DESC, id DESC)` index per sort offered by
+GET /patients/{patient_id}/notes, plus `(patient_id, id)`, which replaces the
+single-column patient_id index. On PostgreSQL the indexes are built with
+CREATE INDEX CONCURRENTLY, so writes continue during the build; a build that
+fails leaves an INVALID index to drop before running the upgrade again.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+SORT_COLUMNS = ("timestamp", "created_at", "updated_at", "note_type")
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_patient_notes_patient_id_id",
+            "patient_notes",
+            ["patient_id", "id"],
+            postgresql_concurrently=True,
+        )
+        for column in SORT_COLUMNS:
+            op.create_index(
+                f"ix_patient_notes_patient_id_{column}",
+                "patient_notes",
+                [
+                    "patient_id",
+                    sa.text(f'"{column}" DESC'),
+                    sa.text("id DESC"),
+                ],
+                postgresql_concurrently=True,
+            )
+        op.drop_index(
+            "ix_patient_notes_patient_id",
+            table_name="patient_notes",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_patient_notes_patient_id",
+            "patient_notes",
+            ["patient_id"],
+            postgresql_concurrently=True,
+        )
+        for column in reversed(SORT_COLUMNS):
+            op.drop_index(
+                f"ix_patient_notes_patient_id_{column}",
+                table_name="patient_notes",
+                postgresql_concurrently=True,
+            )
+        op.drop_index(
+            "ix_patient_notes_patient_id_id",
+            table_name="patient_notes",
+            postgresql_concurrently=True,
+        )
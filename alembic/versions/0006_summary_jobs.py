@@ -0,0 +1,68 @@
+"""Summary jobs
+
+Table behind POST /patients/{id}/summary:generate, so queued summary jobs
+and their results survive restarts. A partial unique index allows one
+queued or running job per patient.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "summary_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("patient_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), server_default="queued", nullable=False),
+        sa.Column("priority", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("patient_info", sa.Text(), nullable=True),
+        sa.Column("summary", sa.Text(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=True,
+        ),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["patient_id"], ["patients.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_summary_jobs_id", "summary_jobs", ["id"])
+    op.create_index("ix_summary_jobs_patient_id", "summary_jobs", ["patient_id"])
+    op.create_index(
+        "ix_summary_jobs_status_priority_id",
+        "summary_jobs",
+        ["status", sa.text("priority DESC"), "id"],
+    )
+    active = sa.text("status IN ('queued', 'running')")
+    op.create_index(
+        "ix_summary_jobs_active_patient_id",
+        "summary_jobs",
+        ["patient_id"],
+        unique=True,
+        postgresql_where=active,
+        sqlite_where=active,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_summary_jobs_active_patient_id", table_name="summary_jobs")
+    op.drop_index("ix_summary_jobs_status_priority_id", table_name="summary_jobs")
+    op.drop_index("ix_summary_jobs_patient_id", table_name="summary_jobs")
+    op.drop_index("ix_summary_jobs_id", table_name="summary_jobs")
+    op.drop_table("summary_jobs")
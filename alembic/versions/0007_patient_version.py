@@ -0,0 +1,32 @@
+"""Patient version
+
+`patients.version`, bumped by every update to a patient so its ETag changes
+even when two updates land within the same `updated_at` second.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A plain ALTER TABLE, not a batch copy, which would drop the search
+    # triggers defined on patients
+    op.add_column(
+        "patients",
+        sa.Column("version", sa.Integer(), server_default="0", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("patients", "version")
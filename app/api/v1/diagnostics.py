@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.db.pool import pool_status
+from app.db.session import get_db
+
+router = APIRouter()
+
+
+@router.get("/pool", response_model=schemas.PoolStatus)
+async def get_pool_status(db: AsyncSession = Depends(get_db)):
+    """
+    Connection pool configuration and live usage: connections in use and idle,
+    overflow, checkout wait times and checkouts that timed out.
+    """
+    # The session's engine, without checking out a connection
+    return pool_status(db.get_bind().pool)
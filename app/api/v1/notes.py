@@ -1,9 +1,53 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File
+from datetime import datetime
+from typing import Any, AsyncIterator
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import asc, desc
 
 from app import crud, models, schemas
-from app.db.session import get_db
+from app.core.config import settings
+from app.core.exceptions import (
+    InvalidCursorException,
+    LLMUnavailableException,
+    UnsupportedUploadException,
+    UploadTooLargeException,
+)
+from app.core.jobs import summary_jobs
+from app.crud.pagination import Keyset
+from app.db.session import get_db, get_read_db
+from app.utils.ingest import (
+    NDJSON_TYPES,
+    RecordError,
+    batched,
+    iter_json_array,
+    iter_lines,
+    iter_ndjson_records,
+    until_error,
+)
+from app.utils.batch_get import parse_ids
+from app.utils.llm_client import llm_backend
+from app.utils.note_classifier import assign_note_types
+from app.utils.note_index import (
+    index_notes,
+    similar_to_note,
+    similar_to_text,
+    unindex_notes,
+)
+from app.utils.http_cache import etag_matches, make_etag, not_modified
+from app.utils.serialization import FastJSONResponse, rows_to_dicts
+from app.utils.upload import read_text_upload
 
 router = APIRouter()
 
@@ -15,67 +59,106 @@ async def create_patient_note(
     """
     Create a new note for a patient.
     """
-    # Verify that the patient exists
-    patient = await crud.patient.get(db, id=patient_id)
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
-
     # Ensure the patient_id in the path matches the one in the request body
     if note.patient_id != patient_id:
         raise HTTPException(
             status_code=400, detail="Patient ID in path does not match request body"
         )
 
-    return await crud.note.create(db, obj_in=note)
+    # Notes sent as "general" are typed from their content
+    await assign_note_types([note])
+
+    # The insert only happens if the patient exists
+    created = await crud.note.create_for_patient(db, obj_in=note)
+    if not created:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    await index_notes([(created.id, created.patient_id, created.content)])
+    return created
 
 
 @router.post("/patients/{patient_id}/notes/upload", response_model=schemas.PatientNote)
 async def upload_patient_note(
     patient_id: int,
     file: UploadFile = File(...),
-    note_type: str = "general",
+    note_type: str | None = Query(
+        None, description="Typed from the content when not given"
+    ),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Upload a note file for a patient.
-    Supports text files, PDFs, and other formats.
+    Supports plain-text files; the encoding is taken from a byte order mark or
+    the declared charset, else detected as UTF-8 with a Windows-1252 fallback.
     """
-    # Verify that the patient exists
-    patient = await crud.patient.get(db, id=patient_id)
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
-
     # Read the file content
-    content = await file.read()
-    content_str = content.decode("utf-8")
+    try:
+        content_str = await read_text_upload(
+            file,
+            max_bytes=settings.MAX_UPLOAD_BYTES,
+            chunk_size=settings.UPLOAD_CHUNK_BYTES,
+        )
+    except UploadTooLargeException as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedUploadException as e:
+        raise HTTPException(status_code=415, detail=str(e))
 
-    # Create a note object
+    # Create a note object, leaving note_type unset for the classifier when
+    # the client did not choose one
     note_data = schemas.PatientNoteCreate(
-        patient_id=patient_id, content=content_str, note_type=note_type
+        patient_id=patient_id,
+        content=content_str,
+        **({"note_type": note_type} if note_type is not None else {}),
     )
 
-    return await crud.note.create(db, obj_in=note_data)
+    await assign_note_types([note_data])
+
+    # The insert only happens if the patient exists
+    created = await crud.note.create_for_patient(db, obj_in=note_data)
+    if not created:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    await index_notes([(created.id, created.patient_id, created.content)])
+    return created
 
 
-@router.get("/patients/{patient_id}/notes", response_model=schemas.PaginatedNotes)
+@router.get(
+    "/patients/{patient_id}/notes",
+    response_model=schemas.PaginatedNotes,
+    response_class=FastJSONResponse,
+)
 async def list_patient_notes(
     patient_id: int,
-    db: AsyncSession = Depends(get_db),
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(
         50, ge=1, le=100, description="Maximum number of records to return"
     ),
     sort_by: str = Query("timestamp", description="Field to sort by"),
     sort_order: str = Query("desc", description="Sort order: asc or desc"),
+    cursor: str | None = Query(
+        None,
+        description="Opaque cursor from a previous page's next_cursor or prev_cursor",
+    ),
+    include_total: bool = Query(
+        True, description="Compute total and pages; false skips the count query"
+    ),
+    fields: str | None = Query(
+        None,
+        description="Comma-separated note fields to return; id and the sort "
+        "field are always included",
+    ),
+    excerpt_len: int | None = Query(
+        None, ge=1, description="Truncate content to this many characters"
+    ),
 ):
     """
     List all notes for a specific patient with pagination and sorting.
+    Pages can be addressed with `skip` or, for constant-cost deep paging, `cursor`.
+    `fields` limits the columns read and returned, and `excerpt_len` has the
+    database shorten content, for views that do not show whole notes.
+    Pages carry an ETag from the patient's notes version; a matching
+    If-None-Match is answered with 304.
     """
-    # Verify that the patient exists
-    patient = await crud.patient.get(db, id=patient_id)
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
-
     # Validate sort parameters
     valid_sort_fields = {"id", "timestamp", "created_at", "updated_at", "note_type"}
     if sort_by not in valid_sort_fields:
@@ -89,19 +172,278 @@ async def list_patient_notes(
             status_code=400, detail="Invalid sort order. Use 'asc' or 'desc'"
         )
 
-    # Build sort clause
-    sort_column = getattr(models.PatientNote, sort_by)
-    sort_clause = asc(sort_column) if sort_order == "asc" else desc(sort_column)
+    # Project onto the requested fields in schema order. Cursors are built
+    # from the id and sort key, so those are always selected
+    valid_fields = schemas.PatientNote.model_fields
+    if fields is None:
+        selected = set(valid_fields)
+    else:
+        selected = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = selected - set(valid_fields)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid fields {sorted(unknown)}. "
+                f"Valid fields: {list(valid_fields)}",
+            )
+        selected |= {"id", sort_by}
+
+    # Build keyset ordering, positioned after the cursor row if one was given
+    try:
+        keyset = Keyset(models.PatientNote, sort_by, sort_order, cursor=cursor)
+    except InvalidCursorException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The version probe doubles as the existence check. Read before the page,
+    # a concurrent write can only make the ETag older than the page
+    notes_version = await crud.patient.get_notes_version(db, id=patient_id)
+    if notes_version is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    # Caches key ETags by URL, so query parameters need not be part of it
+    etag = make_etag("notes", patient_id, notes_version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
     notes, total = await crud.note.get_multi_by_patient(
-        db, patient_id=patient_id, skip=skip, limit=limit, sort_clause=sort_clause
+        db,
+        patient_id=patient_id,
+        skip=skip,
+        limit=limit,
+        keyset=keyset,
+        include_total=include_total,
+        # Plain rows of the schema's columns, serialised without re-validation
+        columns=crud.note.listing_columns(
+            [name for name in valid_fields if name in selected],
+            excerpt_len=excerpt_len,
+        ),
+    )
+
+    # Calculate pagination info
+    pages = (total + limit - 1) // limit if total is not None else None
+    next_cursor, prev_cursor = keyset.cursors(notes, limit=limit, skip=skip)
+
+    # Same shape as schemas.PaginatedNotes, less any fields projected away
+    return FastJSONResponse(
+        {
+            "notes": rows_to_dicts(notes),
+            "total": total,
+            "page": None if keyset.has_cursor else (skip // limit) + 1,
+            "size": limit,
+            "pages": pages,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        },
+        headers={"ETag": etag},
+    )
+
+
+@router.get(
+    "/notes:batchGet",
+    response_model=schemas.NoteBatchGet,
+    response_class=FastJSONResponse,
+)
+async def batch_get_notes(
+    ids: list[str] = Query(..., description="Note ids, repeated or comma-separated"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Get many notes by id with one query, in the order requested.
+    Ids with no note are listed in `missing`.
+    """
+    ids = parse_ids(ids)
+    notes = await crud.note.get_many(
+        db, ids, columns=crud.note.columns_for(schemas.PatientNote)
+    )
+    found = {note.id for note in notes}
+    # Same shape as schemas.NoteBatchGet
+    return FastJSONResponse(
+        {
+            "notes": rows_to_dicts(notes),
+            "missing": [id for id in ids if id not in found],
+        }
+    )
+
+
+@router.get("/notes/search", response_model=schemas.NoteSearchResults)
+async def search_notes(
+    q: str = Query(..., min_length=1, description="Text to search note content for"),
+    patient_id: int | None = Query(None, description="Only this patient's notes"),
+    note_type: str | None = Query(None, description="Only notes of this type"),
+    start: datetime | None = Query(
+        None, description="Only notes at or after this time"
+    ),
+    end: datetime | None = Query(None, description="Only notes before this time"),
+    db: AsyncSession = Depends(get_read_db),
+    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    limit: int = Query(
+        20, ge=1, le=100, description="Maximum number of records to return"
+    ),
+    include_total: bool = Query(
+        True, description="Compute total and pages; false skips the count query"
+    ),
+):
+    """
+    Full-text search over clinical note content.
+    Results are ranked by relevance with matches highlighted in `snippet`.
+    """
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    hits, total = await crud.note.search(
+        db,
+        text=q,
+        patient_id=patient_id,
+        note_type=note_type,
+        start=start,
+        end=end,
+        skip=skip,
+        limit=limit,
+        include_total=include_total,
     )
 
     # Calculate pagination info
-    pages = (total + limit - 1) // limit
+    pages = (total + limit - 1) // limit if total is not None else None
+
+    return schemas.NoteSearchResults(
+        results=[
+            schemas.NoteSearchHit(
+                **schemas.PatientNote.model_validate(note).model_dump(),
+                rank=rank,
+                snippet=snippet,
+            )
+            for note, rank, snippet in hits
+        ],
+        total=total,
+        page=(skip // limit) + 1,
+        size=limit,
+        pages=pages,
+    )
+
 
-    return schemas.PaginatedNotes(
-        notes=notes, total=total, page=(skip // limit) + 1, size=limit, pages=pages
+@router.get("/notes/similar", response_model=schemas.SimilarNotes)
+async def find_similar_notes(
+    q: str = Query(..., min_length=1, description="Text to find similar notes to"),
+    patient_id: int | None = Query(None, description="Only this patient's notes"),
+    k: int = Query(
+        10, ge=1, le=settings.SIMILAR_NOTES_MAX_K, description="Notes to return"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    The notes whose content is most like the given text, across all patients
+    or one, best first by cosine similarity of their embeddings.
+    """
+    hits = await similar_to_text(q, k=k, patient_id=patient_id)
+    return await _similar_notes(db, hits)
+
+
+async def _similar_notes(
+    db: AsyncSession, hits: list[tuple[int, float]]
+) -> schemas.SimilarNotes:
+    # One IN query for the hits' notes; any deleted since they were indexed
+    # are left out
+    notes = await crud.note.get_many(db, [id for id, _ in hits])
+    scores = dict(hits)
+    return schemas.SimilarNotes(
+        results=[
+            schemas.SimilarNote(
+                **schemas.PatientNote.model_validate(note).model_dump(),
+                score=scores[note.id],
+            )
+            for note in notes
+        ]
+    )
+
+
+@router.post("/notes/batch", response_model=schemas.NoteBatchResult)
+async def create_notes_batch(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Create notes for any number of patients in one request.
+    Accepts a JSON array of notes, committed together, or an NDJSON stream,
+    committed in chunks. Failed items are reported without aborting the batch.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+    result = schemas.NoteBatchResult(created=[], failed=[])
+
+    if media_type in NDJSON_TYPES:
+        # A stream that becomes unreadable is reported as a failed item after
+        # the notes read before it
+        records = until_error(iter_ndjson_records(iter_lines(request.stream())))
+        async for chunk in batched(records, settings.NOTE_BATCH_CHUNK_SIZE):
+            # Rows are numbered from 1, indexes from 0
+            await _create_note_chunk(
+                db, [(row - 1, record) for row, record in chunk], result
+            )
+        return result
+
+    if media_type != "application/json":
+        raise HTTPException(
+            status_code=415,
+            detail="Send a JSON array (application/json) or NDJSON "
+            "(application/x-ndjson)",
+        )
+    # The array is decoded as it arrives, so an oversized batch is refused
+    # without reading the rest of it
+    items = []
+    try:
+        async for item in iter_json_array(request.stream()):
+            if len(items) == settings.NOTE_BATCH_MAX_ITEMS:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"At most {settings.NOTE_BATCH_MAX_ITEMS} notes per batch",
+                )
+            items.append(item)
+    except RecordError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await _create_note_chunk(db, list(enumerate(items)), result)
+    return result
+
+
+async def _create_note_chunk(
+    db: AsyncSession,
+    items: list[tuple[int, Any]],
+    result: schemas.NoteBatchResult,
+) -> None:
+    """
+    Validate and insert one chunk of batch items, recording the outcome of each.
+    """
+    valid: list[tuple[int, schemas.PatientNoteCreate]] = []
+    for index, item in items:
+        if isinstance(item, RecordError):
+            result.failed.append(
+                schemas.NoteBatchFailed(index=index, errors=[str(item)])
+            )
+            continue
+        try:
+            valid.append((index, schemas.PatientNoteCreate.model_validate(item)))
+        except ValidationError as e:
+            errors = [
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                for error in e.errors()
+            ]
+            result.failed.append(schemas.NoteBatchFailed(index=index, errors=errors))
+
+    # One IN query checks every referenced patient
+    existing = await crud.patient.get_existing_ids(
+        db, (note.patient_id for _, note in valid)
+    )
+    to_create = []
+    for index, note in valid:
+        if note.patient_id in existing:
+            to_create.append((index, note))
+        else:
+            result.failed.append(
+                schemas.NoteBatchFailed(index=index, errors=["Patient not found"])
+            )
+
+    # The whole chunk is classified in one batch
+    await assign_note_types([note for _, note in to_create])
+    ids = await crud.note.create_many(db, objs_in=[note for _, note in to_create])
+    for (index, _), id in zip(to_create, ids):
+        result.created.append(schemas.NoteBatchCreated(index=index, id=id))
+    await index_notes(
+        [(id, note.patient_id, note.content) for (_, note), id in zip(to_create, ids)]
     )
 
 
@@ -109,22 +451,72 @@ async def list_patient_notes(
     "/patients/{patient_id}/notes/{note_id}", response_model=schemas.PatientNote
 )
 async def get_patient_note(
-    patient_id: int, note_id: int, db: AsyncSession = Depends(get_db)
+    patient_id: int,
+    note_id: int,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Get a specific note for a patient.
+    Responses carry an ETag; a matching If-None-Match is answered with 304.
     """
-    # Verify that the patient exists
-    patient = await crud.patient.get(db, id=patient_id)
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
+    # A conditional request is settled by probing the timestamps alone
+    if if_none_match:
+        modified = await crud.note.get_modified_for_patient(
+            db, id=note_id, patient_id=patient_id
+        )
+        if modified is None:
+            await _raise_note_not_found(db, patient_id)
+        etag = make_etag("note", note_id, *modified)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+    # Get the note, only if it belongs to the specified patient
+    note = await crud.note.get_for_patient(db, id=note_id, patient_id=patient_id)
+    if not note:
+        await _raise_note_not_found(db, patient_id)
+
+    response.headers["ETag"] = make_etag(
+        "note", note.id, note.created_at, note.updated_at
+    )
+    return note
 
-    # Get the note and verify it belongs to the specified patient
-    note = await crud.note.get(db, id=note_id)
-    if not note or note.patient_id != patient_id:
-        raise HTTPException(status_code=404, detail="Note not found for this patient")
 
-    return note
+@router.get(
+    "/patients/{patient_id}/notes/{note_id}/similar",
+    response_model=schemas.SimilarNotes,
+)
+async def find_notes_similar_to_note(
+    patient_id: int,
+    note_id: int,
+    scope: str = Query(
+        "patient", description="Search the patient's notes or all notes: patient or all"
+    ),
+    k: int = Query(
+        10, ge=1, le=settings.SIMILAR_NOTES_MAX_K, description="Notes to return"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    The notes most like this one, from the patient's history or the whole
+    population, best first by cosine similarity of their embeddings.
+    """
+    if scope not in {"patient", "all"}:
+        raise HTTPException(
+            status_code=400, detail="Invalid scope. Use 'patient' or 'all'"
+        )
+    note = await crud.note.get_for_patient(db, id=note_id, patient_id=patient_id)
+    if not note:
+        await _raise_note_not_found(db, patient_id)
+
+    hits = await similar_to_note(
+        note.id,
+        note.content,
+        k=k,
+        patient_id=patient_id if scope == "patient" else None,
+    )
+    return await _similar_notes(db, hits)
 
 
 @router.delete("/patients/{patient_id}/notes/{note_id}")
@@ -134,39 +526,161 @@ async def delete_patient_note(
     """
     Delete a specific note for a patient.
     """
-    # Verify that the patient exists
-    patient = await crud.patient.get(db, id=patient_id)
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
-
-    # Get the note and verify it belongs to the specified patient
-    note = await crud.note.get(db, id=note_id)
-    if not note or note.patient_id != patient_id:
-        raise HTTPException(status_code=404, detail="Note not found for this patient")
+    # Delete the note, only if it belongs to the specified patient
+    note = await crud.note.remove_for_patient(db, id=note_id, patient_id=patient_id)
+    if not note:
+        await _raise_note_not_found(db, patient_id)
+    await unindex_notes([note_id])
 
-    await crud.note.remove(db, id=note_id)
     return {"message": "Note deleted successfully"}
 
 
+async def _raise_note_not_found(db: AsyncSession, patient_id: int) -> None:
+    # Tell a missing patient from a note that is not theirs
+    if not await crud.patient.exists(db, id=patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    raise HTTPException(status_code=404, detail="Note not found for this patient")
+
+
 @router.get("/patients/{patient_id}/summary", response_model=schemas.PatientSummary)
 async def get_patient_summary(patient_id: int, db: AsyncSession = Depends(get_db)):
     """
     Generate a summary for a patient based on their notes.
+    Summaries are cached until the patient's notes or details change.
     """
-    # Verify that the patient exists
-    patient = await crud.patient.get(db, id=patient_id)
-    if not patient:
+    # Patient and note watermark in one query, which is also the existence check
+    found = await crud.summary.get_watermark(db, patient_id=patient_id)
+    if not found:
         raise HTTPException(status_code=404, detail="Patient not found")
-
-    # Get all notes for the patient
-    notes, _ = await crud.note.get_multi_by_patient(
-        db, patient_id=patient_id, limit=None
-    )
+    patient, watermark = found
 
     # Import the summary generation function
     from app.utils.llm_summary import generate_patient_summary_with_llm
 
-    # Generate summary using the utility function
-    summary_result = await generate_patient_summary_with_llm(patient, notes)
+    # Serve the cached summary, generating it only if the notes changed
+    try:
+        return await crud.summary.get_or_generate(
+            db,
+            patient=patient,
+            watermark=watermark,
+            generate=generate_patient_summary_with_llm,
+        )
+    except LLMUnavailableException as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def _sse_event(event: str, data: str) -> str:
+    # Multi-line data is sent as one "data:" field per line
+    lines = "".join(f"data: {line}\n" for line in data.split("\n"))
+    return f"event: {event}\n{lines}\n"
+
+
+def _sse_response(events: AsyncIterator[tuple[str, str]]) -> StreamingResponse:
+    async def body():
+        try:
+            async for event, text in events:
+                yield _sse_event(event, text)
+            yield _sse_event("done", "")
+        finally:
+            # Also when the client goes away mid-stream
+            await events.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
-    return summary_result
+@router.post(
+    "/patients/{patient_id}/summary:generate",
+    response_model=schemas.SummaryJob,
+    status_code=202,
+)
+async def generate_patient_summary(
+    patient_id: int,
+    response: Response,
+    priority: int = Query(0, description="Jobs with higher priority run first"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Queue the patient's summary for generation in the background and return
+    the job; poll GET /summary-jobs/{id} for its status and result. While a
+    job for the patient is queued or running, that job is returned instead.
+    """
+    if not await crud.patient.exists(db, id=patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    # Checked before a job is stored, so none is left queued with no worker
+    if not summary_jobs.running:
+        raise HTTPException(status_code=503, detail="Summary jobs are not running")
+
+    job = await crud.summary_job.get_active_for_patient(db, patient_id=patient_id)
+    while job is None:
+        job = await crud.summary_job.create(
+            db, patient_id=patient_id, priority=priority
+        )
+        if job is not None:
+            summary_jobs.submit(job.id, job.priority, db.bind)
+        else:
+            # A concurrent request queued one first
+            job = await crud.summary_job.get_active_for_patient(
+                db, patient_id=patient_id
+            )
+    response.headers["Location"] = f"{settings.API_V1_STR}/summary-jobs/{job.id}"
+    return job
+
+
+# Jobs change state within seconds, so they are read from the primary
+@router.get("/summary-jobs/{job_id}", response_model=schemas.SummaryJob)
+async def get_summary_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Status of a summary job, with the summary once it has succeeded.
+    """
+    job = await crud.summary_job.get(db, id=job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Summary job not found")
+    return job
+
+
+@router.get("/patients/{patient_id}/summary/stream")
+async def stream_patient_summary(
+    patient_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    primary_db: AsyncSession = Depends(get_db),
+):
+    """
+    Stream a summary for a patient as Server-Sent Events.
+    Sections are sent as they are produced, and timeline entries as notes are
+    read from the database in timestamp order, followed by a "done" event.
+    With a model backend the stream carries the summary GET /summary returns.
+    """
+    # Import the summary generation functions
+    from app.utils.llm_summary import (
+        stream_patient_summary_with_llm,
+        summary_events,
+    )
+
+    if llm_backend() != "mock":
+        # The model writes the summary whole, so send the cached or newly
+        # generated one (stored on the primary) rather than the mock's text
+        summary = await get_patient_summary(patient_id, primary_db)
+        return _sse_response(summary_events(summary))
+
+    # Patient and note count in one query, which is also the existence check
+    found = await crud.summary.get_watermark(db, patient_id=patient_id)
+    if not found:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    patient, watermark = found
+
+    async def events():
+        notes = crud.note.stream_by_patient(db, patient_id=patient_id)
+        try:
+            async for event in stream_patient_summary_with_llm(
+                patient, watermark.note_count, notes
+            ):
+                yield event
+        finally:
+            await notes.aclose()
+
+    return _sse_response(events())
@@ -1,27 +1,76 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+import json
+import tempfile
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import asc, desc
 
 from app import crud, models, schemas
-from app.db.session import get_db
+from app.core.config import settings
+from app.core.exceptions import InvalidCursorException
+from app.crud.pagination import Keyset
+from app.db.session import get_db, get_read_db
+from app.utils.http_cache import etag_matches, make_etag, not_modified
+from app.utils.batch_get import parse_ids
+from app.utils.note_index import unindex_patient
+from app.utils.serialization import FastJSONResponse, rows_to_dicts
+from app.utils.ingest import (
+    CSV_TYPES,
+    NDJSON_TYPES,
+    RecordError,
+    batched,
+    iter_csv_records,
+    iter_lines,
+    iter_ndjson_records,
+)
 
 router = APIRouter()
 
+# Import reports stay in memory up to this size, then spill to a temp file
+IMPORT_REPORT_SPOOL_BYTES = 1024 * 1024
+
 
-@router.get("/", response_model=schemas.PaginatedPatients)
+@router.get(
+    "/", response_model=schemas.PaginatedPatients, response_class=FastJSONResponse
+)
 async def list_patients(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(
         50, ge=1, le=100, description="Maximum number of records to return"
     ),
-    sort_by: str = Query("id", description="Field to sort by"),
+    sort_by: str | None = Query(
+        None,
+        description="Field to sort by; defaults to relevance when searching, else id",
+    ),
     sort_order: str = Query("asc", description="Sort order: asc or desc"),
     search: str | None = Query(None, description="Search term for patient name"),
+    cursor: str | None = Query(
+        None,
+        description="Opaque cursor from a previous page's next_cursor or prev_cursor",
+    ),
+    include_total: bool = Query(
+        True, description="Compute total and pages; false skips the count query"
+    ),
+    include: str | None = Query(
+        None, description="'notes' to embed each patient's latest notes"
+    ),
+    notes_limit: int = Query(
+        5, ge=1, le=50, description="Notes per patient with include=notes"
+    ),
 ):
     """
     Retrieve patients with pagination, sorting, and optional search.
+    Pages can be addressed with `skip` or, for constant-cost deep paging, `cursor`.
+    Search results are ranked by relevance unless another sort is requested.
+    With include=notes each patient carries their latest `notes_limit` notes
+    (as in schemas.PatientWithNotes), read for the whole page in one query.
     """
+    if sort_by is None:
+        sort_by = "relevance" if search else "id"
+
     # Validate sort parameters
     valid_sort_fields = {
         "id",
@@ -30,7 +79,16 @@ async def list_patients(
         "medical_record_number",
         "created_at",
     }
-    if sort_by not in valid_sort_fields:
+    if sort_by == "relevance":
+        if not search:
+            raise HTTPException(
+                status_code=400, detail="Sorting by relevance requires a search term"
+            )
+        if cursor:
+            raise HTTPException(
+                status_code=400, detail="Relevance-ranked results use skip, not cursor"
+            )
+    elif sort_by not in valid_sort_fields:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid sort field. Valid fields: {valid_sort_fields}",
@@ -41,39 +99,122 @@ async def list_patients(
             status_code=400, detail="Invalid sort order. Use 'asc' or 'desc'"
         )
 
-    # Build sort clause
-    sort_column = getattr(models.Patient, sort_by)
-    sort_clause = asc(sort_column) if sort_order == "asc" else desc(sort_column)
+    includes = {name.strip() for name in (include or "").split(",") if name.strip()}
+    if includes - {"notes"}:
+        raise HTTPException(
+            status_code=400, detail="Invalid include. Valid includes: {'notes'}"
+        )
 
-    # Build search filter
-    search_filter = None
-    if search:
-        search_filter = models.Patient.name.ilike(f"%{search}%")
+    # Build keyset ordering, positioned after the cursor row if one was given
+    keyset = None
+    if sort_by != "relevance":
+        try:
+            keyset = Keyset(models.Patient, sort_by, sort_order, cursor=cursor)
+        except InvalidCursorException as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
+    # Plain rows of the schema's columns, serialised without re-validation.
+    # Cursors are built from the id and sort key, so those are always selected
+    columns = crud.patient.columns_for(schemas.Patient)
+    if keyset is not None and keyset.sort_by not in schemas.Patient.model_fields:
+        columns.append(keyset.column)
     patients, total = await crud.patient.get_multi_with_filter(
-        db, skip=skip, limit=limit, sort_clause=sort_clause, search_filter=search_filter
+        db,
+        skip=skip,
+        limit=limit,
+        search=search,
+        keyset=keyset,
+        include_total=include_total,
+        columns=columns,
     )
 
     # Calculate pagination info
-    pages = (total + limit - 1) // limit
-
-    return schemas.PaginatedPatients(
-        patients=patients,
-        total=total,
-        page=(skip // limit) + 1,
-        size=limit,
-        pages=pages,
+    pages = (total + limit - 1) // limit if total is not None else None
+    next_cursor, prev_cursor = None, None
+    if keyset is not None:
+        next_cursor, prev_cursor = keyset.cursors(patients, limit=limit, skip=skip)
+
+    items = rows_to_dicts(patients)
+    for item in items:
+        # Drop a sort key that is not part of the schema
+        for name in item.keys() - schemas.Patient.model_fields.keys():
+            del item[name]
+    if "notes" in includes:
+        # One windowed query for the page, never a query per patient
+        notes = await crud.note.get_latest_for_patients(
+            db,
+            patient_ids=[item["id"] for item in items],
+            limit=notes_limit,
+            columns=crud.note.columns_for(schemas.PatientNote),
+        )
+        for item in items:
+            item["notes"] = rows_to_dicts(notes.get(item["id"], []))
+
+    # Same shape as schemas.PaginatedPatients
+    return FastJSONResponse(
+        {
+            "patients": items,
+            "total": total,
+            "page": None if cursor else (skip // limit) + 1,
+            "size": limit,
+            "pages": pages,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        }
+    )
+
+
+@router.get(
+    ":batchGet",
+    response_model=schemas.PatientBatchGet,
+    response_class=FastJSONResponse,
+)
+async def batch_get_patients(
+    ids: list[str] = Query(..., description="Patient ids, repeated or comma-separated"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Get many patients by id with one query, in the order requested.
+    Ids with no patient are listed in `missing`.
+    """
+    ids = parse_ids(ids)
+    patients = await crud.patient.get_many(
+        db, ids, columns=crud.patient.columns_for(schemas.Patient)
+    )
+    found = {patient.id for patient in patients}
+    # Same shape as schemas.PatientBatchGet
+    return FastJSONResponse(
+        {
+            "patients": rows_to_dicts(patients),
+            "missing": [id for id in ids if id not in found],
+        }
     )
 
 
 @router.get("/{id}", response_model=schemas.Patient)
-async def get_patient(id: int, db: AsyncSession = Depends(get_db)):
+async def get_patient(
+    id: int,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+):
     """
     Get a specific patient by ID.
+    Responses carry an ETag; a matching If-None-Match is answered with 304.
     """
+    # A conditional request is settled by probing the version alone
+    if if_none_match:
+        version = await crud.patient.get_version(db, id=id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        etag = make_etag("patient", id, version)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
     patient = await crud.patient.get(db, id=id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
+    response.headers["ETag"] = make_etag("patient", patient.id, patient.version)
     return patient
 
 
@@ -97,6 +238,103 @@ async def create_patient(
     return await crud.patient.create(db, obj_in=patient)
 
 
+@router.post("/bulk")
+async def bulk_import_patients(
+    request: Request,
+    chunk_size: int | None = Query(
+        None, ge=1, le=5000, description="Rows per INSERT and commit"
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Import patients from a streamed NDJSON or CSV request body.
+    Rows are validated and inserted in chunks. The response is an NDJSON report
+    with one line per row (accepted, duplicate or invalid) and a final summary.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+    lines = iter_lines(request.stream())
+    if media_type in NDJSON_TYPES:
+        records = iter_ndjson_records(lines)
+    elif media_type in CSV_TYPES:
+        records = iter_csv_records(lines)
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported media type. Use one of: "
+            f"{sorted(NDJSON_TYPES | CSV_TYPES)}",
+        )
+
+    # The report grows with the input, so it is spooled rather than held
+    report = tempfile.SpooledTemporaryFile(max_size=IMPORT_REPORT_SPOOL_BYTES)
+    summary: dict[str, Any] = {"accepted": 0, "duplicate": 0, "invalid": 0}
+    try:
+        async for chunk in batched(
+            records, chunk_size or settings.BULK_IMPORT_CHUNK_SIZE
+        ):
+            for entry in await _import_patient_chunk(db, chunk):
+                summary[entry["status"]] += 1
+                report.write(json.dumps(entry).encode() + b"\n")
+    except RecordError as e:
+        # The stream itself is unreadable; rows before it were still imported
+        summary["error"] = str(e)
+    report.write(json.dumps({"summary": summary}).encode() + b"\n")
+    report.seek(0)
+
+    def stream_report():
+        with report:
+            while block := report.read(64 * 1024):
+                yield block
+
+    return StreamingResponse(stream_report(), media_type="application/x-ndjson")
+
+
+async def _import_patient_chunk(
+    db: AsyncSession, chunk: list[tuple[int, dict[str, Any] | RecordError]]
+) -> list[dict[str, Any]]:
+    """
+    Validate and insert one chunk of import rows, returning their report entries.
+    """
+    entries: dict[int, dict[str, Any]] = {}
+    valid: list[tuple[int, schemas.PatientCreate]] = []
+    seen_mr_numbers = set()
+    for row, record in chunk:
+        if isinstance(record, RecordError):
+            entries[row] = {"row": row, "status": "invalid", "errors": [str(record)]}
+            continue
+        try:
+            patient = schemas.PatientCreate.model_validate(record)
+        except ValidationError as e:
+            errors = [
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                for error in e.errors()
+            ]
+            entries[row] = {"row": row, "status": "invalid", "errors": errors}
+            continue
+        # Repeats within the chunk are duplicates of the first occurrence
+        if patient.medical_record_number in seen_mr_numbers:
+            entries[row] = {
+                "row": row,
+                "status": "duplicate",
+                "medical_record_number": patient.medical_record_number,
+            }
+            continue
+        seen_mr_numbers.add(patient.medical_record_number)
+        valid.append((row, patient))
+
+    inserted = await crud.patient.create_many(
+        db, objs_in=[patient for _, patient in valid]
+    )
+    for row, patient in valid:
+        mr_number = patient.medical_record_number
+        entries[row] = {"row": row, "medical_record_number": mr_number}
+        if mr_number in inserted:
+            entries[row].update(status="accepted", id=inserted[mr_number])
+        else:
+            entries[row]["status"] = "duplicate"
+
+    return [entries[row] for row in sorted(entries)]
+
+
 @router.put("/{id}", response_model=schemas.Patient)
 async def update_patient(
     id: int, patient_in: schemas.PatientUpdate, db: AsyncSession = Depends(get_db)
@@ -104,12 +342,10 @@ async def update_patient(
     """
     Update an existing patient.
     """
-    patient = await crud.patient.get(db, id=id)
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
-
     # Update the patient
-    updated_patient = await crud.patient.update(db, db_obj=patient, obj_in=patient_in)
+    updated_patient = await crud.patient.update_by_id(db, id=id, obj_in=patient_in)
+    if not updated_patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
     return updated_patient
 
 
@@ -118,9 +354,9 @@ async def delete_patient(id: int, db: AsyncSession = Depends(get_db)):
     """
     Delete a patient.
     """
-    patient = await crud.patient.get(db, id=id)
+    patient = await crud.patient.remove(db, id=id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
+    await unindex_patient(id)
 
-    await crud.patient.remove(db, id=id)
     return {"message": "Patient deleted successfully"}
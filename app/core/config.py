@@ -18,6 +18,96 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "postgres"
     POSTGRES_DB: str = "healthcare_db"
     SQLALCHEMY_DATABASE_URI: str | None = None
+    # Read replicas for read-only endpoints. After a write a client reads from
+    # the primary for REPLICA_STICKY_SECONDS; a replica that fails to connect
+    # is skipped for REPLICA_RETRY_SECONDS
+    SQLALCHEMY_REPLICA_URIS: list[str] = []
+    REPLICA_STICKY_SECONDS: float = 5.0
+    REPLICA_RETRY_SECONDS: float = 30.0
+
+    # Connection pool of the shared engine (app/db/base.py). Recycle is in
+    # seconds, -1 to never recycle; the statement cache applies to asyncpg and
+    # must be 0 behind PgBouncer in transaction mode
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    # Per-request SQL instrumentation: statements slower than SLOW_QUERY_MS are
+    # logged, statements run QUERY_REPEAT_THRESHOLD+ times in one request are
+    # flagged as likely N+1, and QUERY_STATS_HEADER adds the request's query
+    # count and time as response headers (for debugging)
+    SLOW_QUERY_MS: float = 200.0
+    QUERY_REPEAT_THRESHOLD: int = 5
+    QUERY_STATS_HEADER: bool = False
+
+    # List totals: "exact", "cached" or "estimated" (see app/crud/count.py)
+    LIST_COUNT_STRATEGY: str = "cached"
+    COUNT_CACHE_TTL_SECONDS: float = 30.0
+    COUNT_ESTIMATE_MIN_ROWS: int = 10000
+
+    # Rows per multi-row INSERT (and commit) for bulk imports
+    BULK_IMPORT_CHUNK_SIZE: int = 1000
+    # Most notes accepted in one JSON array, and notes per commit for NDJSON
+    NOTE_BATCH_MAX_ITEMS: int = 1000
+    NOTE_BATCH_CHUNK_SIZE: int = 500
+    # Most ids accepted by one patients:batchGet or notes:batchGet request
+    BATCH_GET_MAX_IDS: int = 100
+
+    # Note file uploads: largest file accepted, size past which the multipart
+    # parser spools a file to disk, and the chunk size uploads are read in
+    MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024
+    UPLOAD_SPOOL_BYTES: int = 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 64 * 1024
+
+    # Seconds browsers may reuse an ETagged patient or note response before
+    # revalidating it; 0 revalidates on every use
+    HTTP_CACHE_MAX_AGE: int = 0
+
+    # Patient summaries kept in the in-process LRU in front of patient_summaries
+    SUMMARY_CACHE_SIZE: int = 1024
+    # Notes longer than SUMMARY_CHUNK_TOKENS are summarised in chunks of that
+    # many (estimated) tokens, SUMMARY_MAP_CONCURRENCY at a time, and the
+    # chunk summaries combined; SUMMARY_CHUNK_CACHE_SIZE chunk summaries are
+    # kept in process so only changed chunks are summarised again
+    SUMMARY_CHUNK_TOKENS: int = 3000
+    SUMMARY_MAP_CONCURRENCY: int = 4
+    SUMMARY_CHUNK_CACHE_SIZE: int = 10000
+
+    # Background summary jobs: generations run at once by the worker pool, and
+    # how long one may run before it fails (and, after a restart, before a job
+    # left running is considered abandoned and queued again)
+    SUMMARY_JOB_WORKERS: int = 4
+    SUMMARY_JOB_TIMEOUT_SECONDS: float = 300.0
+
+    # Notes created without a type (or as "general") are typed from their
+    # content by the classifier in app/utils/note_classifier.py, on
+    # NOTE_CLASSIFIER_WORKERS threads; notes scoring below
+    # NOTE_CLASSIFIER_MIN_SCORE stay "general". NOTE_CLASSIFIER_MODEL_PATH
+    # loads a saved model (.npz) instead of the built-in one, and the backfill
+    # reclassifies NOTE_CLASSIFIER_BACKFILL_CHUNK_SIZE notes per commit
+    NOTE_CLASSIFIER_ENABLED: bool = True
+    NOTE_CLASSIFIER_WORKERS: int = 2
+    NOTE_CLASSIFIER_MIN_SCORE: float = 0.2
+    NOTE_CLASSIFIER_MODEL_PATH: str | None = None
+    NOTE_CLASSIFIER_BACKFILL_CHUNK_SIZE: int = 1000
+
+    # Similar-note search: notes are embedded by NOTE_EMBEDDER into
+    # NOTE_EMBEDDING_DIM dimensions and kept in an in-process vector index,
+    # memory-mapped from NOTE_INDEX_PATH (a directory) so a restart only embeds
+    # notes added meanwhile, NOTE_INDEX_SYNC_CHUNK_SIZE at a time
+    NOTE_INDEX_ENABLED: bool = True
+    NOTE_EMBEDDER: str = "hashed-ngram"
+    NOTE_EMBEDDING_DIM: int = 256
+    NOTE_INDEX_PATH: str | None = "note_index"
+    NOTE_INDEX_SYNC_CHUNK_SIZE: int = 1000
+    SIMILAR_NOTES_MAX_K: int = 50
+
+    # Patient name and note content search: "auto" picks trigram/tsvector
+    # (Postgres) or fts5 (SQLite), "ilike" forces the unindexed substring match
+    SEARCH_BACKEND: str = "auto"
 
     # CORS
     BACKEND_CORS_ORIGINS: list[str] = []
@@ -25,6 +115,55 @@ class Settings(BaseSettings):
     # LLM settings for summary generation
     OPENAI_API_KEY: str | None = None
     LLM_MODEL: str = "gpt-3.5-turbo"
+    # Seconds the built-in mock generator waits to stand in for a model call,
+    # for load testing without an LLM
+    LLM_MOCK_LATENCY_SECONDS: float = 0.0
+    # "auto" calls the OpenAI-compatible API at LLM_BASE_URL when
+    # OPENAI_API_KEY is set and uses the built-in mock otherwise; "fake" sends
+    # the same requests to an in-process fake server, for testing offline
+    LLM_BACKEND: str = "auto"
+    LLM_BASE_URL: str = "https://api.openai.com/v1"
+    # Per-attempt timeout and retries after a timeout, connection error, 429 or
+    # 5xx, backing off exponentially (with full jitter) from
+    # LLM_RETRY_BACKOFF_SECONDS up to LLM_RETRY_MAX_BACKOFF_SECONDS
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BACKOFF_SECONDS: float = 0.5
+    LLM_RETRY_MAX_BACKOFF_SECONDS: float = 20.0
+    # Connections kept open to the API, shared by the whole process, and the
+    # provider quota, enforced client-side before each request is sent
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_REQUESTS_PER_MINUTE: int = 500
+    LLM_TOKENS_PER_MINUTE: int = 200000
+    LLM_MAX_OUTPUT_TOKENS: int = 1024
+
+    @field_validator("LIST_COUNT_STRATEGY")
+    @classmethod
+    def validate_count_strategy(cls, v: str):
+        if v not in {"exact", "cached", "estimated"}:
+            raise ValueError("LIST_COUNT_STRATEGY must be exact, cached or estimated")
+        return v
+
+    @field_validator("SEARCH_BACKEND")
+    @classmethod
+    def validate_search_backend(cls, v: str):
+        if v not in {"auto", "ilike", "trigram", "fts5"}:
+            raise ValueError("SEARCH_BACKEND must be auto, ilike, trigram or fts5")
+        return v
+
+    @field_validator("LLM_BACKEND")
+    @classmethod
+    def validate_llm_backend(cls, v: str):
+        if v not in {"auto", "mock", "openai", "fake"}:
+            raise ValueError("LLM_BACKEND must be auto, mock, openai or fake")
+        return v
+
+    @field_validator("NOTE_EMBEDDER")
+    @classmethod
+    def validate_note_embedder(cls, v: str):
+        if v not in {"hashed-ngram"}:
+            raise ValueError("NOTE_EMBEDDER must be hashed-ngram")
+        return v
 
     @field_validator("SQLALCHEMY_DATABASE_URI", mode="before")
     @classmethod
@@ -12,3 +12,35 @@ class NoteNotFoundException(Exception):
     def __init__(self, note_id: int):
         self.note_id = note_id
         super().__init__(f"Note with id {note_id} not found")
+
+
+class InvalidCursorException(Exception):
+    """Exception raised when a pagination cursor cannot be used."""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(f"Invalid cursor: {reason}")
+
+
+class UploadTooLargeException(Exception):
+    """Exception raised when an uploaded file exceeds the size limit."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"Upload exceeds the limit of {max_bytes} bytes")
+
+
+class UnsupportedUploadException(Exception):
+    """Exception raised when an uploaded file is not readable text."""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(f"Unsupported upload: {reason}")
+
+
+class LLMUnavailableException(Exception):
+    """Exception raised when the LLM API fails after all retries."""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(f"LLM request failed: {reason}")
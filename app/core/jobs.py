@@ -0,0 +1,169 @@
+import asyncio
+import itertools
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app import crud
+from app.core.config import settings
+from app.crud.summary import SummaryEntry, SummaryGenerator
+from app.db.base import AsyncSessionLocal
+from app.utils.llm_summary import generate_patient_summary_with_llm
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryJobQueue:
+    """
+    Run summary jobs on a pool of `workers` tasks, highest priority first.
+
+    Jobs live in the summary_jobs table; the in-memory queue only orders the
+    ids waiting to run and is refilled from the table by `recover` on
+    startup. Each job records the engine it was submitted against, so its
+    sessions use the same database as the request that queued it.
+    """
+
+    def __init__(
+        self, *, workers: int, timeout_seconds: float, generate: SummaryGenerator
+    ):
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        self.generate = generate
+        self._queue: asyncio.PriorityQueue | None = None
+        self._tasks: list[asyncio.Task] = []
+        # Keeps equal priorities first in, first out
+        self._order = itertools.count()
+
+    def start(self) -> None:
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"summary-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """
+        Cancel the workers. Jobs they were running stay `running` in the
+        table and are queued again by `recover` once the timeout has passed.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    def submit(self, job_id: int, priority: int, engine: AsyncEngine) -> None:
+        if self._queue is None:
+            raise RuntimeError("Summary job queue is not running")
+        self._queue.put_nowait((-priority, next(self._order), job_id, engine))
+
+    async def join(self) -> None:
+        """
+        Wait until every submitted job has run.
+        """
+        await self._queue.join()
+
+    async def recover(self, engine: AsyncEngine) -> None:
+        """
+        Queue the jobs waiting in the table: those still queued, and those
+        left running past the timeout by a process that stopped.
+        """
+        started_before = datetime.now(timezone.utc) - timedelta(
+            seconds=self.timeout_seconds
+        )
+        try:
+            async with AsyncSessionLocal(bind=engine) as db:
+                await crud.summary_job.requeue_abandoned(
+                    db, started_before=started_before
+                )
+                queued = await crud.summary_job.get_queued(db)
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning("Could not requeue summary jobs: %s", e)
+            return
+        for job_id, priority in queued:
+            self.submit(job_id, priority, engine)
+        if queued:
+            logger.info("Requeued %d summary jobs", len(queued))
+
+    async def run(self, job_id: int, engine: AsyncEngine) -> None:
+        """
+        Run one job. The session used to read the patient and notes is closed
+        before the model is called, and a new one stores the result, so no
+        database connection is held while the summary is generated.
+        """
+        async with AsyncSessionLocal(bind=engine) as db:
+            job = await crud.summary_job.claim(db, id=job_id)
+            if job is None:
+                return
+            found = await crud.summary.get_watermark(db, patient_id=job.patient_id)
+            if found is None:
+                await crud.summary_job.finish(db, id=job_id, error="Patient not found")
+                return
+            patient, watermark = found
+            entry = await crud.summary.get_current(
+                db, patient_id=patient.id, watermark=watermark
+            )
+            if entry is None:
+                notes = await crud.summary.get_notes(db, patient_id=patient.id)
+
+        error = None
+        if entry is None:
+            try:
+                generated = await asyncio.wait_for(
+                    self.generate(patient, notes), self.timeout_seconds
+                )
+                entry = SummaryEntry(
+                    watermark, generated.summary, datetime.now(timezone.utc)
+                )
+            except asyncio.TimeoutError:
+                error = f"Timed out after {self.timeout_seconds:g} seconds"
+            except Exception as e:
+                logger.exception("Summary job %d failed", job_id)
+                error = f"{type(e).__name__}: {e}"
+
+        async with AsyncSessionLocal(bind=engine) as db:
+            if error is not None:
+                await crud.summary_job.finish(db, id=job_id, error=error)
+                return
+            # The patient may have been deleted while the summary was
+            # generated, and a summary row for them would break its foreign key
+            if await crud.patient.exists(db, id=patient.id):
+                try:
+                    await crud.summary.store(db, patient_id=patient.id, entry=entry)
+                except IntegrityError:
+                    # Deleted between the check and the insert
+                    await db.rollback()
+                else:
+                    await crud.summary_job.finish(
+                        db,
+                        id=job_id,
+                        patient_info=entry.watermark.patient_info,
+                        summary=entry.summary,
+                    )
+                    return
+            # Changes nothing if the job went with the patient
+            await crud.summary_job.finish(db, id=job_id, error="Patient not found")
+
+    async def _work(self) -> None:
+        while True:
+            _, _, job_id, engine = await self._queue.get()
+            try:
+                await self.run(job_id, engine)
+            except Exception:
+                # The job stays running and is requeued after a restart
+                logger.exception("Summary job %d could not be recorded", job_id)
+            finally:
+                self._queue.task_done()
+
+
+summary_jobs = SummaryJobQueue(
+    workers=settings.SUMMARY_JOB_WORKERS,
+    timeout_seconds=settings.SUMMARY_JOB_TIMEOUT_SECONDS,
+    generate=generate_patient_summary_with_llm,
+)
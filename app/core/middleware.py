@@ -0,0 +1,216 @@
+import logging
+import math
+import time
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS,
+    HTTP_REQUESTS_IN_PROGRESS,
+)
+from app.core.query_stats import QueryStats, current_query_stats
+from app.db import base
+from app.db.replicas import STICKY_COOKIE
+from app.utils.http_cache import cache_control_for
+
+logger = logging.getLogger(__name__)
+
+# Allowance for multipart boundaries, part headers and form fields on top of
+# the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def route_template(scope: Scope) -> str:
+    # Resolved before the request runs, so in-flight requests have a route
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject multipart request bodies larger than MAX_UPLOAD_BYTES before the
+    form parser buffers them: up front from Content-Length when it is sent,
+    and otherwise as soon as the streamed body passes the limit.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if not headers.get("content-type", "").startswith("multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        max_body = settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+        detail = f"Upload exceeds the limit of {settings.MAX_UPLOAD_BYTES} bytes"
+        content_length = headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > max_body:
+            response = JSONResponse({"detail": detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    # FastAPI re-raises HTTPExceptions from body parsing as-is
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class MetricsMiddleware:
+    """
+    Record request count, latency and in-flight requests per route template,
+    so path parameters do not each become a label value.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc(method=method, route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started, method=method, route=route
+            )
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status))
+            HTTP_REQUESTS_IN_PROGRESS.dec(method=method, route=route)
+
+
+class QueryStatsMiddleware:
+    """
+    Count the SQL statements each request runs and their total time, warn
+    about statements repeated within one request, and optionally report
+    the counts in X-DB-Query-Count / X-DB-Query-Time-Ms response headers.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+
+        async def send_with_stats(message: Message) -> None:
+            if message["type"] == "http.response.start" and settings.QUERY_STATS_HEADER:
+                # Streamed responses report what ran before the body started
+                headers = MutableHeaders(scope=message)
+                headers.append("X-DB-Query-Count", str(stats.count))
+                headers.append(
+                    "X-DB-Query-Time-Ms", f"{stats.total_seconds * 1000:.2f}"
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_query_stats.reset(token)
+            for statement, count in stats.repeated(settings.QUERY_REPEAT_THRESHOLD):
+                logger.warning(
+                    "Statement ran %d times in %s %s (possible N+1): %s",
+                    count,
+                    scope["method"],
+                    scope["path"],
+                    statement,
+                )
+
+
+class ReadYourWritesMiddleware:
+    """
+    After a successful write, set a short-lived cookie that keeps the
+    client's reads on the primary (see get_read_db) while replicas catch up.
+    """
+
+    SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] in self.SAFE_METHODS
+            or not base.replica_router.engines
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                sticky = settings.REPLICA_STICKY_SECONDS
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Set-Cookie",
+                    f"{STICKY_COOKIE}={time.time() + sticky:.3f}; "
+                    f"Max-Age={math.ceil(sticky)}; Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+class CacheControlMiddleware:
+    """
+    Add the route's Cache-Control policy (see app/utils/http_cache.py) to API
+    responses that do not set their own, including 304s.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(settings.API_V1_STR):
+            await self.app(scope, receive, send)
+            return
+
+        policy = cache_control_for(scope["method"], route_template(scope))
+
+        async def send_with_policy(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "cache-control" not in headers:
+                    headers["Cache-Control"] = policy
+            await send(message)
+
+        await self.app(scope, receive, send_with_policy)
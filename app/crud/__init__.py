@@ -1,4 +1,6 @@
 from .patient import patient
 from .note import note
+from .summary import summary
+from .summary_job import summary_job
 
-__all__ = ["patient", "note"]
+__all__ = ["patient", "note", "summary", "summary_job"]
@@ -1,14 +1,22 @@
-from typing import Any, Generic, Type, TypeVar
+from datetime import datetime
+from typing import Any, Generic, Iterable, Sequence, Type, TypeVar
 
 from pydantic import BaseModel
+from sqlalchemy import Row, delete, exists, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
 from sqlalchemy.future import select
+from sqlalchemy.sql import ColumnElement
+
+from app.core.metrics import instrument_crud
+from app.crud.count import count_cache
 
 ModelType = TypeVar("ModelType", bound=Any)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
+@instrument_crud
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         """
@@ -16,22 +24,76 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         self.model = model
 
+    def columns_for(self, schema: type[BaseModel]) -> list[InstrumentedAttribute]:
+        """
+        The model columns behind a response schema's fields, for selects that
+        return plain rows instead of ORM objects.
+        """
+        return [getattr(self.model, name) for name in schema.model_fields]
+
     async def get(self, db: AsyncSession, id: Any) -> ModelType | None:
         result = await db.execute(select(self.model).where(self.model.id == id))
         return result.scalar_one_or_none()
 
+    async def get_many(
+        self,
+        db: AsyncSession,
+        ids: Sequence[Any],
+        *,
+        columns: Sequence[InstrumentedAttribute] | None = None,
+    ) -> list[ModelType] | list[Row]:
+        """
+        The rows with the given ids in `ids` order, with a single IN query.
+        Ids without a row are left out. With `columns` (which must include
+        id), plain rows are returned instead of model objects.
+        """
+        if not ids:
+            return []
+        query = select(*columns) if columns else select(self.model)
+        result = await db.execute(query.where(self.model.id.in_(set(ids))))
+        rows = result.all() if columns else result.scalars().all()
+        by_id = {row.id: row for row in rows}
+        return [by_id[id] for id in ids if id in by_id]
+
+    async def get_existing_ids(self, db: AsyncSession, ids: Iterable[Any]) -> set[Any]:
+        """
+        Return which of the given ids exist, with a single IN query.
+        """
+        ids = set(ids)
+        if not ids:
+            return set()
+        result = await db.execute(select(self.model.id).where(self.model.id.in_(ids)))
+        return set(result.scalars().all())
+
     async def get_multi(
         self, db: AsyncSession, *, skip: int = 0, limit: int = 100
     ) -> list[ModelType]:
         result = await db.execute(select(self.model).offset(skip).limit(limit))
         return result.scalars().all()
 
+    async def exists(self, db: AsyncSession, id: Any) -> bool:
+        result = await db.execute(select(exists().where(self.model.id == id)))
+        return result.scalar()
+
+    async def get_modified(
+        self, db: AsyncSession, id: Any
+    ) -> tuple[datetime | None, datetime | None] | None:
+        """
+        Return a row's `(created_at, updated_at)` without loading it, as a
+        cheap version for ETags. Returns None if no row has the id.
+        """
+        return await self._get_modified_where(db, self.model.id == id)
+
     async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
-        obj_in_data = obj_in.model_dump()
-        db_obj = self.model(**obj_in_data)
-        db.add(db_obj)
+        # INSERT ... RETURNING hands back server defaults without a refresh
+        result = await db.scalars(
+            insert(self.model).returning(self.model),
+            [self._insert_values(obj_in.model_dump())],
+        )
+        db_obj = result.one()
+        await self._before_commit(db, [db_obj])
         await db.commit()
-        await db.refresh(db_obj)
+        self._invalidate_counts()
         return db_obj
 
     async def update(
@@ -41,20 +103,98 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db_obj: ModelType,
         obj_in: UpdateSchemaType | dict[str, Any],
     ) -> ModelType:
+        updated = await self.update_by_id(db, id=db_obj.id, obj_in=obj_in)
+        return updated if updated is not None else db_obj
+
+    async def update_by_id(
+        self,
+        db: AsyncSession,
+        *,
+        id: Any,
+        obj_in: UpdateSchemaType | dict[str, Any],
+    ) -> ModelType | None:
+        """
+        Apply an update with a single UPDATE ... RETURNING.
+        Returns None if no row has the id.
+        """
         obj_data = (
             obj_in.model_dump(exclude_unset=True)
             if not isinstance(obj_in, dict)
             else obj_in
         )
-        for field, value in obj_data.items():
-            setattr(db_obj, field, value)
+        if not obj_data:
+            return await self.get(db, id=id)
+
+        result = await db.execute(
+            update(self.model)
+            .where(self.model.id == id)
+            .values(**obj_data)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        db_obj = result.scalar_one_or_none()
+        if db_obj is None:
+            return None
+        await self._before_commit(db, [db_obj])
         await db.commit()
-        await db.refresh(db_obj)
+        self._invalidate_counts()
         return db_obj
 
     async def remove(self, db: AsyncSession, *, id: int) -> ModelType | None:
-        obj = await self.get(db, id=id)
-        if obj:
-            await db.delete(obj)
-            await db.commit()
-        return obj
+        """
+        Delete a row and its delete-cascade children with DELETE ... RETURNING,
+        without loading anything first. Returns None if no row has the id.
+        """
+        return await self._remove_where(db, self.model.id == id)
+
+    async def _get_modified_where(
+        self, db: AsyncSession, *criteria: ColumnElement[bool]
+    ) -> tuple[datetime | None, datetime | None] | None:
+        result = await db.execute(
+            select(self.model.created_at, self.model.updated_at).where(*criteria)
+        )
+        row = result.one_or_none()
+        return tuple(row) if row is not None else None
+
+    async def _remove_where(
+        self, db: AsyncSession, *criteria: ColumnElement[bool]
+    ) -> ModelType | None:
+        # Children first, as the ORM cascade would, so foreign keys hold
+        for rel in self.model.__mapper__.relationships:
+            if not rel.cascade.delete:
+                continue
+            for local_col, remote_col in rel.local_remote_pairs:
+                await db.execute(
+                    delete(remote_col.table).where(
+                        remote_col.in_(select(local_col).where(*criteria))
+                    )
+                )
+
+        result = await db.execute(
+            delete(self.model).where(*criteria).returning(self.model)
+        )
+        db_obj = result.scalar_one_or_none()
+        if db_obj is None:
+            return None
+        await self._before_commit(db, [db_obj])
+        await db.commit()
+        self._invalidate_counts()
+        return db_obj
+
+    async def _before_commit(self, db: AsyncSession, db_objs: list[ModelType]) -> None:
+        """
+        Hook for extra statements in the same transaction as a write.
+        """
+
+    def _insert_values(self, obj_in_data: dict[str, Any]) -> dict[str, Any]:
+        # Like the ORM, leave out None so column defaults apply
+        return {key: value for key, value in obj_in_data.items() if value is not None}
+
+    def _invalidate_counts(self) -> None:
+        # Children removed by delete cascades change their tables' counts too
+        tables = [self.model.__tablename__] + [
+            rel.mapper.local_table.name
+            for rel in self.model.__mapper__.relationships
+            if rel.cascade.delete
+        ]
+        count_cache.invalidate(*tables)
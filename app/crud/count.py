@@ -0,0 +1,126 @@
+import json
+import time
+import weakref
+from typing import Any
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+
+# How `total` is computed for list endpoints:
+#   exact     - COUNT(*) over the filtered query on every request
+#   cached    - exact count, reused until the table is written or the TTL expires
+#   estimated - planner row estimate on Postgres, falling back to cached
+
+
+class CountCache:
+    """
+    In-process cache of COUNT results keyed by engine, table and query.
+
+    Entries for a table are dropped whenever CRUDBase writes to it; the TTL
+    bounds staleness from writes made by other processes.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: weakref.WeakKeyDictionary[
+            Engine, dict[str, dict[tuple, tuple[int, float]]]
+        ] = weakref.WeakKeyDictionary()
+
+    def get(self, engine: Engine, table: str, key: tuple) -> int | None:
+        entry = self._entries.get(engine, {}).get(table, {}).get(key)
+        if entry is None:
+            return None
+        total, expires_at = entry
+        if expires_at < time.monotonic():
+            return None
+        return total
+
+    def set(self, engine: Engine, table: str, key: tuple, total: int) -> None:
+        tables = self._entries.setdefault(engine, {})
+        tables.setdefault(table, {})[key] = (total, time.monotonic() + self.ttl)
+
+    def invalidate(self, *tables: str) -> None:
+        for cached_tables in self._entries.values():
+            for table in tables:
+                cached_tables.pop(table, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+count_cache = CountCache(ttl=settings.COUNT_CACHE_TTL_SECONDS)
+
+
+async def count_rows(
+    db: AsyncSession, query: Select, *, table: str, strategy: str | None = None
+) -> int:
+    """
+    Count the rows a query would return using the configured strategy.
+    """
+    strategy = strategy or settings.LIST_COUNT_STRATEGY
+    if strategy == "estimated":
+        estimate = await _estimate_rows(db, query, table)
+        # Small results are cheap to count and where estimates are least accurate
+        if estimate is not None and estimate >= settings.COUNT_ESTIMATE_MIN_ROWS:
+            return estimate
+        strategy = "cached"
+
+    if strategy == "cached":
+        engine = db.get_bind()
+        compiled = query.compile(dialect=engine.dialect)
+        key = (str(compiled), _params_key(compiled.params))
+        total = count_cache.get(engine, table, key)
+        if total is None:
+            total = await _exact_count(db, query)
+            count_cache.set(engine, table, key, total)
+        return total
+
+    return await _exact_count(db, query)
+
+
+async def _exact_count(db: AsyncSession, query: Select) -> int:
+    count_query = select(func.count()).select_from(query.subquery())
+    result = await db.execute(count_query)
+    return result.scalar()
+
+
+async def _estimate_rows(db: AsyncSession, query: Select, table: str) -> int | None:
+    """
+    Ask the Postgres planner for a row estimate; None where none is available.
+    """
+    dialect = db.get_bind().dialect
+    if dialect.name != "postgresql":
+        return None
+
+    if query.whereclause is None:
+        # Unfiltered: the table's row estimate maintained by ANALYZE/autovacuum
+        result = await db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"),
+            {"t": table},
+        )
+        reltuples = result.scalar()
+        # reltuples is -1 for tables that have never been analyzed
+        return reltuples if reltuples is not None and reltuples >= 0 else None
+
+    try:
+        statement = query.compile(
+            dialect=dialect, compile_kwargs={"literal_binds": True}
+        )
+    except (CompileError, NotImplementedError):
+        # Parameters that cannot be rendered inline; let the caller count
+        return None
+    connection = await db.connection()
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}")
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _params_key(params: dict[str, Any]) -> tuple:
+    return tuple(sorted((name, repr(value)) for name, value in params.items()))
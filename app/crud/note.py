@@ -1,12 +1,147 @@
+from datetime import datetime
+
+from typing import AsyncIterator, Sequence
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import Row, exists, func, insert, literal, select, update
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.sql import ColumnElement
 
+from app.core.metrics import instrument_crud
 from app.crud.base import CRUDBase
+from app.crud.count import count_rows
+from app.crud.pagination import Keyset
+from app.crud.search import get_search_backend, highlight
+from app.crud.summary import summary
 from app.models.note import PatientNote
+from app.models.patient import Patient
 from app.schemas.note import PatientNoteCreate, PatientNoteUpdate
 
 
+@instrument_crud
 class CRUDNote(CRUDBase[PatientNote, PatientNoteCreate, PatientNoteUpdate]):
+    async def get_for_patient(
+        self, db: AsyncSession, *, id: int, patient_id: int
+    ) -> PatientNote | None:
+        result = await db.execute(
+            select(PatientNote).where(
+                PatientNote.id == id, PatientNote.patient_id == patient_id
+            )
+        )
+        return result.scalar_one_or_none()
+
+    async def create_for_patient(
+        self, db: AsyncSession, *, obj_in: PatientNoteCreate
+    ) -> PatientNote | None:
+        """
+        Insert a note only if its patient exists, as one INSERT ... SELECT ...
+        WHERE EXISTS ... RETURNING. Returns None when there is no such patient.
+        """
+        values = self._insert_values(obj_in.model_dump())
+        columns = PatientNote.__table__.c
+        row = select(
+            *(literal(value, columns[key].type) for key, value in values.items())
+        ).where(exists().where(Patient.id == obj_in.patient_id))
+        result = await db.scalars(
+            insert(PatientNote).from_select(list(values), row).returning(PatientNote)
+        )
+        db_obj = result.one_or_none()
+        if db_obj is None:
+            return None
+        await self._before_commit(db, [db_obj])
+        await db.commit()
+        self._invalidate_counts()
+        return db_obj
+
+    async def get_modified_for_patient(
+        self, db: AsyncSession, *, id: int, patient_id: int
+    ) -> tuple[datetime | None, datetime | None] | None:
+        return await self._get_modified_where(
+            db, PatientNote.id == id, PatientNote.patient_id == patient_id
+        )
+
+    async def remove_for_patient(
+        self, db: AsyncSession, *, id: int, patient_id: int
+    ) -> PatientNote | None:
+        return await self._remove_where(
+            db, PatientNote.id == id, PatientNote.patient_id == patient_id
+        )
+
+    async def _before_commit(
+        self, db: AsyncSession, db_objs: list[PatientNote]
+    ) -> None:
+        # Writes drop the affected patients' cached summaries and bump their
+        # notes version in the same transaction
+        patient_ids = {db_obj.patient_id for db_obj in db_objs}
+        await summary.invalidate(db, patient_ids=patient_ids)
+        await self._bump_notes_version(db, patient_ids)
+
+    async def _bump_notes_version(
+        self, db: AsyncSession, patient_ids: set[int]
+    ) -> None:
+        if patient_ids:
+            await db.execute(
+                update(Patient).where(Patient.id.in_(patient_ids))
+                # Set to themselves so their onupdates leave the patient's
+                # updated_at and version (and ETag) alone: the patient row
+                # did not change
+                .values(
+                    notes_version=Patient.notes_version + 1,
+                    updated_at=Patient.updated_at,
+                    version=Patient.version,
+                )
+            )
+
+    async def create_many(
+        self, db: AsyncSession, *, objs_in: list[PatientNoteCreate]
+    ) -> list[int]:
+        """
+        Insert notes with multi-row INSERT ... RETURNING and a single commit.
+        Returns the new ids in the order of `objs_in`.
+        """
+        # Notes without a timestamp take the server default; grouping by that
+        # keeps each group to one multi-row statement
+        groups: dict[bool, list[tuple[int, dict]]] = {True: [], False: []}
+        for position, obj_in in enumerate(objs_in):
+            data = obj_in.model_dump()
+            if data["timestamp"] is None:
+                del data["timestamp"]
+            groups["timestamp" in data].append((position, data))
+
+        patient_ids = {obj_in.patient_id for obj_in in objs_in}
+        await summary.invalidate(db, patient_ids=patient_ids)
+        await self._bump_notes_version(db, patient_ids)
+        ids = [0] * len(objs_in)
+        stmt = insert(PatientNote).returning(
+            PatientNote.id, sort_by_parameter_order=True
+        )
+        for rows in groups.values():
+            if not rows:
+                continue
+            result = await db.execute(stmt, [data for _, data in rows])
+            for (position, _), id in zip(rows, result.scalars().all()):
+                ids[position] = id
+
+        await db.commit()
+        self._invalidate_counts()
+        return ids
+
+    def listing_columns(
+        self, fields: Sequence[str], *, excerpt_len: int | None = None
+    ) -> list[ColumnElement]:
+        """
+        Columns for a projected note listing. With `excerpt_len`, content is
+        cut to that many characters by the database, so the rest of the text
+        is never sent to us.
+        """
+        columns = []
+        for name in fields:
+            column = getattr(PatientNote, name)
+            if name == "content" and excerpt_len is not None:
+                column = func.substr(column, 1, excerpt_len).label("content")
+            columns.append(column)
+        return columns
+
     async def get_multi_by_patient(
         self,
         db: AsyncSession,
@@ -15,24 +150,202 @@ class CRUDNote(CRUDBase[PatientNote, PatientNoteCreate, PatientNoteUpdate]):
         skip: int = 0,
         limit: int = 100,
         sort_clause=None,
-    ) -> tuple[list[PatientNote], int]:
-        query = select(PatientNote).where(PatientNote.patient_id == patient_id)
+        keyset: Keyset | None = None,
+        include_total: bool = True,
+        count_strategy: str | None = None,
+        columns: Sequence[ColumnElement] | None = None,
+    ) -> tuple[list[PatientNote] | list[Row], int | None]:
+        """
+        A page of a patient's notes and the total. With `columns`, only those
+        columns are selected and plain rows are returned instead of notes.
+        """
+        query = select(*columns) if columns else select(PatientNote)
+        query = query.where(PatientNote.patient_id == patient_id)
 
         # Get total count before pagination
-        count_query = select(func.count()).select_from(query.subquery())
-        total_result = await db.execute(count_query)
-        total = total_result.scalar()
+        total = None
+        if include_total:
+            total = await count_rows(
+                db, query, table=PatientNote.__tablename__, strategy=count_strategy
+            )
 
-        # Apply sorting if provided
-        if sort_clause is not None:
-            query = query.order_by(sort_clause)
+        if keyset is not None:
+            # Keyset ordering, with the cursor replacing the offset when given
+            query = keyset.apply(
+                query, db.get_bind().dialect.name, skip=skip, limit=limit
+            )
+        else:
+            # Apply sorting if provided
+            if sort_clause is not None:
+                query = query.order_by(sort_clause)
+
+            # Apply pagination
+            query = query.offset(skip).limit(limit)
 
-        # Apply pagination
-        query = query.offset(skip).limit(limit)
         notes_result = await db.execute(query)
-        notes = notes_result.scalars().all()
+        notes = notes_result.all() if columns else notes_result.scalars().all()
+        if keyset is not None:
+            notes = keyset.arrange(notes)
 
         return notes, total
 
+    async def get_latest_for_patients(
+        self,
+        db: AsyncSession,
+        *,
+        patient_ids: Sequence[int],
+        limit: int,
+        columns: Sequence[InstrumentedAttribute],
+    ) -> dict[int, list[Row]]:
+        """
+        The latest `limit` notes of each patient, newest first, as plain rows
+        of `columns`. One query for all the patients: notes are numbered per
+        patient with ROW_NUMBER() and only the first `limit` are returned.
+        """
+        if not patient_ids:
+            return {}
+        position = (
+            func.row_number()
+            .over(
+                partition_by=PatientNote.patient_id,
+                order_by=(PatientNote.timestamp.desc(), PatientNote.id.desc()),
+            )
+            .label("position")
+        )
+        ranked = (
+            select(*columns, position)
+            .where(PatientNote.patient_id.in_(patient_ids))
+            .subquery()
+        )
+        query = (
+            select(*(ranked.c[column.key] for column in columns))
+            .where(ranked.c.position <= limit)
+            .order_by(ranked.c.patient_id, ranked.c.position)
+        )
+        notes: dict[int, list[Row]] = {}
+        for row in (await db.execute(query)).all():
+            notes.setdefault(row.patient_id, []).append(row)
+        return notes
+
+    async def get_all_ids(self, db: AsyncSession) -> set[int]:
+        return set(await db.scalars(select(PatientNote.id)))
+
+    async def get_chunk_after(
+        self,
+        db: AsyncSession,
+        *,
+        after_id: int,
+        limit: int,
+        note_types: Sequence[str | None] | None = None,
+    ) -> list[Row]:
+        """
+        The next `limit` notes after `after_id` in id order, as (id,
+        patient_id, note_type, content) rows, optionally only those of
+        `note_types` (None matching notes without a type). For walking the
+        whole table in batches by keyset.
+        """
+        query = (
+            select(
+                PatientNote.id,
+                PatientNote.patient_id,
+                PatientNote.note_type,
+                PatientNote.content,
+            )
+            .where(PatientNote.id > after_id)
+            .order_by(PatientNote.id)
+            .limit(limit)
+        )
+        if note_types is not None:
+            named = [note_type for note_type in note_types if note_type is not None]
+            condition = PatientNote.note_type.in_(named)
+            if None in note_types:
+                condition = condition | PatientNote.note_type.is_(None)
+            query = query.where(condition)
+        return list((await db.execute(query)).all())
+
+    async def set_note_types(
+        self, db: AsyncSession, *, note_types: dict[int, str], patient_ids: set[int]
+    ) -> None:
+        """
+        Set the type of many notes, by id, with one executemany UPDATE and a
+        single commit. `patient_ids` are the notes' patients, whose summaries
+        mention note types and so are invalidated.
+        """
+        if not note_types:
+            return
+        await summary.invalidate(db, patient_ids=patient_ids)
+        await self._bump_notes_version(db, patient_ids)
+        await db.execute(
+            update(PatientNote),
+            [
+                {"id": id, "note_type": note_type}
+                for id, note_type in note_types.items()
+            ],
+        )
+        await db.commit()
+
+    async def stream_by_patient(
+        self, db: AsyncSession, *, patient_id: int, yield_per: int = 100
+    ) -> AsyncIterator[PatientNote]:
+        """
+        Yield a patient's notes oldest first, fetched `yield_per` rows at a time
+        through a server-side cursor rather than loaded all at once.
+        """
+        query = (
+            select(PatientNote)
+            .where(PatientNote.patient_id == patient_id)
+            .order_by(PatientNote.timestamp, PatientNote.id)
+            .execution_options(yield_per=yield_per)
+        )
+        result = await db.stream_scalars(query)
+        try:
+            async for note in result:
+                yield note
+        finally:
+            await result.close()
+
+    async def search(
+        self,
+        db: AsyncSession,
+        *,
+        text: str,
+        patient_id: int | None = None,
+        note_type: str | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        skip: int = 0,
+        limit: int = 20,
+        include_total: bool = True,
+    ) -> tuple[list[tuple[PatientNote, float, str]], int | None]:
+        """
+        Full-text search over note content, best matches first.
+        Returns `(note, rank, snippet)` rows and the number of matches.
+        """
+        query = select(PatientNote)
+        if patient_id is not None:
+            query = query.where(PatientNote.patient_id == patient_id)
+        if note_type is not None:
+            query = query.where(PatientNote.note_type == note_type)
+        if start is not None:
+            query = query.where(PatientNote.timestamp >= start)
+        if end is not None:
+            query = query.where(PatientNote.timestamp < end)
+
+        query, rank, snippet = get_search_backend(db).note_content(query, text)
+
+        total = None
+        if include_total:
+            total = await count_rows(db, query, table=PatientNote.__tablename__)
+
+        query = (
+            query.add_columns(rank.label("rank"), snippet.label("snippet"))
+            .order_by(rank.desc(), PatientNote.timestamp.desc(), PatientNote.id.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        result = await db.execute(query)
+        hits = [(note, rank, highlight(snippet)) for note, rank, snippet in result]
+        return hits, total
+
 
 note = CRUDNote(PatientNote)
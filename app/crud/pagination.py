@@ -0,0 +1,199 @@
+import base64
+import binascii
+import json
+import operator
+from datetime import date, datetime
+from typing import Any, Sequence
+
+from sqlalchemy import DateTime, and_, func, or_, tuple_
+from sqlalchemy.sql import Select
+
+from app.core.exceptions import InvalidCursorException
+
+# SQLite stores server-side CURRENT_TIMESTAMP values and SQLAlchemy-bound
+# datetimes in different text formats, so keys are compared in this form.
+SQLITE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%f"
+
+
+class Keyset:
+    """
+    Keyset (cursor) pagination over a single sort column with `id` as tie-breaker.
+
+    Rows are ordered by `(sort column, id)` in the requested direction, with
+    NULLs treated as larger than any value. A cursor records the key of the
+    row at the edge of a page, so the next page is fetched with a `WHERE`
+    on that key instead of an `OFFSET`, and costs the same at any depth.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        sort_by: str,
+        sort_order: str = "asc",
+        cursor: str | None = None,
+    ):
+        self.sort_by = sort_by
+        self.sort_order = sort_order
+        self.column = getattr(model, sort_by)
+        self.id_column = model.id
+        self.ascending = sort_order == "asc"
+        self.nullable = sort_by != "id" and self.column.expression.nullable
+
+        # Position of the cursor row; unset for the first page
+        self.value: Any = None
+        self.last_id: int | None = None
+        self.backward = False
+        if cursor is not None:
+            self._load(cursor)
+
+    @property
+    def has_cursor(self) -> bool:
+        return self.last_id is not None
+
+    def apply(
+        self,
+        query: Select,
+        dialect_name: str,
+        *,
+        skip: int = 0,
+        limit: int | None = None,
+    ) -> Select:
+        """
+        Add the ordering, the cursor predicate (or offset) and the limit to a query.
+        """
+        # A backward page walks the ordering in reverse from the cursor row
+        ascending = self.ascending != self.backward
+        key = self._key(dialect_name)
+
+        if self.has_cursor:
+            query = query.where(
+                self._beyond(key, self._bind_value(dialect_name), ascending)
+            )
+        elif skip:
+            query = query.offset(skip)
+
+        query = query.order_by(*self._ordering(key, ascending))
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    def arrange(self, rows: Sequence[Any]) -> list[Any]:
+        """
+        Return rows in display order; backward pages are fetched reversed.
+        """
+        return list(reversed(rows)) if self.backward else list(rows)
+
+    def cursors(
+        self, rows: Sequence[Any], *, limit: int, skip: int = 0
+    ) -> tuple[str | None, str | None]:
+        """
+        Build the `(next_cursor, prev_cursor)` pair for a page of rows.
+        """
+        if not rows:
+            return None, None
+
+        full_page = len(rows) >= limit
+        if self.backward:
+            has_next, has_prev = True, full_page
+        else:
+            has_next, has_prev = full_page, self.has_cursor or skip > 0
+
+        next_cursor = self._encode(rows[-1], backward=False) if has_next else None
+        prev_cursor = self._encode(rows[0], backward=True) if has_prev else None
+        return next_cursor, prev_cursor
+
+    def _key(self, dialect_name: str):
+        if dialect_name == "sqlite" and isinstance(self.column.type, DateTime):
+            return func.strftime(SQLITE_DATETIME_FORMAT, self.column)
+        return self.column
+
+    def _bind_value(self, dialect_name: str) -> Any:
+        if (
+            dialect_name == "sqlite"
+            and isinstance(self.column.type, DateTime)
+            and self.value is not None
+        ):
+            return self.value.strftime("%Y-%m-%d %H:%M:%S.") + (
+                f"{self.value.microsecond // 1000:03d}"
+            )
+        return self.value
+
+    def _ordering(self, key, ascending: bool) -> list:
+        if self.sort_by == "id":
+            return [key.asc() if ascending else key.desc()]
+        if ascending:
+            ordering = [key.asc().nulls_last() if self.nullable else key.asc()]
+            return ordering + [self.id_column.asc()]
+        ordering = [key.desc().nulls_first() if self.nullable else key.desc()]
+        return ordering + [self.id_column.desc()]
+
+    def _beyond(self, key, value: Any, greater: bool):
+        """
+        Predicate for rows strictly after the cursor in the given direction.
+        """
+        op = operator.gt if greater else operator.lt
+        if self.sort_by == "id":
+            return op(self.id_column, self.last_id)
+
+        if value is None:
+            # The cursor sits among the NULLs, which sort after every value
+            nulls_beyond = and_(self.column.is_(None), op(self.id_column, self.last_id))
+            if greater:
+                return nulls_beyond
+            return or_(self.column.is_not(None), nulls_beyond)
+
+        beyond = op(tuple_(key, self.id_column), tuple_(value, self.last_id))
+        if greater and self.nullable:
+            return or_(beyond, self.column.is_(None))
+        return beyond
+
+    def _encode(self, row: Any, *, backward: bool) -> str:
+        value = getattr(row, self.sort_by)
+        if isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        payload = {
+            "s": self.sort_by,
+            "o": self.sort_order,
+            "v": value,
+            "i": row.id,
+            "b": backward,
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def _load(self, cursor: str) -> None:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            sort_by, sort_order = payload["s"], payload["o"]
+            value, last_id, backward = payload["v"], payload["i"], payload["b"]
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise InvalidCursorException("malformed token")
+
+        if sort_by != self.sort_by or sort_order != self.sort_order:
+            raise InvalidCursorException("cursor was issued for a different sort")
+        if not isinstance(last_id, int) or not isinstance(backward, bool):
+            raise InvalidCursorException("malformed token")
+
+        self.value = self._parse_value(value)
+        self.last_id = last_id
+        self.backward = backward
+
+    def _parse_value(self, value: Any) -> Any:
+        if value is None:
+            if not self.nullable:
+                raise InvalidCursorException("missing sort key")
+            return None
+
+        python_type = self.column.type.python_type
+        try:
+            if python_type is datetime:
+                return datetime.fromisoformat(value)
+            if python_type is date:
+                return date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise InvalidCursorException("malformed sort key")
+
+        if not isinstance(value, python_type) or isinstance(value, bool):
+            raise InvalidCursorException("malformed sort key")
+        return value
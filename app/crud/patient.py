@@ -1,11 +1,21 @@
+from typing import Sequence
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select
+from sqlalchemy import Row, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import InstrumentedAttribute
 
+from app.core.metrics import instrument_crud
 from app.crud.base import CRUDBase
+from app.crud.count import count_rows
+from app.crud.pagination import Keyset
+from app.crud.search import get_search_backend
 from app.models.patient import Patient
 from app.schemas.patient import PatientCreate, PatientUpdate
 
 
+@instrument_crud
 class CRUDPatient(CRUDBase[Patient, PatientCreate, PatientUpdate]):
     async def get_by_mr_number(
         self, db: AsyncSession, *, medical_record_number: str
@@ -17,6 +27,48 @@ class CRUDPatient(CRUDBase[Patient, PatientCreate, PatientUpdate]):
         )
         return result.scalar_one_or_none()
 
+    async def get_version(self, db: AsyncSession, *, id: int) -> int | None:
+        """
+        Return the patient's version without loading the patient.
+        Returns None if there is no such patient.
+        """
+        result = await db.execute(select(Patient.version).where(Patient.id == id))
+        return result.scalar_one_or_none()
+
+    async def get_notes_version(self, db: AsyncSession, *, id: int) -> int | None:
+        """
+        Return the patient's notes version, one primary key probe that also
+        serves as the existence check. Returns None if there is no such patient.
+        """
+        result = await db.execute(select(Patient.notes_version).where(Patient.id == id))
+        return result.scalar_one_or_none()
+
+    async def create_many(
+        self, db: AsyncSession, *, objs_in: list[PatientCreate]
+    ) -> dict[str, int]:
+        """
+        Insert patients with one multi-row INSERT, skipping medical record
+        numbers that already exist. Returns the new ids by medical record number.
+        """
+        if not objs_in:
+            return {}
+
+        dialect_insert = {
+            "postgresql": postgresql_insert,
+            "sqlite": sqlite_insert,
+        }[db.get_bind().dialect.name]
+        stmt = (
+            dialect_insert(Patient)
+            .values([obj_in.model_dump() for obj_in in objs_in])
+            .on_conflict_do_nothing(index_elements=["medical_record_number"])
+            .returning(Patient.medical_record_number, Patient.id)
+        )
+        result = await db.execute(stmt)
+        inserted = {mrn: id for mrn, id in result.all()}
+        await db.commit()
+        self._invalidate_counts()
+        return inserted
+
     async def get_multi_with_filter(
         self,
         db: AsyncSession,
@@ -25,25 +77,53 @@ class CRUDPatient(CRUDBase[Patient, PatientCreate, PatientUpdate]):
         limit: int = 100,
         sort_clause=None,
         search_filter=None,
-    ) -> tuple[list[Patient], int]:
-        query = select(Patient)
+        search: str | None = None,
+        keyset: Keyset | None = None,
+        include_total: bool = True,
+        count_strategy: str | None = None,
+        columns: Sequence[InstrumentedAttribute] | None = None,
+    ) -> tuple[list[Patient] | list[Row], int | None]:
+        """
+        A page of patients and the total. With `columns`, only those columns
+        are selected and plain rows are returned instead of patients.
+        """
+        query = select(*columns) if columns else select(Patient)
 
         # Apply search filter if provided
         if search_filter is not None:
             query = query.where(search_filter)
 
+        # Name search through the database's search backend
+        rank = None
+        if search:
+            query, rank = get_search_backend(db).patient_name(query, search)
+
         # Get total count before pagination
-        count_query = select(func.count()).select_from(query.subquery())
-        total_result = await db.execute(count_query)
-        total = total_result.scalar()
+        total = None
+        if include_total:
+            total = await count_rows(
+                db, query, table=Patient.__tablename__, strategy=count_strategy
+            )
 
         # Apply sorting and pagination
-        if sort_clause is not None:
-            query = query.order_by(sort_clause)
+        if keyset is not None:
+            # Keyset ordering, with the cursor replacing the offset when given
+            query = keyset.apply(
+                query, db.get_bind().dialect.name, skip=skip, limit=limit
+            )
+        else:
+            if sort_clause is not None:
+                query = query.order_by(sort_clause)
+            elif rank is not None:
+                # Most relevant matches first
+                query = query.order_by(rank.desc(), Patient.id)
+
+            query = query.offset(skip).limit(limit)
 
-        query = query.offset(skip).limit(limit)
         patients_result = await db.execute(query)
-        patients = patients_result.scalars().all()
+        patients = patients_result.all() if columns else patients_result.scalars().all()
+        if keyset is not None:
+            patients = keyset.arrange(patients)
 
         return patients, total
 
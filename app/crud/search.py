@@ -0,0 +1,164 @@
+import html
+import re
+
+from sqlalchemy import Float, column, literal, literal_column, table
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement, Select, func
+
+from app.core.config import settings
+from app.models.note import PatientNote
+from app.models.patient import Patient
+from app.models.search import SQLITE_HAS_FTS5, SQLITE_HAS_TRIGRAM
+
+patients_fts = table("patients_fts", column("rowid"), column("rank"))
+patient_notes_fts = table("patient_notes_fts", column("rowid"), column("rank"))
+
+# The expression the Postgres GIN index is built on, with the configuration
+# inlined rather than bound so the planner can match the two
+content_tsv = func.to_tsvector(literal_column("'english'"), PatientNote.content)
+
+# The database marks matches with private-use characters, which are swapped
+# for <mark> tags once the rest of the snippet is HTML-escaped
+SNIPPET_START, SNIPPET_STOP = "\ue000", "\ue001"
+# Length of the plain content prefix used as a snippet without a text index
+SNIPPET_FALLBACK_CHARS = 200
+
+
+def _like_pattern(term: str) -> str:
+    # Match the term literally rather than as LIKE wildcards
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def highlight(snippet: str) -> str:
+    """
+    A snippet as HTML: note content escaped, matches wrapped in <mark>.
+    """
+    return (
+        html.escape(snippet)
+        .replace(SNIPPET_START, "<mark>")
+        .replace(SNIPPET_STOP, "</mark>")
+    )
+
+
+class IlikeSearch:
+    """
+    Case-insensitive substring match with no index support or ranking.
+    """
+
+    name = "ilike"
+
+    def patient_name(
+        self, query: Select, term: str
+    ) -> tuple[Select, ColumnElement | None]:
+        """
+        Filter a patient query by name, returning it with a relevance expression.
+        """
+        return query.where(Patient.name.ilike(_like_pattern(term), escape="\\")), None
+
+    def note_content(
+        self, query: Select, text: str
+    ) -> tuple[Select, ColumnElement, ColumnElement]:
+        """
+        Filter a note query by content, returning it with relevance and
+        highlighted-snippet expressions.
+        """
+        query = query.where(PatientNote.content.ilike(_like_pattern(text), escape="\\"))
+        return (
+            query,
+            literal(0.0, Float),
+            func.substr(PatientNote.content, 1, SNIPPET_FALLBACK_CHARS),
+        )
+
+
+class TrigramSearch(IlikeSearch):
+    """
+    Postgres: the pg_trgm GIN index serves the name ILIKE filter and
+    `similarity()` ranks the matches; note content uses the GIN index on
+    its tsvector.
+    """
+
+    name = "trigram"
+
+    def patient_name(
+        self, query: Select, term: str
+    ) -> tuple[Select, ColumnElement | None]:
+        query, _ = super().patient_name(query, term)
+        return query, func.similarity(Patient.name, term)
+
+    def note_content(
+        self, query: Select, text: str
+    ) -> tuple[Select, ColumnElement, ColumnElement]:
+        # Postgres postpones the costly ts_headline until after the LIMIT
+        tsquery = func.websearch_to_tsquery("english", text)
+        query = query.where(content_tsv.op("@@")(tsquery))
+        snippet = func.ts_headline(
+            "english",
+            PatientNote.content,
+            tsquery,
+            f"StartSel={SNIPPET_START}, StopSel={SNIPPET_STOP}, "
+            "MaxFragments=2, MaxWords=30, MinWords=10",
+        )
+        return query, func.ts_rank_cd(content_tsv, tsquery), snippet
+
+
+class Fts5Search(IlikeSearch):
+    """
+    SQLite FTS5, ranked by bm25: the trigram tokenizer for patient names and
+    the porter stemmer for note content.
+    """
+
+    name = "fts5"
+
+    # The trigram tokenizer cannot match terms shorter than one trigram
+    min_term_length = 3
+
+    def patient_name(
+        self, query: Select, term: str
+    ) -> tuple[Select, ColumnElement | None]:
+        if not SQLITE_HAS_TRIGRAM or len(term) < self.min_term_length:
+            return super().patient_name(query, term)
+
+        phrase = '"' + term.replace('"', '""') + '"'
+        query = query.join(patients_fts, patients_fts.c.rowid == Patient.id).where(
+            literal_column("patients_fts").op("MATCH")(phrase)
+        )
+        # FTS5 rank is bm25, where lower is better
+        return query, -patients_fts.c.rank
+
+    def note_content(
+        self, query: Select, text: str
+    ) -> tuple[Select, ColumnElement, ColumnElement]:
+        # Quote each word so user input cannot inject FTS5 query syntax
+        words = re.findall(r"\w+", text)
+        if not words:
+            return super().note_content(query, text)
+
+        match = " ".join(f'"{word}"' for word in words)
+        query = query.join(
+            patient_notes_fts, patient_notes_fts.c.rowid == PatientNote.id
+        ).where(literal_column("patient_notes_fts").op("MATCH")(match))
+        snippet = func.snippet(
+            literal_column("patient_notes_fts"), 0, SNIPPET_START, SNIPPET_STOP, "…", 24
+        )
+        return query, -patient_notes_fts.c.rank, snippet
+
+
+SEARCH_BACKENDS = {
+    backend.name: backend for backend in (IlikeSearch, TrigramSearch, Fts5Search)
+}
+
+
+def get_search_backend(db: AsyncSession) -> IlikeSearch:
+    """
+    Pick the search backend for the session's database.
+    """
+    if settings.SEARCH_BACKEND != "auto":
+        return SEARCH_BACKENDS[settings.SEARCH_BACKEND]()
+
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        return TrigramSearch()
+    if dialect_name == "sqlite" and SQLITE_HAS_FTS5:
+        return Fts5Search()
+    return IlikeSearch()
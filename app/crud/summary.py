@@ -0,0 +1,252 @@
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Iterable, NamedTuple
+
+from sqlalchemy import delete, func, select, true
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import instrument_crud
+from app.models.note import PatientNote
+from app.models.patient import Patient
+from app.models.summary import CachedSummary
+from app.schemas.note import PatientSummary
+from app.utils.llm_summary import format_patient_info
+
+# Regenerates a summary from a patient and all of their notes
+SummaryGenerator = Callable[[Patient, list[PatientNote]], Awaitable[PatientSummary]]
+
+
+class SummaryWatermark(NamedTuple):
+    """
+    Everything a summary depends on; a stored summary is served only while
+    its watermark matches the current one.
+    """
+
+    note_count: int
+    max_note_id: int | None
+    notes_updated_at: datetime | None
+    patient_info: str
+
+
+class SummaryEntry(NamedTuple):
+    watermark: SummaryWatermark
+    summary: str
+    generated_at: datetime
+
+
+class SummaryCache:
+    """
+    In-process LRU of generated summaries keyed by engine and patient id,
+    in front of the `patient_summaries` table.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: weakref.WeakKeyDictionary[
+            Engine, OrderedDict[int, SummaryEntry]
+        ] = weakref.WeakKeyDictionary()
+
+    def get(self, engine: Engine, patient_id: int) -> SummaryEntry | None:
+        entries = self._entries.get(engine)
+        if not entries or patient_id not in entries:
+            return None
+        entries.move_to_end(patient_id)
+        return entries[patient_id]
+
+    def set(self, engine: Engine, patient_id: int, entry: SummaryEntry) -> None:
+        entries = self._entries.setdefault(engine, OrderedDict())
+        entries[patient_id] = entry
+        entries.move_to_end(patient_id)
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def invalidate(self, *patient_ids: int) -> None:
+        for entries in self._entries.values():
+            for patient_id in patient_ids:
+                entries.pop(patient_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+summary_cache = SummaryCache(maxsize=settings.SUMMARY_CACHE_SIZE)
+
+
+@instrument_crud
+class CRUDSummary:
+    async def get_watermark(
+        self, db: AsyncSession, *, patient_id: int
+    ) -> tuple[Patient, SummaryWatermark] | None:
+        """
+        Load the patient and the current watermark of their notes in one
+        query. Returns None if the patient does not exist.
+        """
+        notes = (
+            select(
+                func.count(PatientNote.id).label("note_count"),
+                func.max(PatientNote.id).label("max_note_id"),
+                func.max(
+                    func.coalesce(PatientNote.updated_at, PatientNote.created_at)
+                ).label("notes_updated_at"),
+            )
+            .where(PatientNote.patient_id == patient_id)
+            .subquery()
+        )
+        # The aggregate always yields one row, so the join keeps the patient
+        result = await db.execute(
+            select(
+                Patient,
+                notes.c.note_count,
+                notes.c.max_note_id,
+                notes.c.notes_updated_at,
+            )
+            .join(notes, true())
+            .where(Patient.id == patient_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+        patient, note_count, max_note_id, notes_updated_at = row
+        watermark = SummaryWatermark(
+            note_count,
+            max_note_id,
+            _as_utc(notes_updated_at),
+            format_patient_info(patient),
+        )
+        return patient, watermark
+
+    async def get_current(
+        self, db: AsyncSession, *, patient_id: int, watermark: SummaryWatermark
+    ) -> SummaryEntry | None:
+        """
+        The patient's summary from the LRU or the summaries table if its
+        watermark is current, else None.
+        """
+        engine = db.get_bind()
+        entry = summary_cache.get(engine, patient_id)
+        if entry is None or entry.watermark != watermark:
+            stored = await db.get(CachedSummary, patient_id)
+            if stored is None:
+                return None
+            entry = SummaryEntry(
+                SummaryWatermark(
+                    stored.note_count,
+                    stored.max_note_id,
+                    _as_utc(stored.notes_updated_at),
+                    stored.patient_info,
+                ),
+                stored.summary,
+                _as_utc(stored.generated_at),
+            )
+            if entry.watermark != watermark:
+                return None
+        summary_cache.set(engine, patient_id, entry)
+        return entry
+
+    async def get_notes(
+        self, db: AsyncSession, *, patient_id: int
+    ) -> list[PatientNote]:
+        """
+        All of the patient's notes in timestamp order, to generate from.
+        """
+        result = await db.execute(
+            select(PatientNote)
+            .where(PatientNote.patient_id == patient_id)
+            .order_by(PatientNote.timestamp, PatientNote.id)
+        )
+        return list(result.scalars().all())
+
+    async def get_or_generate(
+        self,
+        db: AsyncSession,
+        *,
+        patient: Patient,
+        watermark: SummaryWatermark,
+        generate: SummaryGenerator,
+    ) -> PatientSummary:
+        """
+        Return the patient's summary from the LRU or the summaries table while
+        its watermark is current, regenerating and storing it otherwise.
+        """
+        entry = await self.get_current(db, patient_id=patient.id, watermark=watermark)
+        cached = entry is not None
+
+        if not cached:
+            notes = await self.get_notes(db, patient_id=patient.id)
+            # End the read transaction so no connection is held during the
+            # model call; sessions here do not expire objects on commit
+            await db.commit()
+            generated = await generate(patient, notes)
+            entry = SummaryEntry(
+                watermark, generated.summary, datetime.now(timezone.utc)
+            )
+            await self.store(db, patient_id=patient.id, entry=entry)
+
+        return summary_response(entry, cached=cached)
+
+    async def invalidate(self, db: AsyncSession, *, patient_ids: Iterable[int]) -> None:
+        """
+        Drop stored summaries for the given patients. The delete joins the
+        caller's transaction and is committed with the write that caused it.
+        """
+        patient_ids = set(patient_ids)
+        if not patient_ids:
+            return
+        summary_cache.invalidate(*patient_ids)
+        await db.execute(
+            delete(CachedSummary).where(CachedSummary.patient_id.in_(patient_ids))
+        )
+
+    async def store(
+        self, db: AsyncSession, *, patient_id: int, entry: SummaryEntry
+    ) -> None:
+        """
+        Save a generated summary to the table and the LRU, and commit.
+        """
+        values = {
+            "note_count": entry.watermark.note_count,
+            "max_note_id": entry.watermark.max_note_id,
+            "notes_updated_at": entry.watermark.notes_updated_at,
+            "patient_info": entry.watermark.patient_info,
+            "summary": entry.summary,
+            "generated_at": entry.generated_at,
+        }
+        dialect_insert = {
+            "postgresql": postgresql_insert,
+            "sqlite": sqlite_insert,
+        }[db.get_bind().dialect.name]
+        # Upsert, so concurrent regenerations for one patient both succeed
+        await db.execute(
+            dialect_insert(CachedSummary)
+            .values(patient_id=patient_id, **values)
+            .on_conflict_do_update(index_elements=["patient_id"], set_=values)
+        )
+        await db.commit()
+        summary_cache.set(db.get_bind(), patient_id, entry)
+
+
+def summary_response(entry: SummaryEntry, *, cached: bool) -> PatientSummary:
+    return PatientSummary(
+        patient_info=entry.watermark.patient_info,
+        summary=entry.summary,
+        cached=cached,
+        generated_at=entry.generated_at,
+        cache_age_seconds=(
+            datetime.now(timezone.utc) - entry.generated_at
+        ).total_seconds(),
+    )
+
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    # SQLite returns naive datetimes; the server clock and ours are both UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+summary = CRUDSummary()
@@ -0,0 +1,135 @@
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import instrument_crud
+from app.models.summary_job import ACTIVE_STATUSES, SummaryJob
+
+
+@instrument_crud
+class CRUDSummaryJob:
+    async def get(self, db: AsyncSession, *, id: int) -> SummaryJob | None:
+        return await db.get(SummaryJob, id)
+
+    async def get_active_for_patient(
+        self, db: AsyncSession, *, patient_id: int
+    ) -> SummaryJob | None:
+        """
+        The patient's latest job that is still queued or running, if any.
+        """
+        result = await db.scalars(
+            select(SummaryJob)
+            .where(
+                SummaryJob.patient_id == patient_id,
+                SummaryJob.status.in_(ACTIVE_STATUSES),
+            )
+            .order_by(SummaryJob.id.desc())
+            .limit(1)
+        )
+        return result.first()
+
+    async def create(
+        self, db: AsyncSession, *, patient_id: int, priority: int = 0
+    ) -> SummaryJob | None:
+        """
+        Queue a job for the patient. Returns None if the patient already has
+        a queued or running job, as decided by the partial unique index, so
+        of two concurrent requests only one inserts.
+        """
+        dialect_insert = {
+            "postgresql": postgresql_insert,
+            "sqlite": sqlite_insert,
+        }[db.get_bind().dialect.name]
+        result = await db.scalars(
+            dialect_insert(SummaryJob)
+            .values(patient_id=patient_id, priority=priority)
+            .on_conflict_do_nothing(
+                index_elements=[SummaryJob.patient_id],
+                index_where=SummaryJob.status.in_(ACTIVE_STATUSES),
+            )
+            .returning(SummaryJob)
+        )
+        job = result.one_or_none()
+        await db.commit()
+        return job
+
+    async def claim(self, db: AsyncSession, *, id: int) -> SummaryJob | None:
+        """
+        Move a queued job to running. Returns None if it is not queued, so
+        a job picked up twice (say by two processes after a restart) runs once.
+        """
+        result = await db.scalars(
+            update(SummaryJob)
+            .where(SummaryJob.id == id, SummaryJob.status == "queued")
+            .values(
+                status="running",
+                started_at=func.now(),
+                attempts=SummaryJob.attempts + 1,
+            )
+            .returning(SummaryJob)
+            .execution_options(populate_existing=True)
+        )
+        job = result.one_or_none()
+        await db.commit()
+        return job
+
+    async def finish(
+        self,
+        db: AsyncSession,
+        *,
+        id: int,
+        patient_info: str | None = None,
+        summary: str | None = None,
+        error: str | None = None,
+    ) -> None:
+        """
+        Record a job's result: succeeded with its summary, or failed with
+        `error`.
+        """
+        await db.execute(
+            update(SummaryJob)
+            .where(SummaryJob.id == id)
+            .values(
+                status="failed" if error is not None else "succeeded",
+                patient_info=patient_info,
+                summary=summary,
+                error=error,
+                finished_at=func.now(),
+            )
+        )
+        await db.commit()
+
+    async def requeue_abandoned(
+        self, db: AsyncSession, *, started_before: datetime
+    ) -> int:
+        """
+        Queue again the jobs left running since before `started_before`, by a
+        process that stopped mid-job. Returns how many were requeued.
+        """
+        result = await db.execute(
+            update(SummaryJob)
+            .where(
+                SummaryJob.status == "running",
+                SummaryJob.started_at < started_before,
+            )
+            .values(status="queued", started_at=None)
+        )
+        await db.commit()
+        return result.rowcount
+
+    async def get_queued(self, db: AsyncSession) -> list[tuple[int, int]]:
+        """
+        `(id, priority)` of every queued job, in the order to run them.
+        """
+        result = await db.execute(
+            select(SummaryJob.id, SummaryJob.priority)
+            .where(SummaryJob.status == "queued")
+            .order_by(SummaryJob.priority.desc(), SummaryJob.id)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+summary_job = CRUDSummaryJob()
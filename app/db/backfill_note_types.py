@@ -0,0 +1,81 @@
+"""
+Classify existing notes with the note classifier, in chunks.
+
+By default only notes stored as "general" (or without a type) are looked at;
+`--all` reclassifies every note, keeping a note's type where the model is
+unsure. Safe to stop and run again.
+
+    python -m app.db.backfill_note_types [--all] [--chunk-size 1000]
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app import crud
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal, engine
+from app.utils.note_classifier import UNCLASSIFIED_TYPE, classify_texts
+
+
+async def backfill_note_types(
+    engine: AsyncEngine = engine,
+    *,
+    chunk_size: int = settings.NOTE_CLASSIFIER_BACKFILL_CHUNK_SIZE,
+    reclassify_all: bool = False,
+) -> tuple[int, int]:
+    """
+    Walk the notes in id order, `chunk_size` at a time, classify each chunk
+    in the classifier's thread pool and store the changed types, one commit
+    per chunk. Returns the number of notes read and changed.
+    """
+    note_types = None if reclassify_all else [UNCLASSIFIED_TYPE, None]
+    after_id = read = changed = 0
+    async with AsyncSessionLocal(bind=engine) as db:
+        while True:
+            rows = await crud.note.get_chunk_after(
+                db, after_id=after_id, limit=chunk_size, note_types=note_types
+            )
+            if not rows:
+                break
+            predicted = await classify_texts([row.content for row in rows])
+            updates = {
+                row.id: note_type
+                for row, note_type in zip(rows, predicted)
+                if note_type is not None and note_type != row.note_type
+            }
+            await crud.note.set_note_types(
+                db,
+                note_types=updates,
+                patient_ids={row.patient_id for row in rows if row.id in updates},
+            )
+            after_id = rows[-1].id
+            read += len(rows)
+            changed += len(updates)
+    return read, changed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--all", action="store_true", help="Reclassify every note")
+    parser.add_argument(
+        "--chunk-size", type=int, default=settings.NOTE_CLASSIFIER_BACKFILL_CHUNK_SIZE
+    )
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    read, changed = await backfill_note_types(
+        chunk_size=args.chunk_size, reclassify_all=args.all
+    )
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    print(
+        f"Classified {read} notes in {elapsed:.1f}s "
+        f"({read / elapsed if elapsed else 0:.0f} notes/s), {changed} changed"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,58 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from typing import Any
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.db.pool import InstrumentedAsyncQueuePool
+from app.db.replicas import ReplicaRouter
+
+
+def create_db_engine(url: str | None = None, **kwargs: Any) -> AsyncEngine:
+    """
+    Create an async engine with the pool configured from settings and SQL
+    timing metrics. Every engine in the application should come from here.
+    """
+    url = make_url(url or str(settings.SQLALCHEMY_DATABASE_URI))
+    options: dict[str, Any] = {}
+
+    # In-memory SQLite lives in a single connection, so it keeps its static pool
+    if not (
+        url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+    ):
+        options.update(
+            poolclass=InstrumentedAsyncQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
 
-engine = create_async_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    if url.drivername == "postgresql+asyncpg":
+        # Both asyncpg's own cache and SQLAlchemy's adapter cache; 0 disables
+        # them, as PgBouncer in transaction mode requires
+        options["connect_args"] = {
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        }
+
+    options.update(kwargs)
+    engine = create_async_engine(url, **options)
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+engine = create_db_engine()
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Read replicas for get_read_db; empty unless SQLALCHEMY_REPLICA_URIS is set
+replica_router = ReplicaRouter(
+    [create_db_engine(url) for url in settings.SQLALCHEMY_REPLICA_URIS],
+    retry_seconds=settings.REPLICA_RETRY_SECONDS,
+)
+
 Base = declarative_base()
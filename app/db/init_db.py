@@ -1,19 +1,53 @@
 import asyncio
-from sqlalchemy.ext.asyncio import create_async_engine
-from app.db.base import Base
-from app.core.config import settings
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db.base import engine
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+# The revision matching the schema create_all built before migrations existed
+CREATE_ALL_REVISION = "0001"
+
+
+def alembic_config(connection: Connection | None = None) -> Config:
+    config = Config(str(ALEMBIC_INI))
+    # alembic/env.py runs on this connection instead of opening its own
+    config.attributes["connection"] = connection
+    return config
+
+
+def _upgrade(connection: Connection) -> None:
+    config = alembic_config(connection)
+    tables = inspect(connection).get_table_names()
+    # Alembic manages its own transactions, one per migration
+    connection.commit()
+    if "patients" in tables and "alembic_version" not in tables:
+        print(f"Existing schema without migrations, stamping {CREATE_ALL_REVISION}")
+        command.stamp(config, CREATE_ALL_REVISION)
+    command.upgrade(config, "head")
+
+
+async def upgrade_db(engine: AsyncEngine = engine) -> None:
+    """
+    Apply any pending Alembic migrations.
+    """
+    async with engine.connect() as conn:
+        await conn.run_sync(_upgrade)
 
 
 async def init_db():
     """
-    Initialize the database by creating all tables.
+    Initialize the database by running migrations.
     """
-    print("Creating database tables...")
-    temp_engine = create_async_engine(str(settings.SQLALCHEMY_DATABASE_URI))
-    async with temp_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    await temp_engine.dispose()
-    print("Database tables created successfully!")
+    print("Running database migrations...")
+    await upgrade_db()
+    await engine.dispose()
+    print("Database is up to date!")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+import itertools
+import time
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.requests import HTTPConnection
+
+# Set after a client's successful write; until it expires their reads go to
+# the primary, so they see their own writes despite replication lag
+STICKY_COOKIE = "db_primary_until"
+
+
+class ReplicaRouter:
+    """
+    Round-robin over read replicas, skipping any marked unhealthy until
+    `retry_seconds` have passed.
+    """
+
+    def __init__(self, engines: list[AsyncEngine], retry_seconds: float):
+        self.engines = engines
+        self.retry_seconds = retry_seconds
+        self._turn = itertools.count()
+        self._down_until: dict[AsyncEngine, float] = {}
+
+    def candidates(self) -> list[AsyncEngine]:
+        """
+        Healthy replicas in the order to try them, rotating on every call.
+        """
+        now = time.monotonic()
+        healthy = [
+            engine for engine in self.engines if self._down_until.get(engine, 0) <= now
+        ]
+        if not healthy:
+            return []
+        start = next(self._turn) % len(healthy)
+        return healthy[start:] + healthy[:start]
+
+    def mark_unhealthy(self, engine: AsyncEngine) -> None:
+        self._down_until[engine] = time.monotonic() + self.retry_seconds
+
+
+def wrote_recently(connection: HTTPConnection) -> bool:
+    """
+    Whether the client is inside its read-your-writes window.
+    """
+    try:
+        return float(connection.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
@@ -1,6 +1,12 @@
+import asyncio
+
+from fastapi import Depends, Request
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db import base
 from app.db.base import AsyncSessionLocal
+from app.db.replicas import wrote_recently
 
 
 async def get_db() -> AsyncSession:
@@ -9,3 +15,33 @@ async def get_db() -> AsyncSession:
             yield db
         finally:
             await db.close()
+
+
+async def get_read_db(
+    request: Request, db: AsyncSession = Depends(get_db)
+) -> AsyncSession:
+    """
+    Session for read-only endpoints: the next healthy replica, or the primary
+    session from get_db when no replica is configured or reachable, or the
+    client wrote within the last REPLICA_STICKY_SECONDS.
+    """
+    if wrote_recently(request):
+        yield db
+        return
+
+    for engine in base.replica_router.candidates():
+        replica_db = AsyncSessionLocal(bind=engine)
+        try:
+            # Connect up front so an unreachable replica falls through
+            await replica_db.connection()
+        except (SQLAlchemyError, OSError, asyncio.TimeoutError):
+            await replica_db.close()
+            base.replica_router.mark_unhealthy(engine)
+            continue
+        try:
+            yield replica_db
+        finally:
+            await replica_db.close()
+        return
+
+    yield db
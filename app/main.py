@@ -1,16 +1,60 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.formparsers import MultiPartParser
 
-from app.api.v1 import patients, notes
+from app.api.v1 import patients, notes, diagnostics
 from app.core.config import settings
+from app.core.jobs import summary_jobs
+from app.core.metrics import registry
+from app.core.middleware import (
+    CacheControlMiddleware,
+    MetricsMiddleware,
+    QueryStatsMiddleware,
+    ReadYourWritesMiddleware,
+    UploadSizeLimitMiddleware,
+)
+from app.db.base import engine
+from app.utils.llm_client import close_llm_client
+from app.utils.note_classifier import get_note_classifier
+from app.utils.note_index import close_note_index, sync_note_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the note classifier now rather than on the first note created
+    get_note_classifier()
+    # Summary workers run in the server's event loop, picking up any jobs
+    # that were waiting when it last stopped
+    summary_jobs.start()
+    await summary_jobs.recover(engine)
+    # Map the note vector index back in, embedding only notes it is missing
+    await sync_note_index(engine)
+    yield
+    await summary_jobs.stop()
+    # The LLM client's connection pool belongs to this event loop
+    await close_llm_client()
+    close_note_index()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="Healthcare Data Processing API",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
+# Uploaded files are held in memory up to this size, then spooled to a temp file
+MultiPartParser.spool_max_size = settings.UPLOAD_SPOOL_BYTES
+
+app.add_middleware(UploadSizeLimitMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(CacheControlMiddleware)
+
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -19,8 +63,13 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Lets browser clients read ETags for conditional requests
+        expose_headers=["ETag"],
     )
 
+# Added last so it wraps everything else, including CORS preflights
+app.add_middleware(MetricsMiddleware)
+
 
 @app.get("/health", status_code=200)
 def health_check():
@@ -30,7 +79,22 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    """
+    Prometheus metrics in the text exposition format
+    """
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 app.include_router(
     patients.router, prefix=f"{settings.API_V1_STR}/patients", tags=["patients"]
 )
 app.include_router(notes.router, prefix=settings.API_V1_STR, tags=["notes"])
+app.include_router(
+    diagnostics.router,
+    prefix=f"{settings.API_V1_STR}/diagnostics",
+    tags=["diagnostics"],
+)
@@ -1,5 +1,8 @@
 # This file makes app.models a Python package
 from .patient import Patient
 from .note import PatientNote
+from .summary import CachedSummary
+from .summary_job import SummaryJob
+from . import search  # noqa: F401  registers search index DDL
 
-__all__ = ["Patient", "PatientNote"]
+__all__ = ["Patient", "PatientNote", "CachedSummary", "SummaryJob"]
@@ -1,4 +1,13 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    func,
+)
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
@@ -20,3 +29,36 @@ class PatientNote(Base):
 
     # Relationship with patient
     patient = relationship("Patient", back_populates="notes")
+
+    # One index per listing sort, matching Keyset's (column, id) ordering: the
+    # default descending order is a forward scan and ascending a backward one,
+    # so a patient's page is read in order with no sort step. The (patient_id,
+    # id) index also serves lookups and counts by patient. Built concurrently
+    # by migration 0005 on PostgreSQL
+    __table_args__ = (
+        Index("ix_patient_notes_patient_id_id", patient_id, id),
+        Index(
+            "ix_patient_notes_patient_id_timestamp",
+            patient_id,
+            timestamp.desc(),
+            id.desc(),
+        ),
+        Index(
+            "ix_patient_notes_patient_id_created_at",
+            patient_id,
+            created_at.desc(),
+            id.desc(),
+        ),
+        Index(
+            "ix_patient_notes_patient_id_updated_at",
+            patient_id,
+            updated_at.desc(),
+            id.desc(),
+        ),
+        Index(
+            "ix_patient_notes_patient_id_note_type",
+            patient_id,
+            note_type.desc(),
+            id.desc(),
+        ),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, func
+from sqlalchemy import Column, Integer, String, Date, DateTime, func, literal_column
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
@@ -12,8 +12,22 @@ class Patient(Base):
     medical_record_number = Column(String, unique=True, index=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Bumped by every update, a version for the patient's ETag that does not
+    # depend on updated_at's resolution
+    version = Column(
+        Integer,
+        nullable=False,
+        server_default="0",
+        onupdate=literal_column("version") + 1,
+    )
+    # Bumped by every note write, so the notes collection has a cheap version
+    notes_version = Column(Integer, nullable=False, server_default="0")
 
     # Relationship with notes
     notes = relationship(
         "PatientNote", back_populates="patient", cascade="all, delete-orphan"
     )
+    cached_summary = relationship(
+        "CachedSummary", uselist=False, cascade="all, delete-orphan"
+    )
+    summary_jobs = relationship("SummaryJob", cascade="all, delete-orphan")
@@ -0,0 +1,123 @@
+import sqlite3
+from contextlib import closing
+
+from sqlalchemy import DDL, event
+
+from .note import PatientNote
+from .patient import Patient
+
+
+def _sqlite_has_fts5() -> bool:
+    with closing(sqlite3.connect(":memory:")) as conn:
+        options = {row[0] for row in conn.execute("PRAGMA compile_options")}
+    return "ENABLE_FTS5" in options
+
+
+SQLITE_HAS_FTS5 = _sqlite_has_fts5()
+# FTS5's trigram tokenizer, which can serve substring matches, needs SQLite 3.34+
+SQLITE_HAS_TRIGRAM = SQLITE_HAS_FTS5 and sqlite3.sqlite_version_info >= (3, 34, 0)
+
+# Trigram GIN index so `name ILIKE '%term%'` no longer needs a sequential scan
+PATIENT_NAME_SEARCH_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_patients_name_trgm "
+    "ON patients USING gin (name gin_trgm_ops)",
+]
+
+# External-content FTS5 table over patients.name, kept in sync by triggers
+PATIENT_NAME_SEARCH_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5("
+    "name, content='patients', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN "
+    "INSERT INTO patients_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN "
+    "INSERT INTO patients_fts(patients_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE OF name ON patients "
+    "BEGIN "
+    "INSERT INTO patients_fts(patients_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); "
+    "INSERT INTO patients_fts(rowid, name) VALUES (new.id, new.name); END",
+]
+
+
+# Expression GIN index for full-text search over note content (the query in
+# app/crud/search.py repeats the expression); unlike a stored tsvector
+# column, adding it does not rewrite the table
+NOTE_CONTENT_SEARCH_POSTGRES = [
+    "CREATE INDEX IF NOT EXISTS ix_patient_notes_content_tsv "
+    "ON patient_notes USING gin (to_tsvector('english', content))",
+]
+
+# External-content FTS5 table over patient_notes.content, kept in sync by triggers
+NOTE_CONTENT_SEARCH_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS patient_notes_fts USING fts5("
+    "content, content='patient_notes', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS patient_notes_fts_ai AFTER INSERT ON patient_notes "
+    "BEGIN "
+    "INSERT INTO patient_notes_fts(rowid, content) VALUES (new.id, new.content); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS patient_notes_fts_ad AFTER DELETE ON patient_notes "
+    "BEGIN "
+    "INSERT INTO patient_notes_fts(patient_notes_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS patient_notes_fts_au "
+    "AFTER UPDATE OF content ON patient_notes BEGIN "
+    "INSERT INTO patient_notes_fts(patient_notes_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); "
+    "INSERT INTO patient_notes_fts(rowid, content) VALUES (new.id, new.content); "
+    "END",
+]
+
+
+# Objects created by the DDL above rather than declared on the models, which
+# migration autogenerate must leave alone. FTS5 adds shadow tables named
+# `<table>_data`, `<table>_idx` and so on
+SEARCH_TABLES = ("patients_fts", "patient_notes_fts")
+SEARCH_INDEXES = ("ix_patients_name_trgm", "ix_patient_notes_content_tsv")
+
+
+def is_search_object(name: str | None, type_: str) -> bool:
+    if type_ == "table":
+        return any(name == t or name.startswith(f"{t}_") for t in SEARCH_TABLES)
+    if type_ == "index":
+        return name in SEARCH_INDEXES
+    return False
+
+
+def _sqlite_with_fts5(ddl, target, bind, **kw) -> bool:
+    return bind.dialect.name == "sqlite" and SQLITE_HAS_FTS5
+
+
+def _sqlite_with_trigram(ddl, target, bind, **kw) -> bool:
+    return bind.dialect.name == "sqlite" and SQLITE_HAS_TRIGRAM
+
+
+for statement in PATIENT_NAME_SEARCH_POSTGRES:
+    event.listen(
+        Patient.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
+
+for statement in PATIENT_NAME_SEARCH_SQLITE:
+    event.listen(
+        Patient.__table__,
+        "after_create",
+        DDL(statement).execute_if(callable_=_sqlite_with_trigram),
+    )
+
+for statement in NOTE_CONTENT_SEARCH_POSTGRES:
+    event.listen(
+        PatientNote.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
+
+for statement in NOTE_CONTENT_SEARCH_SQLITE:
+    event.listen(
+        PatientNote.__table__,
+        "after_create",
+        DDL(statement).execute_if(callable_=_sqlite_with_fts5),
+    )
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey
+from app.db.base import Base
+
+
+class CachedSummary(Base):
+    __tablename__ = "patient_summaries"
+
+    patient_id = Column(Integer, ForeignKey("patients.id"), primary_key=True)
+    # Watermark of the notes and patient details the summary was generated from
+    note_count = Column(Integer, nullable=False)
+    max_note_id = Column(Integer)
+    notes_updated_at = Column(DateTime(timezone=True))
+    patient_info = Column(Text, nullable=False)
+    summary = Column(Text, nullable=False)
+    generated_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, func
+from app.db.base import Base
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class SummaryJob(Base):
+    __tablename__ = "summary_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False, index=True)
+    # queued, running, succeeded or failed
+    status = Column(String, nullable=False, server_default="queued")
+    # Higher priorities are run first
+    priority = Column(Integer, nullable=False, server_default="0")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    # The result, once succeeded
+    patient_info = Column(Text)
+    summary = Column(Text)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        # Requeueing on startup reads queued jobs in run order
+        Index("ix_summary_jobs_status_priority_id", status, priority.desc(), id),
+        # At most one queued or running job per patient, even when requests race
+        Index(
+            "ix_summary_jobs_active_patient_id",
+            patient_id,
+            unique=True,
+            postgresql_where=status.in_(ACTIVE_STATUSES),
+            sqlite_where=status.in_(ACTIVE_STATUSES),
+        ),
+    )
@@ -5,6 +5,7 @@ from .patient import (
     PatientUpdate,
     PatientWithNotes,
     PaginatedPatients,
+    PatientBatchGet,
 )
 from .note import (
     PatientNote,
@@ -12,7 +13,17 @@ from .note import (
     PatientNoteUpdate,
     PatientSummary,
     PaginatedNotes,
+    NoteSearchHit,
+    NoteSearchResults,
+    SimilarNote,
+    SimilarNotes,
+    NoteBatchCreated,
+    NoteBatchFailed,
+    NoteBatchResult,
+    NoteBatchGet,
 )
+from .summary_job import SummaryJob
+from .diagnostics import PoolStatus
 
 __all__ = [
     "Patient",
@@ -20,9 +31,20 @@ __all__ = [
     "PatientUpdate",
     "PatientWithNotes",
     "PaginatedPatients",
+    "PatientBatchGet",
     "PatientNote",
     "PatientNoteCreate",
     "PatientNoteUpdate",
     "PatientSummary",
     "PaginatedNotes",
+    "NoteSearchHit",
+    "NoteSearchResults",
+    "SimilarNote",
+    "SimilarNotes",
+    "NoteBatchCreated",
+    "NoteBatchFailed",
+    "NoteBatchResult",
+    "NoteBatchGet",
+    "SummaryJob",
+    "PoolStatus",
 ]
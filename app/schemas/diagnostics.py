@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+
+
+class PoolStatus(BaseModel):
+    pool_class: str
+    size: int | None = None
+    max_overflow: int | None = None
+    timeout: float | None = None
+    in_use: int | None = None
+    idle: int | None = None
+    overflow: int | None = None
+    checkouts: int | None = None
+    timeouts: int | None = None
+    wait_seconds_total: float | None = None
+    wait_seconds_max: float | None = None
+    wait_seconds_avg: float | None = None
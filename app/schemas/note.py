@@ -27,14 +27,62 @@ class PatientNote(PatientNoteBase):
         from_attributes = True
 
 
+class NoteSearchHit(PatientNote):
+    rank: float
+    snippet: str
+
+
+class NoteSearchResults(BaseModel):
+    results: list[NoteSearchHit]
+    total: int | None = None
+    page: int
+    size: int
+    pages: int | None = None
+
+
+class SimilarNote(PatientNote):
+    score: float
+
+
+class SimilarNotes(BaseModel):
+    results: list[SimilarNote]
+
+
+class NoteBatchCreated(BaseModel):
+    index: int
+    id: int
+
+
+class NoteBatchFailed(BaseModel):
+    index: int
+    errors: list[str]
+
+
+class NoteBatchResult(BaseModel):
+    created: list[NoteBatchCreated]
+    failed: list[NoteBatchFailed]
+
+
+class NoteBatchGet(BaseModel):
+    notes: list[PatientNote]
+    # Requested ids with no note
+    missing: list[int]
+
+
 class PatientSummary(BaseModel):
     patient_info: str
     summary: str
+    # Whether the summary was served from the cache rather than regenerated
+    cached: bool = False
+    generated_at: datetime | None = None
+    cache_age_seconds: float | None = None
 
 
 class PaginatedNotes(BaseModel):
     notes: list[PatientNote]
-    total: int
-    page: int
+    total: int | None = None
+    page: int | None = None
     size: int
-    pages: int
+    pages: int | None = None
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
@@ -33,7 +33,15 @@ class PatientWithNotes(Patient):
 # For pagination
 class PaginatedPatients(BaseModel):
     patients: list[Patient]
-    total: int
-    page: int
+    total: int | None = None
+    page: int | None = None
     size: int
-    pages: int
+    pages: int | None = None
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+class PatientBatchGet(BaseModel):
+    patients: list[Patient]
+    # Requested ids with no patient
+    missing: list[int]
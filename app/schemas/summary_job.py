@@ -0,0 +1,21 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class SummaryJob(BaseModel):
+    id: int
+    patient_id: int
+    # queued, running, succeeded or failed
+    status: str
+    priority: int
+    attempts: int
+    # The generated summary, once succeeded
+    patient_info: str | None = None
+    summary: str | None = None
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
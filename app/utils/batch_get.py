@@ -0,0 +1,28 @@
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+
+def parse_ids(values: list[str]) -> list[int]:
+    """
+    Ids for a batchGet request, from repeated `ids` parameters and/or comma
+    separated lists, in request order without duplicates.
+    """
+    ids: dict[int, None] = {}
+    for value in values:
+        for part in value.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                ids[int(part)] = None
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid id: {part!r}")
+    if not ids:
+        raise HTTPException(status_code=400, detail="No ids given")
+    if len(ids) > settings.BATCH_GET_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_GET_MAX_IDS} ids per request",
+        )
+    return list(ids)
@@ -0,0 +1,64 @@
+import hashlib
+from typing import Any
+
+from fastapi import Response
+
+from app.core.config import settings
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Weak ETag from the values a representation depends on, such as a row's
+    id and timestamps or a collection's version counter.
+    """
+    digest = hashlib.blake2b(
+        "|".join(map(str, parts)).encode(), digest_size=12
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches the ETag, using the weak
+    comparison RFC 9110 prescribes for If-None-Match.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    # Cache-Control is added by CacheControlMiddleware like on the 200
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def revalidate_policy() -> str:
+    """
+    Cache-Control for ETagged reads: browsers may keep a private copy but
+    revalidate it with If-None-Match once HTTP_CACHE_MAX_AGE has passed.
+    """
+    if settings.HTTP_CACHE_MAX_AGE > 0:
+        return f"private, max-age={settings.HTTP_CACHE_MAX_AGE}, must-revalidate"
+    return "private, no-cache"
+
+
+# Cache-Control for GET routes by route template. Other API responses get
+# NO_STORE, as they carry patient data without a validator to revalidate with
+REVALIDATED_ROUTES = {
+    f"{settings.API_V1_STR}/patients/{{id}}",
+    f"{settings.API_V1_STR}/patients/{{patient_id}}/notes",
+    f"{settings.API_V1_STR}/patients/{{patient_id}}/notes/{{note_id}}",
+}
+NO_STORE = "no-store"
+
+
+def cache_control_for(method: str, route: str) -> str:
+    if method == "GET" and route in REVALIDATED_ROUTES:
+        return revalidate_policy()
+    return NO_STORE
@@ -0,0 +1,194 @@
+import codecs
+import csv
+import json
+import re
+from typing import Any, AsyncIterator
+
+# Media types accepted by the streaming ingestion endpoints
+NDJSON_TYPES = {"application/x-ndjson", "application/jsonl", "application/ndjson"}
+CSV_TYPES = {"text/csv"}
+
+# Longest line accepted, so a stream without newlines cannot grow without bound
+MAX_LINE_CHARS = 1024 * 1024
+
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+JSON_NUMBER_TAIL = re.compile(r"[0-9eE.+-]*")
+
+
+class RecordError(ValueError):
+    """A record that could not be parsed into a field mapping."""
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Decode a UTF-8 byte stream and yield it line by line without buffering
+    more than one line beyond the current chunk.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.removesuffix("\r")
+        if len(pending) > MAX_LINE_CHARS:
+            raise RecordError(f"Line longer than {MAX_LINE_CHARS} characters")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.removesuffix("\r")
+
+
+async def iter_ndjson_records(
+    lines: AsyncIterator[str],
+) -> AsyncIterator[tuple[int, dict[str, Any] | RecordError]]:
+    """
+    Yield `(row, record)` for each non-blank NDJSON line, numbering from 1.
+    Unparseable lines are yielded as `RecordError` so the caller can report them.
+    """
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row, RecordError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield row, RecordError("Expected a JSON object")
+            continue
+        yield row, record
+
+
+async def until_error(
+    records: AsyncIterator[tuple[int, dict[str, Any] | RecordError]],
+) -> AsyncIterator[tuple[int, dict[str, Any] | RecordError]]:
+    """
+    Pass records through until the stream itself fails, then yield that
+    failure as the next row's `RecordError` and stop, so a caller batching
+    the records still handles the ones read before it.
+    """
+    row = 0
+    try:
+        async for row, record in records:
+            yield row, record
+    except RecordError as e:
+        yield row + 1, e
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Decode a JSON array from a UTF-8 byte stream and yield its items as each
+    one completes, holding no more than the item being read, so a caller can
+    stop partway through. Malformed input raises `RecordError`.
+    """
+    text = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    decoder = json.JSONDecoder()
+    chunks = aiter(chunks)
+    buffer, pos, done = "", 0, False
+
+    async def more() -> bool:
+        # Append the next chunk to what is left unread; False at the end
+        nonlocal buffer, pos, done
+        if done:
+            return False
+        buffer = buffer[pos:]
+        pos = 0
+        if len(buffer) > MAX_LINE_CHARS:
+            raise RecordError(f"Item longer than {MAX_LINE_CHARS} characters")
+        try:
+            buffer += text.decode(await anext(chunks))
+        except StopAsyncIteration:
+            buffer += text.decode(b"", final=True)
+            done = True
+        return True
+
+    # Expecting the opening bracket, the first item or the closing bracket,
+    # an item, a comma or the closing bracket, then nothing
+    state = "start"
+    while True:
+        pos = JSON_WHITESPACE.match(buffer, pos).end()
+        if pos == len(buffer):
+            if await more():
+                continue
+            if state == "end":
+                return
+            raise RecordError("Invalid JSON: unexpected end of input")
+        char = buffer[pos]
+        if state == "start":
+            if char != "[":
+                raise RecordError("Expected a JSON array")
+            pos, state = pos + 1, "first"
+        elif state == "first" and char == "]" or state == "next" and char == "]":
+            pos, state = pos + 1, "end"
+        elif state == "next":
+            if char != ",":
+                raise RecordError("Invalid JSON: expected ',' or ']'")
+            pos, state = pos + 1, "item"
+        elif state == "end":
+            raise RecordError("Invalid JSON: extra data after the array")
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # Most likely cut off by the chunk boundary
+                if await more():
+                    continue
+                raise RecordError(f"Invalid JSON: {e.msg}")
+            if JSON_NUMBER_TAIL.fullmatch(buffer, end) and await more():
+                # A number may carry on into the next chunk
+                continue
+            pos, state = end, "next"
+            yield item
+
+
+async def iter_csv_records(
+    lines: AsyncIterator[str],
+) -> AsyncIterator[tuple[int, dict[str, Any] | RecordError]]:
+    """
+    Yield `(row, record)` for each CSV data row, keyed by the header row.
+    Quoted fields may span lines.
+    """
+    header: list[str] | None = None
+    row = 0
+    record_lines: list[str] = []
+    async for line in lines:
+        record_lines.append(line)
+        # An odd number of quotes means a quoted field continues on the next line
+        if sum(part.count('"') for part in record_lines) % 2:
+            if sum(len(part) for part in record_lines) > MAX_LINE_CHARS:
+                raise RecordError(f"Record longer than {MAX_LINE_CHARS} characters")
+            continue
+        text = "\n".join(record_lines)
+        record_lines = []
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        row += 1
+        if len(values) != len(header):
+            yield row, RecordError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        yield row, dict(zip(header, values))
+
+    if record_lines:
+        yield row + 1, RecordError("Unterminated quoted field")
+
+
+async def batched(items: AsyncIterator[Any], size: int) -> AsyncIterator[list[Any]]:
+    """
+    Group an async iterator into lists of at most `size` items.
+    """
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
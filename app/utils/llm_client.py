@@ -0,0 +1,335 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Hashable
+
+import httpx
+
+from app.core.config import settings
+from app.core.exceptions import LLMUnavailableException
+from app.core.metrics import LLM_COALESCED, LLM_REQUEST_DURATION, LLM_REQUESTS
+from app.utils.summary_chunks import estimate_tokens
+
+# Responses worth another attempt: rate limited, or the provider failing
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """
+    Allow `rate` units per second on average, in bursts of up to `capacity`.
+    Waiters are served in order, so a large request is not starved by a
+    stream of small ones.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        # A request larger than the bucket waits for a full one
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+class SingleFlight:
+    """
+    Run one call per key at a time; callers asking for a key already in
+    flight wait for that call's result (or exception) instead.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            LLM_COALESCED.inc()
+        # A caller giving up (a client disconnecting) must not cancel the
+        # call for the others waiting on it
+        return await asyncio.shield(future)
+
+
+def completion_key(payload: dict) -> str:
+    """
+    Hash of a completion request. Prompts are built only from the patient
+    and their notes, so requests for the same patient at the same note
+    watermark share a key.
+    """
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def retry_after_seconds(response: httpx.Response) -> float | None:
+    """
+    The response's Retry-After header in seconds, if it has a usable one.
+    """
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (at - datetime.now(timezone.utc)).total_seconds())
+
+
+class LLMClient:
+    """
+    Chat completions against an OpenAI-compatible API.
+
+    One instance is shared by the process (see `get_llm_client`), so its
+    connection pool, rate limits and in-flight requests are too. Identical
+    requests made while one is in flight share its response; each attempt
+    waits for the request and token buckets, is bounded by `timeout_seconds`,
+    and is retried on timeouts, connection errors and retryable statuses.
+    """
+
+    def __init__(
+        self,
+        *,
+        base_url: str,
+        api_key: str | None,
+        model: str,
+        timeout_seconds: float,
+        max_retries: int,
+        backoff_seconds: float,
+        max_backoff_seconds: float,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_output_tokens: int,
+        max_connections: int,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.model = model
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_output_tokens = max_output_tokens
+        self.requests = TokenBucket(requests_per_minute / 60, requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+        self._in_flight = SingleFlight()
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            transport=transport,
+        )
+
+    @classmethod
+    def from_settings(
+        cls, transport: httpx.AsyncBaseTransport | None = None
+    ) -> "LLMClient":
+        return cls(
+            base_url=settings.LLM_BASE_URL,
+            api_key=settings.OPENAI_API_KEY,
+            model=settings.LLM_MODEL,
+            timeout_seconds=settings.LLM_TIMEOUT_SECONDS,
+            max_retries=settings.LLM_MAX_RETRIES,
+            backoff_seconds=settings.LLM_RETRY_BACKOFF_SECONDS,
+            max_backoff_seconds=settings.LLM_RETRY_MAX_BACKOFF_SECONDS,
+            requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+            max_output_tokens=settings.LLM_MAX_OUTPUT_TOKENS,
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            transport=transport,
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def complete(self, system: str, prompt: str) -> str:
+        """
+        The model's reply to `prompt` under the `system` instructions.
+        """
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt},
+            ],
+            "max_tokens": self.max_output_tokens,
+            "temperature": 0,
+        }
+        with LLM_REQUEST_DURATION.time():
+            return await self._in_flight.do(
+                completion_key(payload), lambda: self._complete(payload)
+            )
+
+    async def _complete(self, payload: dict) -> str:
+        # Quota counts prompt and completion tokens, so reserve the most the
+        # reply can use
+        tokens = sum(estimate_tokens(m["content"]) for m in payload["messages"])
+        tokens += payload["max_tokens"]
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire()
+            await self.tokens.acquire(tokens)
+            retry_after = None
+            try:
+                # httpx times each read separately; wait_for bounds the call
+                response = await asyncio.wait_for(
+                    self._http.post("/chat/completions", json=payload),
+                    self.timeout_seconds,
+                )
+            except (httpx.TimeoutException, asyncio.TimeoutError):
+                reason = f"timed out after {self.timeout_seconds:g} seconds"
+            except httpx.TransportError as e:
+                reason = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    if response.is_error:
+                        LLM_REQUESTS.inc(outcome="failed")
+                        raise LLMUnavailableException(
+                            f"status {response.status_code}: {response.text[:200]}"
+                        )
+                    try:
+                        content = response.json()["choices"][0]["message"]["content"]
+                    except (ValueError, LookupError, TypeError):
+                        content = None
+                    if not isinstance(content, str):
+                        LLM_REQUESTS.inc(outcome="failed")
+                        raise LLMUnavailableException(
+                            f"unexpected response: {response.text[:200]}"
+                        )
+                    LLM_REQUESTS.inc(outcome="ok")
+                    return content
+                reason = f"status {response.status_code}"
+                retry_after = retry_after_seconds(response)
+
+            if attempt == self.max_retries:
+                LLM_REQUESTS.inc(outcome="failed")
+                raise LLMUnavailableException(
+                    f"{reason} (after {attempt + 1} attempts)"
+                )
+            LLM_REQUESTS.inc(outcome="retried")
+            await asyncio.sleep(self.backoff(attempt, retry_after))
+
+    def backoff(self, attempt: int, retry_after: float | None = None) -> float:
+        """
+        Seconds to wait before retrying after `attempt` (from 0) failed: a
+        uniformly random share of the exponential backoff ("full jitter"), so
+        clients failing together do not retry together, but never less than
+        the server asked for.
+        """
+        ceiling = min(self.max_backoff_seconds, self.backoff_seconds * 2**attempt)
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff_seconds))
+        return delay
+
+
+class FakeLLMTransport(httpx.AsyncBaseTransport):
+    """
+    In-process stand-in for an OpenAI-compatible chat completions server.
+
+    Replies echo the prompt, after `latency` seconds. Statuses queued in
+    `failures` are returned, in order, to the next requests instead (429s
+    with a Retry-After of 0), for testing the client's error handling
+    without a network.
+    """
+
+    def __init__(self, latency: float = 0.0, failures: list[int] | None = None):
+        self.latency = latency
+        self.failures = list(failures or [])
+        self.requests: list[dict] = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "POST" or not request.url.path.endswith(
+            "/chat/completions"
+        ):
+            return httpx.Response(404, json={"error": {"message": "Not found"}})
+        payload = json.loads(await request.aread())
+        self.requests.append(payload)
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        if self.failures:
+            status = self.failures.pop(0)
+            headers = {"retry-after": "0"} if status == 429 else {}
+            return httpx.Response(
+                status, headers=headers, json={"error": {"message": "Injected"}}
+            )
+
+        prompt = payload["messages"][-1]["content"]
+        return httpx.Response(
+            200,
+            json={
+                "id": f"chatcmpl-fake-{len(self.requests)}",
+                "object": "chat.completion",
+                "model": payload["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": prompt},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": estimate_tokens(prompt),
+                    "completion_tokens": estimate_tokens(prompt),
+                    "total_tokens": 2 * estimate_tokens(prompt),
+                },
+            },
+        )
+
+
+_client: LLMClient | None = None
+
+
+def llm_backend() -> str:
+    """
+    The backend summaries are generated with: "mock", "openai" or "fake".
+    """
+    if settings.LLM_BACKEND == "auto":
+        return "openai" if settings.OPENAI_API_KEY else "mock"
+    return settings.LLM_BACKEND
+
+
+def get_llm_client() -> LLMClient:
+    """
+    The process's shared client, created on first use.
+    """
+    global _client
+    if _client is None:
+        transport = FakeLLMTransport() if llm_backend() == "fake" else None
+        _client = LLMClient.from_settings(transport=transport)
+    return _client
+
+
+async def close_llm_client() -> None:
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
@@ -1,7 +1,78 @@
+import asyncio
+
+from app.core.config import settings
+from app.core.metrics import SUMMARY_CHUNKS, SUMMARY_GENERATION_DURATION
 from app.models.note import PatientNote
 from app.models.patient import Patient
 from app.schemas.note import PatientSummary
+from app.utils.llm_client import get_llm_client, llm_backend
+from app.utils.summary_chunks import (
+    chunk_key,
+    chunk_lines,
+    chunk_summary_cache,
+    estimate_tokens,
+    tail_within,
+)
 from datetime import date
+from typing import AsyncIterator
+
+NO_NOTES_SUMMARY = "No clinical notes available for this patient."
+TIMELINE_HEADING = "Clinical Timeline:"
+# System prompts of the map (chunk) and reduce (summary) model calls
+CHUNK_PROMPT = (
+    "You condense clinical timelines. Rewrite the entries below as a shorter "
+    "timeline in the same format, keeping every date, diagnosis, medication "
+    "and result."
+)
+SUMMARY_PROMPT = (
+    "You are a clinical documentation assistant. From the patient header and "
+    "clinical timeline below, write a patient summary with the sections Chief "
+    "Complaints, History of Present Illness, Physical Examination, Assessment "
+    "and Plan. Use only information in the timeline."
+)
+
+
+def patient_age(patient: Patient) -> int:
+    """
+    Age in whole years as of today.
+    """
+    return (date.today() - patient.date_of_birth).days // 365
+
+
+def format_patient_info(patient: Patient) -> str:
+    """
+    One-line patient header shared by every summary variant.
+    """
+    return (
+        f"Name: {patient.name}, Age: {patient_age(patient)}, "
+        f"MRN: {patient.medical_record_number}"
+    )
+
+
+def format_timeline_entry(note: PatientNote) -> str:
+    """
+    One clinical timeline line for the LLM-style summary.
+    """
+    return (
+        f"- {note.timestamp.strftime('%Y-%m-%d %H:%M')} ({note.note_type}): "
+        f"{note.content}"
+    )
+
+
+def summary_sections(patient: Patient, note_count: int) -> list[str]:
+    """
+    The LLM-style summary sections that precede the clinical timeline.
+    """
+    encounters = f"{note_count} encounter{'s' if note_count != 1 else ''}"
+    return [
+        f"Patient Summary for {patient.name} (Age: {patient_age(patient)}, "
+        f"MRN: {patient.medical_record_number})",
+        "Chief Complaints:\n- Based on clinical notes provided",
+        "History of Present Illness:\n- Multiple clinical encounters documented",
+        "Physical Examination:\n- As noted in clinical records",
+        f"Assessment:\n- Based on clinical notes from {encounters}",
+        "Plan:\n- Ongoing monitoring and treatment as per clinical notes",
+    ]
 
 
 async def generate_patient_summary(
@@ -11,13 +82,7 @@ async def generate_patient_summary(
     Generate a patient summary using LLM.
     This is a mock implementation that will be replaced with actual LLM integration.
     """
-    # Calculate patient age
-    today = date.today()
-    age = (today - patient.date_of_birth).days // 365
-
-    patient_info = (
-        f"Name: {patient.name}, Age: {age}, MRN: {patient.medical_record_number}"
-    )
+    patient_info = format_patient_info(patient)
 
     if not notes:
         summary = "No clinical notes available for this patient."
@@ -48,12 +113,7 @@ def generate_mock_summary_for_testing(
     """
     Generate a mock summary for testing purposes without async.
     """
-    today = date.today()
-    age = (today - patient.date_of_birth).days // 365
-
-    patient_info = (
-        f"Name: {patient.name}, Age: {age}, MRN: {patient.medical_record_number}"
-    )
+    patient_info = format_patient_info(patient)
 
     if not notes:
         summary = "No clinical notes available for this patient."
@@ -82,45 +142,130 @@ async def generate_patient_summary_with_llm(
     Generate a patient summary using actual LLM integration.
     This function would call an LLM API to create a comprehensive summary.
     """
-    # Calculate patient age
-    today = date.today()
-    age = (today - patient.date_of_birth).days // 365
+    with SUMMARY_GENERATION_DURATION.time(
+        generator="generate_patient_summary_with_llm"
+    ):
+        return await _generate_patient_summary_with_llm(patient, notes)
 
-    patient_info = (
-        f"Name: {patient.name}, Age: {age}, MRN: {patient.medical_record_number}"
-    )
+
+async def _generate_patient_summary_with_llm(
+    patient: Patient, notes: list[PatientNote]
+) -> PatientSummary:
+    patient_info = format_patient_info(patient)
 
     if not notes:
-        summary = "No clinical notes available for this patient."
+        summary = NO_NOTES_SUMMARY
     else:
         # Prepare the prompt for the LLM
-        notes_text = "\n".join(
-            [
-                f"- {note.timestamp.strftime('%Y-%m-%d %H:%M')} ({note.note_type}): {note.content}"
-                for note in sorted(notes, key=lambda x: x.timestamp)
-            ]
-        )
+        entries = [
+            format_timeline_entry(note)
+            for note in sorted(notes, key=lambda x: x.timestamp)
+        ]
+        timeline = "\n".join(entries)
+        budget = settings.SUMMARY_CHUNK_TOKENS
+        # Too long for one prompt: summarise it in chunks (map), then the
+        # chunk summaries in chunks, level by level, until they fit in the
+        # prompt the summary is written from (reduce)
+        while estimate_tokens(timeline) > budget:
+            chunks = chunk_lines(entries, budget)
+            entries = await summarise_chunks(chunks)
+            previous, timeline = timeline, "\n".join(entries)
+            if llm_backend() == "mock":
+                # The mock keeps its input, so one level is the whole timeline
+                break
+            if estimate_tokens(timeline) >= estimate_tokens(previous):
+                # The model is not condensing any further: send the most
+                # recent part that fits rather than overflow its context
+                timeline = tail_within(timeline, budget)
+                break
+        summary = await reduce_timeline(patient, len(notes), timeline)
 
-        # In a real implementation, we would call an LLM API like OpenAI
-        # For now, we'll return a structured summary that mimics what an LLM might produce
-        summary = f"""Patient Summary for {patient.name} (Age: {age}, MRN: {patient.medical_record_number})
+    return PatientSummary(patient_info=patient_info, summary=summary)
 
-Chief Complaints:
-- Based on clinical notes provided
 
-History of Present Illness:
-- Multiple clinical encounters documented
+async def summarise_chunks(chunks: list[list[str]]) -> list[str]:
+    """
+    Summaries of chunks of timeline entries, in order. Chunks summarised
+    before are served from the chunk cache, so after a new note usually only
+    the last chunk goes to the model; the rest are summarised
+    SUMMARY_MAP_CONCURRENCY at a time.
+    """
+    semaphore = asyncio.Semaphore(settings.SUMMARY_MAP_CONCURRENCY)
+
+    async def summarise(chunk: list[str]) -> str:
+        key = chunk_key(chunk)
+        partial = chunk_summary_cache.get(key)
+        if partial is not None:
+            SUMMARY_CHUNKS.inc(result="hit")
+            return partial
+        SUMMARY_CHUNKS.inc(result="miss")
+        async with semaphore:
+            partial = await summarise_chunk(chunk)
+        chunk_summary_cache.set(key, partial)
+        return partial
 
-Physical Examination:
-- As noted in clinical records
+    return list(await asyncio.gather(*(summarise(chunk) for chunk in chunks)))
 
-Assessment:
-- Based on clinical notes from {len(notes)} encounter{"s" if len(notes) != 1 else ""}
 
-Plan:
-- Ongoing monitoring and treatment as per clinical notes
+async def summarise_chunk(entries: list[str]) -> str:
+    """
+    The map step: a summary of one chunk of timeline entries.
+    """
+    if llm_backend() != "mock":
+        return await get_llm_client().complete(CHUNK_PROMPT, "\n".join(entries))
+    # The mock keeps the entries as they are, so chunked summaries read the same
+    await _mock_model_latency()
+    return "\n".join(entries)
 
-Clinical Timeline:
-{notes_text}"""
 
-    return PatientSummary(patient_info=patient_info, summary=summary)
+async def reduce_timeline(patient: Patient, note_count: int, timeline: str) -> str:
+    """
+    The reduce step: the summary from the patient's timeline, or from the
+    chunk summaries standing in for it.
+    """
+    if llm_backend() != "mock":
+        prompt = (
+            f"{format_patient_info(patient)}, Notes: {note_count}\n\n"
+            f"{TIMELINE_HEADING}\n{timeline}"
+        )
+        return await get_llm_client().complete(SUMMARY_PROMPT, prompt)
+    # The mock returns a structured summary that mimics what an LLM might produce
+    await _mock_model_latency()
+    sections = summary_sections(patient, note_count)
+    return "\n\n".join(sections + [f"{TIMELINE_HEADING}\n{timeline}"])
+
+
+async def _mock_model_latency() -> None:
+    # Stands in for a model call's latency, for load testing without an LLM
+    if settings.LLM_MOCK_LATENCY_SECONDS > 0:
+        await asyncio.sleep(settings.LLM_MOCK_LATENCY_SECONDS)
+
+
+async def stream_patient_summary_with_llm(
+    patient: Patient, note_count: int, notes: AsyncIterator[PatientNote]
+) -> AsyncIterator[tuple[str, str]]:
+    """
+    Produce the summary of `generate_patient_summary_with_llm` incrementally
+    as `(event, text)` pairs, consuming notes in timestamp order as they arrive.
+    This is the mock's summary; with a model backend the endpoint sends a
+    generated one through `summary_events` instead.
+    """
+    yield "patient_info", format_patient_info(patient)
+    if not note_count:
+        yield "section", NO_NOTES_SUMMARY
+        return
+
+    for section in summary_sections(patient, note_count):
+        yield "section", section
+    yield "section", TIMELINE_HEADING
+    async for note in notes:
+        yield "timeline", format_timeline_entry(note)
+
+
+async def summary_events(summary: PatientSummary) -> AsyncIterator[tuple[str, str]]:
+    """
+    A finished summary as stream events: its header, then the whole summary
+    as one section.
+    """
+    yield "patient_info", summary.patient_info
+    yield "section", summary.summary
@@ -0,0 +1,250 @@
+import asyncio
+import functools
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import NOTES_CLASSIFIED
+from app.schemas.note import PatientNoteCreate
+
+# The type notes are stored with when the client does not know better; only
+# these are classified, so a type chosen by the client is kept
+UNCLASSIFIED_TYPE = "general"
+
+# Words of two or more characters starting with a letter; hyphenated terms
+# such as "x-ray" stay whole, and numbers (doses, results) are skipped
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]*(?:-[a-z0-9]+)*")
+
+# Hashed feature space; collisions are rare at this size for clinical text
+N_FEATURES = 2**18
+
+# Typical wording of each note type, from which the built-in model is fitted
+SEED_EXAMPLES: dict[str, list[str]] = {
+    "admission": [
+        "Admitted to the medical ward from the emergency department",
+        "Admission note: chief complaint and history of present illness",
+        "Patient presented with chest pain and was admitted for observation",
+        "Admitting diagnosis community acquired pneumonia, admission orders written",
+        "Past medical history, allergies and home medications reviewed on admission",
+    ],
+    "progress": [
+        "Progress note: patient's condition improved overnight",
+        "Continues on current medication, symptoms improving, plan unchanged",
+        "Hospital day 3, no overnight events, tolerating diet",
+        "Follow-up visit: reports improvement, blood pressure better controlled",
+        "Subjective objective assessment and plan, continue monitoring",
+        "Routine checkup, patient doing well, reports occasional fatigue",
+    ],
+    "discharge": [
+        "Discharged home in stable condition",
+        "Discharge summary: hospital course, discharge diagnosis and medications",
+        "Discharge instructions given, follow-up appointment scheduled in two weeks",
+        "Patient discharged with prescription to continue antibiotics",
+        "Cleared for discharge, return precautions discussed",
+    ],
+    "lab": [
+        "Laboratory results: complete blood count and basic metabolic panel",
+        "Hemoglobin hematocrit white blood cell count platelets",
+        "Sodium potassium chloride bicarbonate creatinine glucose mg/dL mmol/L",
+        "HbA1c lipid panel cholesterol triglycerides within reference range",
+        "Blood culture and urinalysis pending, specimen collected",
+        "CBC WBC BMP CMP results reviewed, hemoglobin g/dL",
+        "Lab values abnormal: elevated troponin and liver enzymes",
+    ],
+    "imaging": [
+        "Chest x-ray: no acute cardiopulmonary findings",
+        "CT scan of the abdomen and pelvis with contrast",
+        "MRI brain without contrast, impression: no acute infarct",
+        "Ultrasound shows no evidence of deep vein thrombosis",
+        "Radiology report findings and impression, opacity in the left lower lobe",
+    ],
+    "consult": [
+        "Consult note: thank you for this referral",
+        "Cardiology consulted for evaluation of atrial fibrillation",
+        "Reason for consultation and recommendations to the primary team",
+        "Seen at the request of the referring physician, specialist opinion",
+        "Will follow along, recommendations discussed with the primary team",
+    ],
+    "procedure": [
+        "Procedure note: prepped and draped in the usual sterile fashion",
+        "Local anesthesia administered, incision made and sutured",
+        "Patient tolerated the procedure well with no complications",
+        "Estimated blood loss minimal, specimen sent to pathology",
+        "Informed consent obtained, time out performed before the procedure",
+    ],
+}
+
+
+@functools.lru_cache(maxsize=2**20)
+def _word_hash(word: str) -> int:
+    # crc32 is stable across processes, unlike hash(), so saved models match;
+    # clinical vocabulary repeats, so most words are hashed once
+    return zlib.crc32(word.encode())
+
+
+def count_terms(texts: Sequence[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Hashed bag-of-words (words and word pairs) counts of a batch of texts as
+    sparse triples `(doc, feature, count)`, sorted by document.
+    """
+    hashes: list[int] = []
+    lengths: list[int] = []
+    for text in texts:
+        words = TOKEN_PATTERN.findall(text.lower())
+        hashes.extend(map(_word_hash, words))
+        lengths.append(len(words))
+    words = np.asarray(hashes, dtype=np.int64)
+    doc = np.repeat(np.arange(len(texts)), lengths)
+    # Word pairs are hashed from their words' hashes, within each text
+    paired = doc[1:] == doc[:-1]
+    pairs = words[:-1][paired] * 1000003 + words[1:][paired]
+    keys = np.concatenate([doc, doc[:-1][paired]]) * N_FEATURES
+    keys += np.concatenate([words, pairs]) % N_FEATURES
+    keys, counts = np.unique(keys, return_counts=True)
+    doc, feature = np.divmod(keys, N_FEATURES)
+    return doc, feature, counts
+
+
+class NoteClassifier:
+    """
+    Nearest-centroid classifier over TF-IDF weighted hashed bag-of-words
+    vectors. A note's scores are its cosine similarity to each type's
+    centroid; terms the model never saw carry no weight, so a note with
+    nothing recognisable scores 0 for every type.
+    """
+
+    def __init__(self, labels: Sequence[str], idf: np.ndarray, centroids: np.ndarray):
+        self.labels = list(labels)
+        self.idf = idf
+        self.centroids = centroids
+
+    @classmethod
+    def fit(cls, examples: dict[str, list[str]]) -> "NoteClassifier":
+        labels = list(examples)
+        texts = [text for label in labels for text in examples[label]]
+        targets = np.repeat(
+            np.arange(len(labels)), [len(examples[label]) for label in labels]
+        )
+        doc, feature, counts = count_terms(texts)
+
+        df = np.bincount(feature, minlength=N_FEATURES)
+        idf = np.zeros(N_FEATURES, dtype=np.float32)
+        seen = df > 0
+        idf[seen] = np.log((1 + len(texts)) / (1 + df[seen])) + 1
+
+        model = cls(labels, idf, np.zeros((len(labels), N_FEATURES), np.float32))
+        weights, norms = model._weigh(len(texts), doc, feature, counts)
+        centroids = np.zeros((len(labels), N_FEATURES), dtype=np.float32)
+        np.add.at(centroids, (targets[doc], feature), weights / norms[doc])
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+        model.centroids = centroids
+        return model
+
+    @classmethod
+    def load(cls, path: str) -> "NoteClassifier":
+        with np.load(path) as data:
+            labels = [str(label) for label in data["labels"]]
+            return cls(labels, data["idf"], data["centroids"])
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path, labels=np.array(self.labels), idf=self.idf, centroids=self.centroids
+        )
+
+    def _weigh(
+        self, n: int, doc: np.ndarray, feature: np.ndarray, counts: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # Sublinear term frequency times IDF, with each document's norm
+        weights = (1 + np.log(counts)) * self.idf[feature]
+        norms = np.sqrt(np.bincount(doc, weights=weights**2, minlength=n))
+        return weights, norms
+
+    def scores(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Cosine similarity of each text to each type, shape (texts, labels).
+        """
+        n = len(texts)
+        doc, feature, counts = count_terms(texts)
+        weights, norms = self._weigh(n, doc, feature, counts)
+        # Only the (sparse) features present are looked up in the centroids
+        contributions = self.centroids[:, feature] * weights
+        scores = np.stack(
+            [np.bincount(doc, weights=row, minlength=n) for row in contributions],
+            axis=1,
+        )
+        return np.divide(
+            scores, norms[:, None], out=np.zeros_like(scores), where=norms[:, None] > 0
+        )
+
+    def predict(self, texts: Sequence[str], min_score: float) -> list[str | None]:
+        """
+        The best type of each text, or None where no type scores `min_score`.
+        """
+        if not texts:
+            return []
+        scores = self.scores(texts)
+        best = scores.argmax(axis=1)
+        return [
+            self.labels[label] if score >= min_score else None
+            for label, score in zip(best, scores[np.arange(len(texts)), best])
+        ]
+
+
+_classifier: NoteClassifier | None = None
+# Classifying is CPU-bound, so it runs here rather than blocking the event loop
+_executor = ThreadPoolExecutor(
+    max_workers=settings.NOTE_CLASSIFIER_WORKERS, thread_name_prefix="note-classifier"
+)
+
+
+def get_note_classifier() -> NoteClassifier:
+    """
+    The process's classifier, loaded from NOTE_CLASSIFIER_MODEL_PATH or
+    fitted to the built-in examples on first use.
+    """
+    global _classifier
+    if _classifier is None:
+        if settings.NOTE_CLASSIFIER_MODEL_PATH:
+            _classifier = NoteClassifier.load(settings.NOTE_CLASSIFIER_MODEL_PATH)
+        else:
+            _classifier = NoteClassifier.fit(SEED_EXAMPLES)
+    return _classifier
+
+
+async def classify_texts(texts: Sequence[str]) -> list[str | None]:
+    """
+    Predict note types in the classifier's thread pool.
+    """
+    classifier = get_note_classifier()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor,
+        classifier.predict,
+        list(texts),
+        settings.NOTE_CLASSIFIER_MIN_SCORE,
+    )
+
+
+async def assign_note_types(notes: Sequence[PatientNoteCreate]) -> None:
+    """
+    Set the type of notes sent without one from their content, in one batch.
+    Notes the model is unsure of stay "general"; a type the client sent,
+    "general" included, is kept.
+    """
+    if not settings.NOTE_CLASSIFIER_ENABLED:
+        return
+    pending = [
+        note
+        for note in notes
+        if "note_type" not in note.model_fields_set or note.note_type is None
+    ]
+    if not pending:
+        return
+    predicted = await classify_texts([note.content for note in pending])
+    for note, note_type in zip(pending, predicted):
+        note.note_type = note_type or UNCLASSIFIED_TYPE
+        NOTES_CLASSIFIED.inc(note_type=note.note_type)
@@ -0,0 +1,114 @@
+import itertools
+import re
+import zlib
+from typing import Sequence
+
+import numpy as np
+
+# Word characters, so numbers and units ("mg", "142") count as words too
+WORD_PATTERN = re.compile(r"\w+")
+
+# Only the start of very long notes is embedded; it is where their subject is
+MAX_EMBED_CHARS = 20000
+
+
+class HashedNgramEmbedder:
+    """
+    Embed text as signed, hashed counts of its words and their character
+    trigrams, L2-normalised. Needs no training or network, and trigrams make
+    spelling variants ("haemoglobin", "hemoglobin") land close together.
+
+    Each distinct word's feature hashes are computed once and kept in flat
+    arrays, so a batch is embedded by looking up word ids and gathering
+    their features with NumPy. Not thread-safe; the note index calls it from
+    a single thread.
+    """
+
+    name = "hashed-ngram"
+
+    def __init__(self, dim: int, max_vocabulary: int = 2**20):
+        self.dim = dim
+        self.max_vocabulary = max_vocabulary
+        self._reset()
+
+    def _reset(self) -> None:
+        self._vocabulary: dict[str, int] = {}
+        self._hashes = np.zeros(0, dtype=np.int64)
+        # Features of word i are _hashes[_offsets[i]:_offsets[i + 1]]
+        self._offsets = np.zeros(1, dtype=np.int64)
+
+    @staticmethod
+    def _features(word: str) -> list[int]:
+        marked = f"<{word}>"
+        grams = [word] + [marked[i : i + 3] for i in range(len(marked) - 2)]
+        # crc32 is stable across processes, so stored vectors stay comparable
+        return [zlib.crc32(gram.encode()) for gram in grams]
+
+    def _word_ids(self, texts: Sequence[str]) -> tuple[list[int], list[int]]:
+        vocabulary = self._vocabulary
+        new: list[list[int]] = []
+
+        def add(word: str) -> int:
+            vocabulary[word] = len(vocabulary)
+            new.append(self._features(word))
+            return vocabulary[word]
+
+        ids: list[int] = []
+        lengths: list[int] = []
+        for text in texts:
+            words = WORD_PATTERN.findall(text[:MAX_EMBED_CHARS].lower())
+            ids.extend(
+                [
+                    vocabulary[word] if word in vocabulary else add(word)
+                    for word in words
+                ]
+            )
+            lengths.append(len(words))
+        if new:
+            sizes = np.fromiter(map(len, new), dtype=np.int64, count=len(new))
+            self._hashes = np.concatenate(
+                [
+                    self._hashes,
+                    np.fromiter(itertools.chain.from_iterable(new), np.int64),
+                ]
+            )
+            self._offsets = np.concatenate(
+                [self._offsets, self._offsets[-1] + np.cumsum(sizes)]
+            )
+        return ids, lengths
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Unit vectors of the texts, shape (texts, dim); all zeros for a text
+        without words.
+        """
+        if len(self._vocabulary) > self.max_vocabulary:
+            # Rare words (ids, dates) would otherwise grow it without bound
+            self._reset()
+        ids, lengths = self._word_ids(texts)
+        words = np.asarray(ids, dtype=np.int64)
+        doc = np.repeat(np.arange(len(texts)), lengths)
+        # Gather every word's run of feature hashes in one go
+        starts = self._offsets[words]
+        counts = self._offsets[words + 1] - starts
+        run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+        positions = np.repeat(starts, counts) + np.arange(counts.sum()) - run_starts
+        hashed = self._hashes[positions]
+        # The top bit picks the sign, so collisions tend to cancel out
+        signs = np.where(hashed & 0x80000000, -1.0, 1.0)
+        vectors = (
+            np.bincount(
+                np.repeat(doc, counts) * self.dim + hashed % self.dim,
+                weights=signs,
+                minlength=len(texts) * self.dim,
+            )
+            .reshape(len(texts), self.dim)
+            .astype(np.float32)
+        )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+# Embedders by NOTE_EMBEDDER name; each takes the vector dimension
+EMBEDDERS = {HashedNgramEmbedder.name: HashedNgramEmbedder}
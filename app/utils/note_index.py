@@ -0,0 +1,365 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Sequence
+
+import numpy as np
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app import crud
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal
+from app.utils.note_embeddings import EMBEDDERS
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per matrix multiply, to bound memory on large indexes
+SEARCH_BLOCK_ROWS = 65536
+INITIAL_CAPACITY = 1024
+
+
+class NoteVectorIndex:
+    """
+    Note vectors in a matrix, searched by cosine similarity (the vectors are
+    unit length, so a matrix product) with top-k selection per query.
+
+    With a `path`, the matrix and its (note id, patient id) rows are .npy
+    files opened as memory maps, written through as notes are added and
+    removed, and `meta.json` records how many rows are in use and which
+    embedder made them; reopening the directory maps the files back without
+    embedding anything. Removal moves the last row into the freed one.
+    """
+
+    def __init__(self, dim: int, embedder: str, path: str | None = None):
+        self.dim = dim
+        self.embedder = embedder
+        self.path = Path(path) if path else None
+        self._count = 0
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._ids = np.zeros((0, 2), dtype=np.int64)
+        self._rows: dict[int, int] = {}
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self._load()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _load(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        try:
+            meta = json.loads((self.path / "meta.json").read_text())
+        except (OSError, ValueError):
+            meta = {}
+        if (meta.get("dim"), meta.get("embedder")) != (self.dim, self.embedder):
+            # New, unreadable, or made by another embedder: start empty
+            self._resize(INITIAL_CAPACITY, count=0)
+            self._write_meta()
+            return
+        self._vectors = np.load(self.path / "vectors.npy", mmap_mode="r+")
+        self._ids = np.load(self.path / "ids.npy", mmap_mode="r+")
+        self._count = min(meta["count"], len(self._ids))
+        self._rows = {
+            int(id): row for row, id in enumerate(self._ids[: self._count, 0])
+        }
+
+    def _write_meta(self) -> None:
+        meta = {"dim": self.dim, "embedder": self.embedder, "count": self._count}
+        tmp = self.path / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.path / "meta.json")
+
+    def _resize(self, capacity: int, count: int) -> None:
+        if self.path is None:
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            ids = np.zeros((capacity, 2), dtype=np.int64)
+        else:
+            # Written beside the live files and swapped in, so a crash leaves
+            # one or the other
+            vectors = np.lib.format.open_memmap(
+                self.path / "vectors.npy.tmp",
+                mode="w+",
+                dtype=np.float32,
+                shape=(capacity, self.dim),
+            )
+            ids = np.lib.format.open_memmap(
+                self.path / "ids.npy.tmp",
+                mode="w+",
+                dtype=np.int64,
+                shape=(capacity, 2),
+            )
+        vectors[:count] = self._vectors[:count]
+        ids[:count] = self._ids[:count]
+        if self.path is not None:
+            vectors.flush()
+            ids.flush()
+            os.replace(self.path / "vectors.npy.tmp", self.path / "vectors.npy")
+            os.replace(self.path / "ids.npy.tmp", self.path / "ids.npy")
+        self._vectors, self._ids, self._count = vectors, ids, count
+
+    def _flush(self) -> None:
+        if self.path is not None:
+            self._vectors.flush()
+            self._ids.flush()
+            self._write_meta()
+
+    def note_ids(self) -> np.ndarray:
+        with self._lock:
+            return np.array(self._ids[: self._count, 0])
+
+    def vector(self, note_id: int) -> np.ndarray | None:
+        with self._lock:
+            row = self._rows.get(note_id)
+            return None if row is None else np.array(self._vectors[row])
+
+    def add(
+        self, note_ids: Sequence[int], patient_ids: Sequence[int], vectors: np.ndarray
+    ) -> None:
+        """
+        Add or replace the vectors of notes.
+        """
+        with self._lock:
+            for note_id, patient_id, vector in zip(note_ids, patient_ids, vectors):
+                row = self._rows.get(note_id)
+                if row is None:
+                    if self._count == len(self._ids):
+                        self._resize(
+                            max(INITIAL_CAPACITY, 2 * self._count), self._count
+                        )
+                    row = self._count
+                    self._count += 1
+                    self._rows[note_id] = row
+                self._vectors[row] = vector
+                self._ids[row] = (note_id, patient_id)
+            self._flush()
+
+    def remove(self, note_ids: Iterable[int]) -> int:
+        """
+        Remove notes' vectors; returns how many were indexed.
+        """
+        removed = 0
+        with self._lock:
+            for note_id in note_ids:
+                row = self._rows.pop(note_id, None)
+                if row is None:
+                    continue
+                last = self._count - 1
+                if row != last:
+                    self._vectors[row] = self._vectors[last]
+                    self._ids[row] = self._ids[last]
+                    self._rows[int(self._ids[row, 0])] = row
+                self._count = last
+                removed += 1
+            if removed:
+                self._flush()
+        return removed
+
+    def remove_patient(self, patient_id: int) -> int:
+        with self._lock:
+            ids = self._ids[: self._count]
+            note_ids = ids[ids[:, 1] == patient_id, 0].tolist()
+        return self.remove(note_ids)
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        *,
+        patient_id: int | None = None,
+        exclude: Iterable[int] = (),
+    ) -> list[list[tuple[int, float]]]:
+        """
+        The `k` most similar notes to each query vector, best first, as
+        (note id, cosine similarity) pairs; only the patient's notes with
+        `patient_id`, and never the notes in `exclude`.
+        """
+        exclude = np.fromiter(exclude, dtype=np.int64)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        with self._lock:
+            ids = self._ids[: self._count]
+            if patient_id is None:
+                rows = None
+                total = self._count
+            else:
+                rows = np.flatnonzero(ids[:, 1] == patient_id)
+                total = len(rows)
+            for start in range(0, total, SEARCH_BLOCK_ROWS):
+                if rows is None:
+                    end = min(start + SEARCH_BLOCK_ROWS, total)
+                    block = np.arange(start, end)
+                    vectors = self._vectors[start:end]
+                else:
+                    block = rows[start : start + SEARCH_BLOCK_ROWS]
+                    vectors = self._vectors[block]
+                scores = queries @ vectors.T
+                if len(exclude):
+                    scores[:, np.isin(ids[block, 0], exclude)] = -np.inf
+                # Cut the block down to each query's best k before merging it
+                # with the best so far, so only small arrays are copied
+                if scores.shape[1] > k:
+                    top = np.argpartition(scores, -k, axis=1)[:, -k:]
+                    scores = np.take_along_axis(scores, top, axis=1)
+                    block = block[top]
+                else:
+                    block = np.broadcast_to(block, scores.shape)
+                best_scores = np.concatenate([best_scores, scores], axis=1)
+                best_rows = np.concatenate([best_rows, block], axis=1)
+                if best_scores.shape[1] > k:
+                    top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                    best_scores = np.take_along_axis(best_scores, top, axis=1)
+                    best_rows = np.take_along_axis(best_rows, top, axis=1)
+            order = np.argsort(-best_scores, axis=1, kind="stable")
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            best_ids = ids[np.take_along_axis(best_rows, order, axis=1), 0]
+        return [
+            [
+                (int(id), float(score))
+                for id, score in zip(row_ids, row_scores)
+                if score > -np.inf
+            ]
+            for row_ids, row_scores in zip(best_ids, best_scores)
+        ]
+
+
+_index: NoteVectorIndex | None = None
+_embedder = None
+# Embedding and searching are CPU-bound; one thread also keeps index updates
+# in the order they were made
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="note-index")
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        _embedder = EMBEDDERS[settings.NOTE_EMBEDDER](settings.NOTE_EMBEDDING_DIM)
+    return _embedder
+
+
+def get_note_index() -> NoteVectorIndex:
+    """
+    The process's index, opened from NOTE_INDEX_PATH on first use.
+    """
+    global _index
+    if _index is None:
+        _index = NoteVectorIndex(
+            settings.NOTE_EMBEDDING_DIM,
+            settings.NOTE_EMBEDDER,
+            path=settings.NOTE_INDEX_PATH,
+        )
+    return _index
+
+
+def close_note_index() -> None:
+    """
+    Forget the index; its files are up to date after every change.
+    """
+    global _index, _embedder
+    _index = _embedder = None
+
+
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+def _add(notes: Sequence[tuple[int, int, str]]) -> None:
+    vectors = get_embedder().embed([content for _, _, content in notes])
+    get_note_index().add(
+        [note_id for note_id, _, _ in notes],
+        [patient_id for _, patient_id, _ in notes],
+        vectors,
+    )
+
+
+async def index_notes(notes: Sequence[tuple[int, int, str]]) -> None:
+    """
+    Embed and index `(note id, patient id, content)` triples.
+    """
+    if settings.NOTE_INDEX_ENABLED and notes:
+        await _run(_add, notes)
+
+
+async def unindex_notes(note_ids: Sequence[int]) -> None:
+    if settings.NOTE_INDEX_ENABLED:
+        await _run(get_note_index().remove, note_ids)
+
+
+async def unindex_patient(patient_id: int) -> None:
+    if settings.NOTE_INDEX_ENABLED:
+        await _run(get_note_index().remove_patient, patient_id)
+
+
+def _similar_to_note(
+    note_id: int, content: str, k: int, patient_id: int | None
+) -> list[tuple[int, float]]:
+    index = get_note_index()
+    vector = index.vector(note_id)
+    if vector is None:
+        vector = get_embedder().embed([content])[0]
+    return index.search(vector[None, :], k, patient_id=patient_id, exclude=[note_id])[0]
+
+
+def _similar_to_text(
+    text: str, k: int, patient_id: int | None
+) -> list[tuple[int, float]]:
+    vectors = get_embedder().embed([text])
+    return get_note_index().search(vectors, k, patient_id=patient_id)[0]
+
+
+async def similar_to_note(
+    note_id: int, content: str, *, k: int, patient_id: int | None = None
+) -> list[tuple[int, float]]:
+    """
+    The notes most like a note (itself excluded), by its indexed vector.
+    """
+    return await _run(_similar_to_note, note_id, content, k, patient_id)
+
+
+async def similar_to_text(
+    text: str, *, k: int, patient_id: int | None = None
+) -> list[tuple[int, float]]:
+    """
+    The notes most like a piece of free text.
+    """
+    return await _run(_similar_to_text, text, k, patient_id)
+
+
+async def sync_note_index(engine: AsyncEngine) -> None:
+    """
+    Bring the index in line with patient_notes after a restart: embed notes
+    added while this process was not running and drop deleted ones. Notes
+    already indexed are not embedded again.
+    """
+    if not settings.NOTE_INDEX_ENABLED:
+        return
+    index = await _run(get_note_index)
+    indexed = set(index.note_ids().tolist())
+    added = 0
+    try:
+        async with AsyncSessionLocal(bind=engine) as db:
+            stored = await crud.note.get_all_ids(db)
+            missing = sorted(stored - indexed)
+            chunk_size = settings.NOTE_INDEX_SYNC_CHUNK_SIZE
+            for start in range(0, len(missing), chunk_size):
+                rows = await crud.note.get_many(
+                    db,
+                    missing[start : start + chunk_size],
+                    columns=[
+                        crud.note.model.id,
+                        crud.note.model.patient_id,
+                        crud.note.model.content,
+                    ],
+                )
+                await index_notes([tuple(row) for row in rows])
+                added += len(rows)
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning("Could not sync the note index: %s", e)
+        return
+    removed = await _run(index.remove, indexed - stored)
+    if added or removed:
+        logger.info("Note index: embedded %d notes, dropped %d", added, removed)
@@ -0,0 +1,22 @@
+from typing import Any, Iterable
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import Row
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    orjson-encoded response for content that is already plain data, such as
+    rows read from the database with the response schema's columns. Skips
+    FastAPI's response model validation and jsonable_encoder pass.
+    """
+
+    def render(self, content: Any) -> bytes:
+        # UTC datetimes end in "Z", as Pydantic writes them
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+def rows_to_dicts(rows: Iterable[Row]) -> list[dict[str, Any]]:
+    # Column-only selects name their columns after the schema fields
+    return [row._asdict() for row in rows]
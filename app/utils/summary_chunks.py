@@ -0,0 +1,84 @@
+import hashlib
+from collections import OrderedDict
+from typing import Sequence
+
+from app.core.config import settings
+
+# Rough characters per token of English clinical text, used to budget prompts
+# without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def tail_within(text: str, budget: int) -> str:
+    """
+    The end of `text` that fits in `budget` estimated tokens, cut at a line
+    boundary where one falls within it.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    tail = text[len(text) - (budget - 1) * CHARS_PER_TOKEN :]
+    _, newline, rest = tail.partition("\n")
+    return rest if newline and rest else tail
+
+
+def chunk_lines(lines: Sequence[str], budget: int) -> list[list[str]]:
+    """
+    Split lines, in order, into consecutive chunks of at most `budget`
+    estimated tokens; a line over the budget gets a chunk of its own.
+    Chunks are filled from the start, so appending lines only ever changes
+    the last chunk.
+    """
+    chunks: list[list[str]] = []
+    used = budget
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if used + tokens > budget:
+            chunks.append([])
+            used = 0
+        chunks[-1].append(line)
+        used += tokens
+    return chunks
+
+
+def chunk_key(lines: Sequence[str]) -> str:
+    """
+    Content hash of a chunk, including the model that summarises it.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(settings.LLM_MODEL.encode())
+    for line in lines:
+        digest.update(b"\0" + line.encode())
+    return digest.hexdigest()
+
+
+class ChunkSummaryCache:
+    """
+    In-process LRU of chunk summaries keyed by `chunk_key`. Entries never go
+    stale, as any change to a chunk's notes changes its key.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, str] = OrderedDict()
+
+    def get(self, key: str) -> str | None:
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def set(self, key: str, summary: str) -> None:
+        self._entries[key] = summary
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+chunk_summary_cache = ChunkSummaryCache(maxsize=settings.SUMMARY_CHUNK_CACHE_SIZE)
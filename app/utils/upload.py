@@ -0,0 +1,93 @@
+import codecs
+
+from fastapi import UploadFile
+
+from app.core.exceptions import UnsupportedUploadException, UploadTooLargeException
+
+# Declared content types accepted for note uploads besides text/*; clients
+# commonly send octet-stream (or nothing) for plain .txt files
+TEXT_UPLOAD_TYPES = {
+    "application/json",
+    "application/xml",
+    "application/octet-stream",
+    "",
+}
+
+# Byte order marks, longest first so UTF-32 is not mistaken for UTF-16
+BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+# Used when the leading bytes are not valid UTF-8; decodes any byte sequence
+FALLBACK_ENCODING = "cp1252"
+
+
+def _parse_content_type(content_type: str | None) -> tuple[str, str | None]:
+    media_type, _, params = (content_type or "").partition(";")
+    charset = None
+    for param in params.split(";"):
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "charset":
+            charset = value.strip().strip('"') or None
+    return media_type.strip().lower(), charset
+
+
+def detect_encoding(head: bytes, content_type: str | None) -> str:
+    """
+    Pick the encoding for an upload from its BOM, its declared charset or,
+    failing both, whether its leading bytes are valid UTF-8.
+    """
+    media_type, charset = _parse_content_type(content_type)
+    if not media_type.startswith("text/") and media_type not in TEXT_UPLOAD_TYPES:
+        raise UnsupportedUploadException(f"content type {media_type} is not text")
+
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+
+    if charset:
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            raise UnsupportedUploadException(f"unknown charset {charset}")
+
+    if b"\x00" in head:
+        raise UnsupportedUploadException("file appears to be binary")
+
+    try:
+        # A multi-byte character may be cut off at the end of the sample
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+    return "utf-8"
+
+
+async def read_text_upload(file: UploadFile, *, max_bytes: int, chunk_size: int) -> str:
+    """
+    Read an uploaded text file in fixed-size chunks, decoding incrementally.
+    Undecodable bytes are replaced rather than failing the upload.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLargeException(max_bytes)
+
+    chunk = await file.read(chunk_size)
+    encoding = detect_encoding(chunk, file.content_type)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    parts = []
+    size = 0
+    while chunk:
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLargeException(max_bytes)
+        parts.append(decoder.decode(chunk))
+        # Text columns cannot hold NUL, and text files do not contain it
+        if "\x00" in parts[-1]:
+            raise UnsupportedUploadException("file appears to be binary")
+        chunk = await file.read(chunk_size)
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
@@ -0,0 +1,219 @@
+"""
+Benchmark list endpoint serialisation: ORM objects through Pydantic against
+column-only rows through orjson.
+
+Seeds a patient with a page of large notes, then times building the response
+body of list_patient_notes and list_patients both ways, with and without the
+database fetch:
+
+- orm: ORM objects validated into the response schema, re-validated and
+  dumped by the response model and encoded with json, as FastAPI does for a
+  returned model
+- rows: a column-only select whose rows are encoded directly by orjson, as
+  the endpoints now do
+
+    python benchmarks/list_serialization.py
+    python benchmarks/list_serialization.py --content-bytes 200000 --limit 100
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import string
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import delete, insert  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app import crud, schemas  # noqa: E402
+from app.crud.pagination import Keyset  # noqa: E402
+from app.db.base import create_db_engine  # noqa: E402
+from app.db.init_db import upgrade_db  # noqa: E402
+from app.models import Patient, PatientNote  # noqa: E402
+from app.utils.serialization import FastJSONResponse, rows_to_dicts  # noqa: E402
+
+
+async def seed(session_factory, limit: int, content_bytes: int) -> int:
+    rng = random.Random(42)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=7)) for _ in range(500)]
+    async with session_factory() as db:
+        await db.execute(delete(PatientNote))
+        await db.execute(delete(Patient))
+        await db.execute(
+            insert(Patient),
+            [
+                {
+                    "name": f"Serialised Patient {i}",
+                    "date_of_birth": date(1930 + i % 90, 1 + i % 12, 1 + i % 28),
+                    "medical_record_number": f"SER{i:09d}",
+                }
+                for i in range(limit)
+            ],
+        )
+        await db.execute(
+            insert(PatientNote),
+            [
+                {
+                    "patient_id": 1,
+                    "content": " ".join(
+                        rng.choice(words) for _ in range(content_bytes // 8)
+                    ),
+                    "note_type": "progress",
+                }
+                for _ in range(limit)
+            ],
+        )
+        await db.commit()
+    return 1
+
+
+def orm_body(adapter: TypeAdapter, page) -> bytes:
+    # What FastAPI does with a returned model: validate it against the
+    # response model, dump it in JSON mode and encode it with JSONResponse
+    value = adapter.validate_python(page, from_attributes=True)
+    content = adapter.dump_python(value, mode="json")
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+async def fetch_notes(db, patient_id: int, limit: int, columns=None):
+    keyset = Keyset(PatientNote, "timestamp", "desc")
+    notes, total = await crud.note.get_multi_by_patient(
+        db,
+        patient_id=patient_id,
+        limit=limit,
+        keyset=keyset,
+        columns=columns,
+    )
+    return notes, total, keyset
+
+
+async def fetch_patients(db, limit: int, columns=None):
+    keyset = Keyset(Patient, "id", "asc")
+    patients, total = await crud.patient.get_multi_with_filter(
+        db, limit=limit, keyset=keyset, columns=columns
+    )
+    return patients, total, keyset
+
+
+def page_content(
+    key: str, items, total: int, limit: int, keyset: Keyset, convert=list
+) -> dict:
+    next_cursor, prev_cursor = keyset.cursors(items, limit=limit)
+    return {
+        key: convert(items),
+        "total": total,
+        "page": 1,
+        "size": limit,
+        "pages": (total + limit - 1) // limit,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
+
+
+async def time_path(
+    session_factory, repeat: int, fetch, encode
+) -> tuple[float, float, int]:
+    """
+    Median total and serialisation-only milliseconds, and the body size.
+    """
+    totals, serialise = [], []
+    size = 0
+    for _ in range(repeat):
+        async with session_factory() as db:
+            started = time.perf_counter()
+            fetched = await fetch(db)
+            encode_started = time.perf_counter()
+            body = encode(*fetched)
+            finished = time.perf_counter()
+        totals.append((finished - started) * 1000)
+        serialise.append((finished - encode_started) * 1000)
+        size = len(body)
+    return statistics.median(totals), statistics.median(serialise), size
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="sqlite+aiosqlite:///bench_lists.db")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--content-bytes", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_db_engine(args.url)
+    await upgrade_db(engine)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    patient_id = await seed(session_factory, args.limit, args.content_bytes)
+    limit = args.limit
+
+    notes_adapter = TypeAdapter(schemas.PaginatedNotes)
+    patients_adapter = TypeAdapter(schemas.PaginatedPatients)
+    note_columns = crud.note.columns_for(schemas.PatientNote)
+    patient_columns = crud.patient.columns_for(schemas.Patient)
+
+    paths = {
+        ("notes", "orm"): (
+            lambda db: fetch_notes(db, patient_id, limit),
+            lambda notes, total, keyset: orm_body(
+                notes_adapter,
+                schemas.PaginatedNotes(
+                    **page_content("notes", notes, total, limit, keyset)
+                ),
+            ),
+        ),
+        ("notes", "rows"): (
+            lambda db: fetch_notes(db, patient_id, limit, note_columns),
+            lambda rows, total, keyset: FastJSONResponse(
+                page_content("notes", rows, total, limit, keyset, rows_to_dicts)
+            ).body,
+        ),
+        ("patients", "orm"): (
+            lambda db: fetch_patients(db, limit),
+            lambda patients, total, keyset: orm_body(
+                patients_adapter,
+                schemas.PaginatedPatients(
+                    **page_content("patients", patients, total, limit, keyset)
+                ),
+            ),
+        ),
+        ("patients", "rows"): (
+            lambda db: fetch_patients(db, limit, patient_columns),
+            lambda rows, total, keyset: FastJSONResponse(
+                page_content("patients", rows, total, limit, keyset, rows_to_dicts)
+            ).body,
+        ),
+    }
+
+    results = {}
+    for key, (fetch, encode) in paths.items():
+        results[key] = await time_path(session_factory, args.repeat, fetch, encode)
+
+    print(
+        f"\nMedian over {args.repeat} runs, limit {limit}, "
+        f"~{args.content_bytes} byte notes"
+    )
+    print(f"{'endpoint':<10}{'path':<6}{'total ms':>10}{'encode ms':>11}{'bytes':>11}")
+    for (endpoint, path), (total, encode, size) in results.items():
+        print(f"{endpoint:<10}{path:<6}{total:>10.2f}{encode:>11.2f}{size:>11}")
+    for endpoint in ("notes", "patients"):
+        orm, rows = results[(endpoint, "orm")], results[(endpoint, "rows")]
+        print(
+            f"{endpoint}: {orm[0] / rows[0]:.1f}x faster overall, "
+            f"{orm[1] / rows[1]:.1f}x faster to encode"
+        )
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
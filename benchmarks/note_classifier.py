@@ -0,0 +1,119 @@
+"""
+Measure note classifier throughput in notes per second.
+
+Classifies synthetic notes of about `--words` words in batches of each
+`--batch` size, on one thread and through the classifier's thread pool with
+several batches in flight, then backfills `--notes` stored notes end to end
+(read, classify, update) against `--url`.
+
+    python benchmarks/note_classifier.py --notes 20000 --words 120
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import delete, insert  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.db.backfill_note_types import backfill_note_types  # noqa: E402
+from app.db.base import AsyncSessionLocal, create_db_engine  # noqa: E402
+from app.db.init_db import upgrade_db  # noqa: E402
+from app.models import CachedSummary, Patient, PatientNote, SummaryJob  # noqa: E402
+from app.utils.note_classifier import (  # noqa: E402
+    SEED_EXAMPLES,
+    classify_texts,
+    get_note_classifier,
+)
+
+FILLER = (
+    "patient reports denies noted stable today afternoon mild moderate severe "
+    "left right bilateral history family social plan review daily weekly"
+).split()
+
+
+def synthetic_notes(count: int, words: int) -> list[str]:
+    rng = random.Random(0)
+    phrases = [text for examples in SEED_EXAMPLES.values() for text in examples]
+    notes = []
+    for _ in range(count):
+        text = rng.choice(phrases).split()
+        while len(text) < words:
+            text.append(rng.choice(FILLER))
+        notes.append(" ".join(text))
+    return notes
+
+
+async def seed(engine, notes: list[str]) -> None:
+    async with AsyncSessionLocal(bind=engine) as db:
+        for model in (SummaryJob, CachedSummary, PatientNote, Patient):
+            await db.execute(delete(model))
+        await db.execute(
+            insert(Patient),
+            [
+                {
+                    "name": "Classifier Patient",
+                    "date_of_birth": date(1960, 1, 1),
+                    "medical_record_number": "CLASSIFY000",
+                }
+            ],
+        )
+        patient_id = (await db.execute(Patient.__table__.select())).first().id
+        for start in range(0, len(notes), 5000):
+            await db.execute(
+                insert(PatientNote),
+                [
+                    {"patient_id": patient_id, "content": text}
+                    for text in notes[start : start + 5000]
+                ],
+            )
+        await db.commit()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="sqlite+aiosqlite:///bench_classifier.db")
+    parser.add_argument("--notes", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=80, help="Words per note")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 32, 256, 1024])
+    args = parser.parse_args()
+
+    notes = synthetic_notes(args.notes, args.words)
+    classifier = get_note_classifier()
+    min_score = settings.NOTE_CLASSIFIER_MIN_SCORE
+    print(f"{args.notes} notes of {args.words} words")
+    for size in args.batch:
+        batches = [notes[i : i + size] for i in range(0, len(notes), size)]
+        started = time.perf_counter()
+        for batch in batches:
+            classifier.predict(batch, min_score)
+        serial = len(notes) / (time.perf_counter() - started)
+        started = time.perf_counter()
+        await asyncio.gather(*(classify_texts(batch) for batch in batches))
+        pooled = len(notes) / (time.perf_counter() - started)
+        print(
+            f"batch {size:>5}: {serial:>9.0f} notes/s on one thread, "
+            f"{pooled:>9.0f} notes/s on {settings.NOTE_CLASSIFIER_WORKERS} workers"
+        )
+
+    engine = create_db_engine(args.url)
+    await upgrade_db(engine)
+    await seed(engine, notes)
+    started = time.perf_counter()
+    read, changed = await backfill_note_types(engine)
+    elapsed = time.perf_counter() - started
+    print(
+        f"backfill: {read} notes in {elapsed:.2f}s, {read / elapsed:.0f} notes/s, "
+        f"{changed} typed (chunks of {settings.NOTE_CLASSIFIER_BACKFILL_CHUNK_SIZE})"
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Measure the note vector index: embedding throughput, top-k query latency
+and startup time from the memory-mapped files against re-embedding.
+
+Embeds `--notes` synthetic notes, indexes them in a temporary directory,
+runs `--queries` queries one at a time and in one batch, then reopens the
+index as a restart would.
+
+    python benchmarks/similar_notes.py --notes 200000 --k 10
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings  # noqa: E402
+from app.utils.note_classifier import SEED_EXAMPLES  # noqa: E402
+from app.utils.note_embeddings import EMBEDDERS  # noqa: E402
+from app.utils.note_index import NoteVectorIndex  # noqa: E402
+
+
+def synthetic_notes(count: int, words: int) -> list[str]:
+    rng = random.Random(0)
+    vocabulary = " ".join(
+        text for examples in SEED_EXAMPLES.values() for text in examples
+    ).split()
+    return [" ".join(rng.choices(vocabulary, k=words)) for _ in range(count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--words", type=int, default=60, help="Words per note")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=settings.NOTE_EMBEDDING_DIM)
+    args = parser.parse_args()
+
+    embedder = EMBEDDERS[settings.NOTE_EMBEDDER](args.dim)
+    notes = synthetic_notes(args.notes, args.words)
+    # In chunks, as the index is filled on startup
+    chunk = settings.NOTE_INDEX_SYNC_CHUNK_SIZE
+    started = time.perf_counter()
+    vectors = np.concatenate(
+        [embedder.embed(notes[i : i + chunk]) for i in range(0, len(notes), chunk)]
+    )
+    embed_seconds = time.perf_counter() - started
+    print(
+        f"embedded {args.notes} notes of {args.words} words in {embed_seconds:.2f}s "
+        f"({args.notes / embed_seconds:.0f} notes/s, dim {args.dim}, "
+        f"chunks of {chunk})"
+    )
+
+    with tempfile.TemporaryDirectory() as path:
+        index = NoteVectorIndex(args.dim, embedder.name, path=path)
+        started = time.perf_counter()
+        index.add(
+            range(1, args.notes + 1), [i % 1000 for i in range(args.notes)], vectors
+        )
+        print(f"indexed in {time.perf_counter() - started:.2f}s")
+
+        queries = vectors[: args.queries]
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query[None, :], args.k)
+            latencies.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        index.search(queries, args.k)
+        batched = time.perf_counter() - started
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"top-{args.k} over {args.notes}: p50 {quantiles[49] * 1000:.1f}ms "
+            f"p95 {quantiles[94] * 1000:.1f}ms per query, "
+            f"{batched / args.queries * 1000:.2f}ms per query in one batch"
+        )
+
+        started = time.perf_counter()
+        reopened = NoteVectorIndex(args.dim, embedder.name, path=path)
+        reopened.search(queries[:1], args.k)
+        print(
+            f"restart: reopened {len(reopened)} vectors in "
+            f"{time.perf_counter() - started:.2f}s vs {embed_seconds:.2f}s to re-embed"
+        )
+
+
+if __name__ == "__main__":
+    main()
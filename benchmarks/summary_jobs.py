@@ -0,0 +1,133 @@
+"""
+Load test the summary job queue offline, against the mock generator.
+
+Seeds patients with notes, queues one summary job per patient and runs them
+on a SummaryJobQueue with the given worker count, the mock model waiting
+`--latency` seconds per summary. Prints throughput, queue-to-finish latency
+percentiles and the most database connections checked out at once. No
+connection is held while the model runs, so when its latency dominates
+that peak stays well below the worker count.
+
+    python benchmarks/summary_jobs.py --jobs 500 --workers 16 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import delete, event, insert, select  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.jobs import SummaryJobQueue  # noqa: E402
+from app.crud.summary import summary_cache  # noqa: E402
+from app.crud.summary_job import summary_job  # noqa: E402
+from app.db.base import AsyncSessionLocal, create_db_engine  # noqa: E402
+from app.db.init_db import upgrade_db  # noqa: E402
+from app.models import CachedSummary, Patient, PatientNote, SummaryJob  # noqa: E402
+from app.utils.llm_summary import generate_patient_summary_with_llm  # noqa: E402
+
+
+async def seed(engine, patients: int, notes_per_patient: int) -> list[int]:
+    async with AsyncSessionLocal(bind=engine) as db:
+        for model in (SummaryJob, CachedSummary, PatientNote, Patient):
+            await db.execute(delete(model))
+        await db.execute(
+            insert(Patient),
+            [
+                {
+                    "name": f"Load Patient {i}",
+                    "date_of_birth": date(1930 + i % 90, 1 + i % 12, 1 + i % 28),
+                    "medical_record_number": f"LOAD{i:09d}",
+                }
+                for i in range(patients)
+            ],
+        )
+        patient_ids = list((await db.scalars(select(Patient.id))).all())
+        await db.execute(
+            insert(PatientNote),
+            [
+                {"patient_id": patient_id, "content": f"Load test note {n}"}
+                for patient_id in patient_ids
+                for n in range(notes_per_patient)
+            ],
+        )
+        await db.commit()
+    summary_cache.clear()
+    return patient_ids
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="sqlite+aiosqlite:///bench_jobs.db")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=settings.SUMMARY_JOB_WORKERS)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--notes", type=int, default=5, help="Notes per patient")
+    args = parser.parse_args()
+
+    settings.LLM_MOCK_LATENCY_SECONDS = args.latency
+    engine = create_db_engine(args.url)
+    await upgrade_db(engine)
+    patient_ids = await seed(engine, args.jobs, args.notes)
+
+    checked_out = peak = 0
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def checkout(*_):
+        nonlocal checked_out, peak
+        checked_out += 1
+        peak = max(peak, checked_out)
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def checkin(*_):
+        nonlocal checked_out
+        checked_out -= 1
+
+    queue = SummaryJobQueue(
+        workers=args.workers,
+        timeout_seconds=settings.SUMMARY_JOB_TIMEOUT_SECONDS,
+        generate=generate_patient_summary_with_llm,
+    )
+    queued_at, latencies = {}, []
+    run = queue.run
+
+    async def timed_run(job_id, job_engine):
+        await run(job_id, job_engine)
+        latencies.append(time.perf_counter() - queued_at[job_id])
+
+    queue.run = timed_run
+    queue.start()
+    started = time.perf_counter()
+    async with AsyncSessionLocal(bind=engine) as db:
+        for patient_id in patient_ids:
+            job = await summary_job.create(
+                db, patient_id=patient_id, priority=random.randint(0, 3)
+            )
+            queued_at[job.id] = time.perf_counter()
+            queue.submit(job.id, job.priority, engine)
+    await queue.join()
+    elapsed = time.perf_counter() - started
+    await queue.stop()
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    ideal = args.jobs * args.latency / args.workers
+    print(
+        f"{args.jobs} jobs, {args.workers} workers, {args.latency}s mock latency\n"
+        f"elapsed {elapsed:.2f}s (ideal {ideal:.2f}s), "
+        f"{args.jobs / elapsed:.1f} jobs/s\n"
+        f"latency p50 {quantiles[49]:.2f}s  p95 {quantiles[94]:.2f}s  "
+        f"max {max(latencies):.2f}s\n"
+        f"peak connections checked out: {peak}"
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
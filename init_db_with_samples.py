@@ -2,33 +2,25 @@
 Script to initialize the database with sample data for testing.
 """
 
+import asyncio
 from datetime import date, datetime
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import func, select
 
-from app.core.config import settings
-from app.db.base import Base
+from app.db.base import AsyncSessionLocal
+from app.db.init_db import upgrade_db
 from app.models.patient import Patient
 from app.models.note import PatientNote
 
 
-def init_db_with_samples():
-    # Create sync database engine and session
-    # Replace asyncpg with psycopg2 for sync operations
-    sync_db_uri = str(settings.SQLALCHEMY_DATABASE_URI).replace(
-        "postgresql+asyncpg://", "postgresql://"
-    )
-    engine = create_engine(sync_db_uri)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async def init_db_with_samples():
+    # Create or migrate tables
+    await upgrade_db()
 
-    # Create tables
-    Base.metadata.create_all(bind=engine)
-
-    db = SessionLocal()
+    db = AsyncSessionLocal()
 
     try:
         # Check if patients already exist
-        if db.query(Patient).count() > 0:
+        if (await db.execute(select(func.count(Patient.id)))).scalar() > 0:
             print("Database already has sample data. Skipping initialization.")
             return
 
@@ -54,12 +46,12 @@ def init_db_with_samples():
         db.add(patient1)
         db.add(patient2)
         db.add(patient3)
-        db.commit()
+        await db.commit()
 
         # Refresh to get IDs
-        db.refresh(patient1)
-        db.refresh(patient2)
-        db.refresh(patient3)
+        await db.refresh(patient1)
+        await db.refresh(patient2)
+        await db.refresh(patient3)
 
         # Create sample notes for patient 1
         note1 = PatientNote(
@@ -120,16 +112,17 @@ def init_db_with_samples():
         db.add(note5)
         db.add(note6)
         db.add(note7)
-        db.commit()
+        await db.commit()
 
         print("Database initialized with sample patients and notes successfully!")
 
     except Exception as e:
         print(f"Error initializing database: {e}")
-        db.rollback()
+        await db.rollback()
     finally:
-        db.close()
+        await db.close()
+        await engine.dispose()
 
 
 if __name__ == "__main__":
-    init_db_with_samples()
+    asyncio.run(init_db_with_samples())
@@ -5,8 +5,11 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 import asyncio
+from contextlib import contextmanager
 import pytest
 import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
@@ -67,8 +70,9 @@ async def session(override_get_db, db_engine):
 
 
 @pytest.fixture(scope="function")
-def client():
+def client(tmp_path, monkeypatch):
     from fastapi.testclient import TestClient
+    from app.core.config import settings
     from app.db.session import get_db
     from sqlalchemy.ext.asyncio import create_async_engine
     from sqlalchemy.orm import sessionmaker
@@ -97,6 +101,8 @@ def client():
 
     # Apply the override
     app.dependency_overrides[get_db] = override_get_db
+    # A note index of the test's own
+    monkeypatch.setattr(settings, "NOTE_INDEX_PATH", str(tmp_path / "note_index"))
 
     # Create the test client
     with TestClient(app) as test_client:
@@ -104,3 +110,36 @@ def client():
 
     # Clean up the override after the test
     app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="function")
+def query_counter():
+    # Records every SQL statement sent to any engine; clear() it before a request
+    statements = []
+
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(scope="function")
+def query_budget(query_counter):
+    # Fails the block if it runs more statements than allowed, listing them:
+    #     with query_budget(2):
+    #         client.get(...)
+    @contextmanager
+    def budget(max_statements):
+        query_counter.clear()
+        yield
+        assert (
+            len(query_counter) <= max_statements
+        ), f"{len(query_counter)} statements, budget {max_statements}:\n" + "\n".join(
+            query_counter
+        )
+
+    return budget
@@ -99,3 +99,164 @@ async def test_get_multi_notes_crud(session: AsyncSession):
 
     assert len(notes) == 3
     assert total == 3
+
+
+@pytest.mark.asyncio
+async def test_keyset_pagination_notes_crud(session: AsyncSession):
+    from datetime import datetime
+
+    from app.crud.pagination import Keyset
+    from app.models.note import PatientNote
+
+    # Create a patient first
+    patient_data = PatientCreate(
+        name="Keyset Test Patient",
+        date_of_birth=date(1990, 1, 1),
+        medical_record_number="MRNTEST005",
+    )
+    created_patient = await patient.create(session, obj_in=patient_data)
+
+    # Create notes with tied timestamps and a mix of null and set note types
+    for i in range(7):
+        note_data = PatientNoteCreate(
+            patient_id=created_patient.id,
+            content=f"Keyset note {i + 1}",
+            timestamp=datetime(2024, 1, 1 + i // 3, 9, 0),
+            note_type=None if i % 3 == 0 else f"type-{i % 2}",
+        )
+        await note.create(session, obj_in=note_data)
+
+    all_notes, _ = await note.get_multi_by_patient(
+        session, patient_id=created_patient.id
+    )
+
+    for sort_by in ("id", "timestamp", "created_at", "updated_at", "note_type"):
+        for sort_order in ("asc", "desc"):
+            # Expected order: NULLs sort after every value, ties broken by id
+            expected = sorted(
+                all_notes,
+                key=lambda n: (
+                    getattr(n, sort_by) is None,
+                    getattr(n, sort_by) or 0,
+                    n.id,
+                ),
+            )
+            expected = [n.id for n in expected]
+            if sort_order == "desc":
+                expected.reverse()
+
+            # Walk forward two notes at a time
+            seen, cursor = [], None
+            while True:
+                keyset = Keyset(PatientNote, sort_by, sort_order, cursor=cursor)
+                page, _ = await note.get_multi_by_patient(
+                    session, patient_id=created_patient.id, limit=2, keyset=keyset
+                )
+                seen.extend(n.id for n in page)
+                next_cursor, prev_cursor = keyset.cursors(page, limit=2)
+                if next_cursor is None:
+                    break
+                cursor = next_cursor
+            assert seen == expected, (sort_by, sort_order)
+
+            # Walk back from the last page to the first
+            back, cursor = [], prev_cursor
+            while cursor is not None:
+                keyset = Keyset(PatientNote, sort_by, sort_order, cursor=cursor)
+                page, _ = await note.get_multi_by_patient(
+                    session, patient_id=created_patient.id, limit=2, keyset=keyset
+                )
+                back = [n.id for n in page] + back
+                cursor = keyset.cursors(page, limit=2)[1]
+            assert back == expected[:-1], (sort_by, sort_order)
+
+
+@pytest.mark.asyncio
+async def test_cached_count_invalidated_on_write(session: AsyncSession):
+    # Create a patient first
+    patient_data = PatientCreate(
+        name="Count Test Patient",
+        date_of_birth=date(1990, 1, 1),
+        medical_record_number="MRNTEST006",
+    )
+    created_patient = await patient.create(session, obj_in=patient_data)
+
+    async def count_notes(**kwargs):
+        _, total = await note.get_multi_by_patient(
+            session, patient_id=created_patient.id, count_strategy="cached", **kwargs
+        )
+        return total
+
+    assert await count_notes() == 0
+
+    # Creating and removing notes drops the cached total
+    note_data = PatientNoteCreate(
+        patient_id=created_patient.id, content="Counted note", note_type="general"
+    )
+    created_note = await note.create(session, obj_in=note_data)
+    assert await count_notes() == 1
+
+    await note.remove(session, id=created_note.id)
+    assert await count_notes() == 0
+
+    # Totals can be skipped entirely
+    assert await count_notes(include_total=False) is None
+
+
+@pytest.mark.asyncio
+async def test_note_search_follows_updates(session: AsyncSession):
+    from app.schemas.note import PatientNoteUpdate
+
+    # Create a patient first
+    patient_data = PatientCreate(
+        name="Search Update Patient",
+        date_of_birth=date(1990, 1, 1),
+        medical_record_number="MRNTEST007",
+    )
+    created_patient = await patient.create(session, obj_in=patient_data)
+
+    note_data = PatientNoteCreate(
+        patient_id=created_patient.id, content="Patient reports headache."
+    )
+    created_note = await note.create(session, obj_in=note_data)
+
+    hits, _ = await note.search(session, text="headache")
+    assert [hit[0].id for hit in hits] == [created_note.id]
+
+    await note.update(
+        session,
+        db_obj=created_note,
+        obj_in=PatientNoteUpdate(content="Patient reports dizziness."),
+    )
+    hits, _ = await note.search(session, text="headache")
+    assert hits == []
+    hits, _ = await note.search(session, text="dizziness")
+    assert [hit[0].id for hit in hits] == [created_note.id]
+
+
+@pytest.mark.asyncio
+async def test_note_writes_leave_patient_updated_at(session: AsyncSession):
+    created_patient = await patient.create(
+        session,
+        obj_in=PatientCreate(
+            name="Untouched Patient",
+            date_of_birth=date(1990, 1, 1),
+            medical_record_number="MRNTEST020",
+        ),
+    )
+    note_in = PatientNoteCreate(patient_id=created_patient.id, content="A note")
+
+    created_note = await note.create_for_patient(session, obj_in=note_in)
+    [batch_id] = await note.create_many(session, objs_in=[note_in])
+    await note.set_note_types(
+        session,
+        note_types={batch_id: "lab"},
+        patient_ids={created_patient.id},
+    )
+    await note.remove_for_patient(
+        session, id=created_note.id, patient_id=created_patient.id
+    )
+
+    await session.refresh(created_patient)
+    assert created_patient.notes_version == 4
+    assert created_patient.updated_at is None
@@ -0,0 +1,150 @@
+import pytest
+from sqlalchemy import exc, text
+from app.db.base import create_db_engine
+from app.db.pool import pool_status
+
+
+@pytest.mark.asyncio
+async def test_instrumented_pool(tmp_path):
+    engine = create_db_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/pool.db",
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            status = pool_status(engine.pool)
+            assert status["pool_class"] == "InstrumentedAsyncQueuePool"
+            assert status["in_use"] == 1
+            assert status["checkouts"] == 1
+
+            # The only connection is taken, so a second checkout times out
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+
+        status = pool_status(engine.pool)
+        assert status["in_use"] == 0
+        assert status["idle"] == 1
+        assert status["timeouts"] == 1
+        assert status["wait_seconds_max"] >= 0.05
+    finally:
+        await engine.dispose()
+
+
+def test_pool_diagnostics_endpoint(client):
+    response = client.get("/api/v1/diagnostics/pool")
+    assert response.status_code == 200
+    # The test client runs on in-memory SQLite, which keeps a static pool
+    assert response.json()["pool_class"] == "StaticPool"
+
+
+def test_metrics_endpoint(client):
+    client.get("/api/v1/patients/424242")
+    patient_response = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Metrics Patient",
+            "date_of_birth": "1991-09-09",
+            "medical_record_number": "MRNMETRIC1",
+        },
+    )
+    client.get(f"/api/v1/patients/{patient_response.json()['id']}/summary")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+
+    # Labelled by route template rather than the requested path
+    assert (
+        'http_requests_total{method="GET",route="/api/v1/patients/{id}",status="404"}'
+        in body
+    )
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert (
+        'http_request_duration_seconds_bucket{method="GET",'
+        'route="/api/v1/patients/{id}",le="+Inf"}' in body
+    )
+    assert (
+        'http_requests_in_progress{method="GET",route="/api/v1/patients/{id}"} 0.0'
+        in body
+    )
+    assert (
+        'summary_generation_seconds_count{generator="generate_patient_summary_with_llm"}'
+        in body
+    )
+
+
+@pytest.mark.asyncio
+async def test_sql_metrics_by_crud_method(tmp_path):
+    from datetime import date
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from app.core.metrics import DB_QUERY_DURATION
+    from app.crud.patient import patient
+    from app.db.base import Base
+    from app.schemas.patient import PatientCreate
+
+    engine = create_db_engine(f"sqlite+aiosqlite:///{tmp_path}/metrics.db")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        labels = {"crud_method": "CRUDPatient.create", "operation": "INSERT"}
+        before = DB_QUERY_DURATION.count(**labels)
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            await patient.create(
+                session,
+                obj_in=PatientCreate(
+                    name="Timed Patient",
+                    date_of_birth=date(1970, 1, 1),
+                    medical_record_number="MRNTIMED01",
+                ),
+            )
+        assert DB_QUERY_DURATION.count(**labels) == before + 1
+    finally:
+        await engine.dispose()
+
+
+def test_query_stats(client, monkeypatch, caplog):
+    import json
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "QUERY_STATS_HEADER", True)
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.0)
+    monkeypatch.setattr(settings, "QUERY_REPEAT_THRESHOLD", 2)
+
+    with caplog.at_level("WARNING"):
+        response = client.post(
+            "/api/v1/patients/",
+            json={
+                "name": "Stats Patient",
+                "date_of_birth": "1966-06-06",
+                "medical_record_number": "MRNSTATS01",
+            },
+        )
+    assert response.headers["X-DB-Query-Count"] == "2"
+    assert float(response.headers["X-DB-Query-Time-Ms"]) >= 0
+
+    # Parameters are logged by type only
+    slow = [r.getMessage() for r in caplog.records if "Slow query" in r.getMessage()]
+    assert any("params=(str, str, str)" in message for message in slow)
+    assert not any("MRNSTATS01" in message for message in slow)
+
+    # The same statement twice in one request is flagged
+    caplog.clear()
+    patient_id = response.json()["id"]
+    with caplog.at_level("WARNING"):
+        client.delete(f"/api/v1/patients/{patient_id}/notes/1")
+    assert not any("possible N+1" in r.getMessage() for r in caplog.records)
+    monkeypatch.setattr(settings, "NOTE_BATCH_CHUNK_SIZE", 1)
+    note = json.dumps({"patient_id": patient_id, "content": "Repeated"})
+    with caplog.at_level("WARNING"):
+        client.post(
+            "/api/v1/notes/batch",
+            content=f"{note}\n" * 3,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+    assert any("possible N+1" in r.getMessage() for r in caplog.records)
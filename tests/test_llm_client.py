@@ -0,0 +1,148 @@
+import asyncio
+import time
+from datetime import date, datetime
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.exceptions import LLMUnavailableException
+from app.models import Patient, PatientNote
+from app.utils import llm_client
+from app.utils.llm_client import FakeLLMTransport, LLMClient, TokenBucket
+from app.utils.llm_summary import generate_patient_summary_with_llm
+from app.utils.summary_chunks import chunk_summary_cache
+
+
+def _client(transport, **overrides):
+    options = dict(
+        base_url="http://llm.test/v1",
+        api_key="test-key",
+        model="test-model",
+        timeout_seconds=1.0,
+        max_retries=3,
+        backoff_seconds=0.001,
+        max_backoff_seconds=0.01,
+        requests_per_minute=60000,
+        tokens_per_minute=10**8,
+        max_output_tokens=64,
+        max_connections=4,
+        transport=transport,
+    )
+    options.update(overrides)
+    return LLMClient(**options)
+
+
+@pytest.mark.asyncio
+async def test_retries_and_timeouts():
+    fake = FakeLLMTransport(failures=[429, 503])
+    client = _client(fake)
+    assert await client.complete("system", "hello") == "hello"
+    # Two failed attempts, then the one that succeeded
+    assert len(fake.requests) == 3
+    assert fake.requests[0]["messages"][0] == {"role": "system", "content": "system"}
+
+    fake.failures = [500] * 3
+    with pytest.raises(LLMUnavailableException, match="after 3 attempts"):
+        await _client(fake, max_retries=2).complete("system", "hello")
+
+    # Client errors are not retried
+    fake.requests.clear()
+    fake.failures = [400]
+    with pytest.raises(LLMUnavailableException, match="status 400"):
+        await client.complete("system", "hello")
+    assert len(fake.requests) == 1
+
+    # A success whose body is not a completion is an upstream failure too
+    for body in ({"content": b"<html>"}, {"json": {"choices": []}}):
+        broken = _client(
+            httpx.MockTransport(lambda _, body=body: httpx.Response(200, **body))
+        )
+        with pytest.raises(LLMUnavailableException, match="unexpected response"):
+            await broken.complete("system", "hello")
+        await broken.aclose()
+
+    # Each attempt is cut off at the timeout
+    slow = FakeLLMTransport(latency=1.0)
+    started = time.perf_counter()
+    with pytest.raises(LLMUnavailableException, match="timed out"):
+        await _client(slow, timeout_seconds=0.02, max_retries=1).complete("s", "p")
+    assert len(slow.requests) == 2
+    assert time.perf_counter() - started < 0.5
+
+    # Backoff is jittered up to the exponential ceiling, and respects Retry-After
+    delays = [client.backoff(2) for _ in range(50)]
+    assert all(0 <= delay <= 0.004 for delay in delays)
+    assert len(set(delays)) > 1
+    assert client.backoff(0, retry_after=0.005) >= 0.005
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_rate_limit():
+    bucket = TokenBucket(rate=100, capacity=2)
+    started = time.perf_counter()
+    for _ in range(6):
+        await bucket.acquire()
+    # The burst of 2 is free, the other 4 wait 10ms each
+    assert time.perf_counter() - started >= 0.035
+
+    fake = FakeLLMTransport()
+    client = _client(fake, requests_per_minute=6000, max_output_tokens=10)
+    client.requests = TokenBucket(rate=100, capacity=1)
+    started = time.perf_counter()
+    await asyncio.gather(*(client.complete("s", f"prompt {i}") for i in range(4)))
+    assert len(fake.requests) == 4
+    assert time.perf_counter() - started >= 0.025
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_share_one_call():
+    fake = FakeLLMTransport(latency=0.02)
+    client = _client(fake)
+    replies = await asyncio.gather(
+        *(client.complete("s", "same") for _ in range(5)),
+        client.complete("s", "other"),
+    )
+    assert replies == ["same"] * 5 + ["other"]
+    assert len(fake.requests) == 2
+    # Finished calls are not cached
+    await client.complete("s", "same")
+    assert len(fake.requests) == 3
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_summaries_through_fake_backend(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BACKEND", "fake")
+    patient = Patient(
+        id=1,
+        name="Fake Backend",
+        date_of_birth=date(1970, 1, 1),
+        medical_record_number="MRNFAKE",
+    )
+    notes = [
+        PatientNote(
+            id=i,
+            patient_id=1,
+            timestamp=datetime(2024, 1, i),
+            content=f"Visit {i}",
+            note_type="progress",
+        )
+        for i in range(1, 4)
+    ]
+    fake = FakeLLMTransport(latency=0.01)
+    monkeypatch.setattr(llm_client, "_client", _client(fake))
+    chunk_summary_cache.clear()
+    try:
+        summaries = await asyncio.gather(
+            *(generate_patient_summary_with_llm(patient, notes) for _ in range(3))
+        )
+        # Concurrent requests for the same patient and notes made one call
+        assert len(fake.requests) == 1
+        assert "Visit 3" in fake.requests[0]["messages"][1]["content"]
+        assert summaries[0] == summaries[1] == summaries[2]
+        assert "MRNFAKE" in summaries[0].summary
+    finally:
+        await llm_client.close_llm_client()
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models import Patient, PatientNote
+from app.utils import llm_summary
+from app.utils.summary_chunks import chunk_lines, chunk_summary_cache, estimate_tokens
+
+
+def _notes(count, start=0):
+    return [
+        PatientNote(
+            id=i + 1,
+            patient_id=1,
+            timestamp=datetime(2024, 1, 1) + timedelta(hours=i),
+            content=f"Visit {i}: blood pressure reviewed, medication unchanged.",
+            note_type="progress",
+        )
+        for i in range(start, start + count)
+    ]
+
+
+def test_chunk_lines():
+    lines = [f"line {i} " + "x" * (i % 7) * 10 for i in range(50)]
+    chunks = chunk_lines(lines, budget=40)
+    assert [line for chunk in chunks for line in chunk] == lines
+    assert all(sum(map(estimate_tokens, chunk)) <= 40 for chunk in chunks)
+    # Appending only changes the last chunk
+    longer = chunk_lines(lines + ["new line"], budget=40)
+    assert longer[: len(chunks) - 1] == chunks[:-1]
+    # Oversized lines get a chunk of their own
+    assert chunk_lines(["a", "b" * 400, "c"], budget=10) == [["a"], ["b" * 400], ["c"]]
+
+
+@pytest.mark.asyncio
+async def test_long_charts_are_summarised_in_chunks(monkeypatch):
+    patient = Patient(
+        id=1,
+        name="Chronic Patient",
+        date_of_birth=date(1950, 1, 1),
+        medical_record_number="MRNCHRONIC",
+    )
+    notes = _notes(200)
+    chunk_summary_cache.clear()
+    whole = await llm_summary.generate_patient_summary_with_llm(patient, notes)
+
+    calls = []
+    in_flight = peak = 0
+    summarise_chunk = llm_summary.summarise_chunk
+
+    async def counting_summarise_chunk(entries):
+        nonlocal in_flight, peak
+        calls.append(entries)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return await summarise_chunk(entries)
+
+    monkeypatch.setattr(llm_summary, "summarise_chunk", counting_summarise_chunk)
+    monkeypatch.setattr(settings, "SUMMARY_CHUNK_TOKENS", 200)
+    monkeypatch.setattr(settings, "SUMMARY_MAP_CONCURRENCY", 3)
+
+    chunked = await llm_summary.generate_patient_summary_with_llm(patient, notes)
+    chunk_count = len(calls)
+    assert chunk_count > 10
+    assert peak == 3
+    # The mock model keeps entries as they are, so the result reads the same
+    assert chunked.summary == whole.summary
+
+    # A new note only sends the last chunk back to the model
+    calls.clear()
+    notes += _notes(1, start=200)
+    await llm_summary.generate_patient_summary_with_llm(patient, notes)
+    assert len(calls) == 1
+    assert "Visit 200" in calls[0][-1]
+
+    # As does editing it
+    calls.clear()
+    notes[-1].content = "Visit 200: amended"
+    await llm_summary.generate_patient_summary_with_llm(patient, notes)
+    assert len(calls) == 1
+
+    # Short charts still go to the model in a single prompt
+    calls.clear()
+    await llm_summary.generate_patient_summary_with_llm(patient, notes[:2])
+    assert calls == []
+    chunk_summary_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_chunk_summaries_are_collapsed_until_they_fit(monkeypatch):
+    patient = Patient(
+        id=1,
+        name="Lifelong Patient",
+        date_of_birth=date(1940, 1, 1),
+        medical_record_number="MRNLIFELONG",
+    )
+    calls = []
+
+    async def condensing_summarise_chunk(entries):
+        calls.append(entries)
+        return f"- {len(entries)} entries from {entries[0][2:30]}"
+
+    async def reduce_timeline(patient, note_count, timeline):
+        return timeline
+
+    _use_model(monkeypatch, condensing_summarise_chunk, reduce_timeline)
+    chunk_summary_cache.clear()
+    try:
+        summary = await llm_summary.generate_patient_summary_with_llm(
+            patient, _notes(200)
+        )
+    finally:
+        chunk_summary_cache.clear()
+
+    # The first level's summaries are too long together, so they are
+    # summarised again before the reduce step
+    first = [call for call in calls if call[0].startswith("- 2024")]
+    second = [call for call in calls if call not in first]
+    assert len(first) > 10
+    assert 1 < len(second) < len(first)
+    assert all("entries from" in entry for call in second for entry in call)
+    timeline = summary.summary
+    assert len(timeline.split("\n")) == len(second)
+    assert estimate_tokens(timeline) <= settings.SUMMARY_CHUNK_TOKENS
+
+
+@pytest.mark.asyncio
+async def test_model_that_stops_condensing_gets_the_latest_that_fits(monkeypatch):
+    patient = Patient(
+        id=1,
+        name="Verbose Patient",
+        date_of_birth=date(1945, 1, 1),
+        medical_record_number="MRNVERBOSE",
+    )
+
+    async def verbose_summarise_chunk(entries):
+        return "\n".join(entries)
+
+    async def reduce_timeline(patient, note_count, timeline):
+        return timeline
+
+    _use_model(monkeypatch, verbose_summarise_chunk, reduce_timeline)
+    chunk_summary_cache.clear()
+    try:
+        summary = await llm_summary.generate_patient_summary_with_llm(
+            patient, _notes(200)
+        )
+    finally:
+        chunk_summary_cache.clear()
+
+    # Cut to the budget at a line boundary, keeping the newest notes
+    timeline = summary.summary
+    assert estimate_tokens(timeline) <= settings.SUMMARY_CHUNK_TOKENS
+    assert timeline.startswith("- 2024")
+    assert timeline.endswith(
+        "Visit 199: blood pressure reviewed, medication unchanged."
+    )
+
+
+def _use_model(monkeypatch, summarise_chunk, reduce_timeline):
+    # Stand-ins for a model backend's map and reduce calls
+    monkeypatch.setattr(llm_summary, "llm_backend", lambda: "openai")
+    monkeypatch.setattr(llm_summary, "summarise_chunk", summarise_chunk)
+    monkeypatch.setattr(llm_summary, "reduce_timeline", reduce_timeline)
+    monkeypatch.setattr(settings, "SUMMARY_CHUNK_TOKENS", 200)
@@ -0,0 +1,163 @@
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    func,
+    inspect,
+    insert,
+)
+from app.db.base import Base, create_db_engine
+from app.db.init_db import alembic_config, upgrade_db
+
+# The tables create_all built from the models before migrations existed
+BASELINE_METADATA = MetaData()
+Table(
+    "patients",
+    BASELINE_METADATA,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, index=True, nullable=False),
+    Column("date_of_birth", Date, nullable=False),
+    Column("medical_record_number", String, unique=True, index=True, nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), onupdate=func.now()),
+)
+Table(
+    "patient_notes",
+    BASELINE_METADATA,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("patient_id", Integer, ForeignKey("patients.id"), nullable=False),
+    Column(
+        "timestamp", DateTime(timezone=True), server_default=func.now(), nullable=False
+    ),
+    Column("content", Text, nullable=False),
+    Column("note_type", String, default="general"),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), onupdate=func.now()),
+)
+
+
+def _schema_diff(connection):
+    from app.models.search import is_search_object
+
+    # Search objects come from raw DDL, as in alembic/env.py
+    context = MigrationContext.configure(
+        connection,
+        opts={"include_name": lambda name, type_, _: not is_search_object(name, type_)},
+    )
+    return compare_metadata(context, Base.metadata)
+
+
+@pytest.mark.asyncio
+async def test_migrations_match_models(tmp_path):
+    engine = create_db_engine(f"sqlite+aiosqlite:///{tmp_path}/migrated.db")
+    try:
+        await upgrade_db(engine)
+        # Running again is a no-op
+        await upgrade_db(engine)
+
+        async with engine.connect() as conn:
+            assert await conn.run_sync(_schema_diff) == []
+            indexes = await conn.run_sync(
+                lambda sync_conn: {
+                    index["name"]: index["column_names"]
+                    for index in inspect(sync_conn).get_indexes("patient_notes")
+                }
+            )
+        assert "ix_patient_notes_patient_id" not in indexes
+        assert indexes["ix_patient_notes_patient_id_timestamp"][0] == "patient_id"
+
+        async with engine.connect() as conn:
+            await conn.run_sync(
+                lambda sync_conn: command.downgrade(alembic_config(sync_conn), "base")
+            )
+            tables = await conn.run_sync(
+                lambda sync_conn: inspect(sync_conn).get_table_names()
+            )
+        assert tables == ["alembic_version"]
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_create_all_database_is_stamped(tmp_path):
+    from datetime import date
+
+    from app import crud
+    from app.db.base import AsyncSessionLocal
+    from app.models.search import SQLITE_HAS_FTS5
+    from app.schemas import PatientCreate, PatientUpdate
+
+    engine = create_db_engine(f"sqlite+aiosqlite:///{tmp_path}/create_all.db")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(BASELINE_METADATA.create_all)
+            await conn.execute(
+                insert(BASELINE_METADATA.tables["patients"]),
+                {
+                    "name": "Existing Patient",
+                    "date_of_birth": date(1970, 1, 1),
+                    "medical_record_number": "MRN000",
+                },
+            )
+            await conn.execute(
+                insert(BASELINE_METADATA.tables["patient_notes"]),
+                {"patient_id": 1, "content": "Persistent cough for two weeks"},
+            )
+        await upgrade_db(engine)
+        async with engine.connect() as conn:
+            assert await conn.run_sync(_schema_diff) == []
+            revision = await conn.run_sync(
+                lambda sync_conn: MigrationContext.configure(
+                    sync_conn
+                ).get_current_revision()
+            )
+            tables = await conn.run_sync(
+                lambda sync_conn: inspect(sync_conn).get_table_names()
+            )
+        assert revision == "0007"
+        assert {"patient_summaries", "summary_jobs"} <= set(tables)
+        if SQLITE_HAS_FTS5:
+            assert "patient_notes_fts" in tables
+
+        # Existing rows get the new columns' defaults, and new writes work
+        async with AsyncSessionLocal(bind=engine) as db:
+            existing = await crud.patient.get_by_mr_number(
+                db, medical_record_number="MRN000"
+            )
+            assert existing.notes_version == 0
+            # Rows from before the search indexes are found, and can change
+            patients, _ = await crud.patient.get_multi_with_filter(
+                db, search="Existing"
+            )
+            assert [patient.id for patient in patients] == [existing.id]
+            matches, _ = await crud.note.search(db, text="cough")
+            assert [note.content for note, _, _ in matches] == [
+                "Persistent cough for two weeks"
+            ]
+            await crud.patient.update(
+                db, db_obj=existing, obj_in=PatientUpdate(name="Renamed Patient")
+            )
+            await crud.note.remove_for_patient(
+                db, id=matches[0][0].id, patient_id=existing.id
+            )
+            assert (await crud.note.search(db, text="cough"))[0] == []
+            await crud.patient.create(
+                db,
+                obj_in=PatientCreate(
+                    name="New Patient",
+                    date_of_birth=date(1980, 1, 1),
+                    medical_record_number="MRN001",
+                ),
+            )
+    finally:
+        await engine.dispose()
@@ -0,0 +1,86 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.db.backfill_note_types import backfill_note_types
+from app.db.base import AsyncSessionLocal, create_db_engine
+from app.db.init_db import upgrade_db
+from app.models import Patient, PatientNote
+from app.utils.note_classifier import SEED_EXAMPLES, NoteClassifier
+
+
+def test_classifier(tmp_path):
+    classifier = NoteClassifier.fit(SEED_EXAMPLES)
+    texts = [
+        "Potassium 3.1 mmol/L, repeat basic metabolic panel in the morning",
+        "MRI of the lumbar spine: impression mild disc bulge",
+        "Thank you for this referral, recommendations below",
+        "",
+        "Lorem ipsum dolor",
+    ]
+    assert classifier.predict(texts, min_score=0.2) == [
+        "lab",
+        "imaging",
+        "consult",
+        None,
+        None,
+    ]
+    scores = classifier.scores(texts)
+    assert scores.shape == (5, len(SEED_EXAMPLES))
+    assert scores.max() <= 1.0 + 1e-6
+
+    # A saved model predicts the same
+    classifier.save(tmp_path / "model.npz")
+    loaded = NoteClassifier.load(tmp_path / "model.npz")
+    assert loaded.labels == classifier.labels
+    assert loaded.predict(texts, min_score=0.2) == classifier.predict(texts, 0.2)
+
+
+@pytest.mark.asyncio
+async def test_backfill_note_types(tmp_path):
+    engine = create_db_engine(f"sqlite+aiosqlite:///{tmp_path}/backfill.db")
+    await upgrade_db(engine)
+    contents = [
+        ("Chest x-ray: no acute findings", "general"),
+        ("Hello", "general"),
+        ("Discharged home in stable condition", None),
+        ("CBC and basic metabolic panel reviewed", "progress"),
+    ] * 3
+    async with AsyncSessionLocal(bind=engine) as db:
+        db.add(
+            Patient(
+                name="Backfill Patient",
+                date_of_birth=date(1955, 5, 5),
+                medical_record_number="MRNBACKFILL",
+            )
+        )
+        await db.commit()
+        await db.execute(
+            insert(PatientNote),
+            [
+                {"patient_id": 1, "content": content, "note_type": note_type}
+                for content, note_type in contents
+            ],
+        )
+        await db.commit()
+
+    async def note_types():
+        async with AsyncSessionLocal(bind=engine) as db:
+            result = await db.scalars(
+                select(PatientNote.note_type).order_by(PatientNote.id)
+            )
+            return list(result)
+
+    # Only untyped notes, a few at a time; types set by hand are kept
+    assert await backfill_note_types(engine, chunk_size=5) == (9, 6)
+    assert await note_types() == ["imaging", "general", "discharge", "progress"] * 3
+    # Nothing left to change on a second run
+    assert await backfill_note_types(engine, chunk_size=5) == (3, 0)
+
+    assert await backfill_note_types(engine, chunk_size=5, reclassify_all=True) == (
+        12,
+        3,
+    )
+    assert await note_types() == ["imaging", "general", "discharge", "lab"] * 3
+    await engine.dispose()
@@ -0,0 +1,132 @@
+from datetime import date
+
+import numpy as np
+import pytest
+from sqlalchemy import delete, insert
+
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal, create_db_engine
+from app.db.init_db import upgrade_db
+from app.models import Patient, PatientNote
+from app.utils import note_index
+from app.utils.note_embeddings import HashedNgramEmbedder
+from app.utils.note_index import NoteVectorIndex
+
+
+def _unit_vectors(count, dim, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_search_matches_brute_force(monkeypatch):
+    monkeypatch.setattr(note_index, "SEARCH_BLOCK_ROWS", 7)
+    vectors = _unit_vectors(100, 16)
+    index = NoteVectorIndex(16, "test")
+    note_ids = list(range(1000, 1100))
+    index.add(note_ids, [i % 3 for i in range(100)], vectors)
+    index.remove([1000, 1050, 1099, 4242])
+    assert len(index) == 97
+
+    kept = [i for i in range(100) if note_ids[i] not in (1000, 1050, 1099)]
+    queries = _unit_vectors(4, 16, seed=1)
+    results = index.search(queries, 5, exclude=[1001])
+    for query, hits in zip(queries, results):
+        expected = sorted(
+            (i for i in kept if i != 1), key=lambda i: -float(vectors[i] @ query)
+        )[:5]
+        assert [id for id, _ in hits] == [note_ids[i] for i in expected]
+        assert [score for _, score in hits] == sorted(
+            (score for _, score in hits), reverse=True
+        )
+
+    hits = index.search(queries[:1], 50, patient_id=2)[0]
+    assert len(hits) == len([i for i in kept if i % 3 == 2])
+    assert all((id - 1000) % 3 == 2 for id, _ in hits)
+    assert index.remove_patient(2) == len(hits)
+    assert index.search(queries[:1], 5, patient_id=2) == [[]]
+
+    # Similar wording embeds close together
+    embedder = HashedNgramEmbedder(256)
+    a, b, c = embedder.embed(
+        ["haemoglobin low, anaemia", "hemoglobin low, anemia", "ankle sprain"]
+    )
+    assert a @ b > 0.5 > a @ c
+    assert not embedder.embed([""]).any()
+
+
+def test_index_persists(tmp_path):
+    path = tmp_path / "index"
+    vectors = _unit_vectors(3000, 8)
+    index = NoteVectorIndex(8, "test", path=str(path))
+    # Past the initial capacity, so the files are grown
+    index.add(list(range(1, 3001)), [1] * 3000, vectors)
+    index.remove([1, 2])
+
+    reopened = NoteVectorIndex(8, "test", path=str(path))
+    assert isinstance(reopened._vectors, np.memmap)
+    assert sorted(reopened.note_ids()) == list(range(3, 3001))
+    assert np.array_equal(reopened.vector(3000), vectors[2999])
+    assert reopened.search(vectors[9:10], 1) == index.search(vectors[9:10], 1)
+
+    # Vectors of another embedder or size are not reused
+    assert len(NoteVectorIndex(16, "test", path=str(path))) == 0
+
+
+@pytest.mark.asyncio
+async def test_sync_note_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "NOTE_INDEX_PATH", str(tmp_path / "index"))
+    monkeypatch.setattr(settings, "NOTE_INDEX_SYNC_CHUNK_SIZE", 4)
+    engine = create_db_engine(f"sqlite+aiosqlite:///{tmp_path}/sync.db")
+    await upgrade_db(engine)
+    async with AsyncSessionLocal(bind=engine) as db:
+        db.add(
+            Patient(
+                name="Sync Patient",
+                date_of_birth=date(1980, 8, 8),
+                medical_record_number="MRNSYNC",
+            )
+        )
+        await db.commit()
+        await db.execute(
+            insert(PatientNote),
+            [{"patient_id": 1, "content": f"Sync note {i}"} for i in range(10)],
+        )
+        await db.commit()
+
+    embedded = []
+    embed = HashedNgramEmbedder.embed
+
+    def counting_embed(self, texts):
+        embedded.extend(texts)
+        return embed(self, texts)
+
+    monkeypatch.setattr(HashedNgramEmbedder, "embed", counting_embed)
+    try:
+        await note_index.sync_note_index(engine)
+        assert len(embedded) == 10
+        # Restarted, with a note deleted and one added meanwhile
+        note_index.close_note_index()
+        async with AsyncSessionLocal(bind=engine) as db:
+            await db.execute(delete(PatientNote).where(PatientNote.id == 3))
+            await db.execute(
+                insert(PatientNote), [{"patient_id": 1, "content": "Added later"}]
+            )
+            await db.commit()
+        embedded.clear()
+        await note_index.sync_note_index(engine)
+        assert embedded == ["Added later"]
+        assert sorted(note_index.get_note_index().note_ids()) == [
+            1,
+            2,
+            4,
+            5,
+            6,
+            7,
+            8,
+            9,
+            10,
+            11,
+        ]
+    finally:
+        note_index.close_note_index()
+        await engine.dispose()
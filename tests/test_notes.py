@@ -1,5 +1,3 @@
-
-
 def test_create_note(client):
     # First create a patient
     patient_response = client.post(
@@ -85,3 +83,897 @@ def test_list_patient_notes(client):
     data = response.json()
     assert "notes" in data
     assert "total" in data
+
+
+def test_list_patient_notes_without_total(client):
+    patient_response = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Test Patient 4",
+            "date_of_birth": "1980-10-10",
+            "medical_record_number": "MRNTEST004",
+        },
+    )
+    patient_id = patient_response.json()["id"]
+
+    response = client.get(
+        f"/api/v1/patients/{patient_id}/notes", params={"include_total": "false"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] is None
+    assert data["pages"] is None
+
+
+def test_search_notes(client):
+    patient_ids = []
+    for i in range(2):
+        patient_response = client.post(
+            "/api/v1/patients/",
+            json={
+                "name": f"Search Patient {i}",
+                "date_of_birth": "1980-10-10",
+                "medical_record_number": f"MRNNOTESEARCH{i}",
+            },
+        )
+        patient_ids.append(patient_response.json()["id"])
+
+    contents = [
+        (
+            patient_ids[0],
+            "Persistent cough and mild fever, chest x-ray ordered.",
+            "admission",
+        ),
+        (patient_ids[0], "Coughing has resolved. Discharge planned.", "progress"),
+        (patient_ids[1], "Routine blood panel within normal limits.", "lab"),
+    ]
+    note_ids = []
+    for patient_id, content, note_type in contents:
+        response = client.post(
+            f"/api/v1/patients/{patient_id}/notes",
+            json={"patient_id": patient_id, "content": content, "note_type": note_type},
+        )
+        note_ids.append(response.json()["id"])
+
+    # Stemmed match across both cough notes, with highlighted snippets
+    data = client.get("/api/v1/notes/search", params={"q": "cough"}).json()
+    assert data["total"] == 2
+    assert {hit["id"] for hit in data["results"]} == set(note_ids[:2])
+    assert all("<mark>" in hit["snippet"] for hit in data["results"])
+
+    # Snippets are HTML, with the note content escaped
+    response = client.post(
+        f"/api/v1/patients/{patient_ids[1]}/notes",
+        json={
+            "patient_id": patient_ids[1],
+            "content": "Wheezing <script>alert(1)</script> & stridor",
+        },
+    )
+    data = client.get("/api/v1/notes/search", params={"q": "wheezing"}).json()
+    assert data["results"][0]["snippet"] == (
+        "<mark>Wheezing</mark> &lt;script&gt;alert(1)&lt;/script&gt; &amp; stridor"
+    )
+    client.delete(f"/api/v1/patients/{patient_ids[1]}/notes/{response.json()['id']}")
+
+    # Filters narrow the matches
+    data = client.get(
+        "/api/v1/notes/search", params={"q": "cough", "note_type": "progress"}
+    ).json()
+    assert [hit["id"] for hit in data["results"]] == [note_ids[1]]
+    data = client.get(
+        "/api/v1/notes/search", params={"q": "cough", "patient_id": patient_ids[1]}
+    ).json()
+    assert data["results"] == []
+
+    # The index follows deletes
+    client.delete(f"/api/v1/patients/{patient_ids[0]}/notes/{note_ids[0]}")
+    data = client.get("/api/v1/notes/search", params={"q": "fever"}).json()
+    assert data["results"] == []
+
+
+def test_create_notes_batch(client):
+    import json
+
+    patient_ids = []
+    for i in range(2):
+        patient_response = client.post(
+            "/api/v1/patients/",
+            json={
+                "name": f"Batch Patient {i}",
+                "date_of_birth": "1980-10-10",
+                "medical_record_number": f"MRNBATCH{i}",
+            },
+        )
+        patient_ids.append(patient_response.json()["id"])
+
+    notes = [
+        {"patient_id": patient_ids[0], "content": "First"},
+        {"patient_id": 999999, "content": "Unknown patient"},
+        {
+            "patient_id": patient_ids[1],
+            "content": "Second",
+            "timestamp": "2024-01-15T10:30:00",
+        },
+        {"patient_id": patient_ids[1]},
+        {"patient_id": patient_ids[0], "content": "Third", "note_type": "lab"},
+    ]
+    response = client.post("/api/v1/notes/batch", json=notes)
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["index"] for item in data["created"]] == [0, 2, 4]
+    assert sorted(item["index"] for item in data["failed"]) == [1, 3]
+
+    # Ids line up with the submitted notes
+    for item in data["created"]:
+        note = notes[item["index"]]
+        response = client.get(
+            f"/api/v1/patients/{note['patient_id']}/notes/{item['id']}"
+        )
+        assert response.json()["content"] == note["content"]
+
+    # The same notes as an NDJSON stream
+    body = "\n".join(json.dumps(note) for note in notes)
+    response = client.post(
+        "/api/v1/notes/batch",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    data = response.json()
+    assert [item["index"] for item in data["created"]] == [0, 2, 4]
+    assert sorted(item["index"] for item in data["failed"]) == [1, 3]
+
+
+def test_create_notes_batch_limits(client, monkeypatch):
+    import json
+
+    from app.core.config import settings
+    from app.utils import ingest
+
+    patient_response = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Batch Limits Patient",
+            "date_of_birth": "1980-10-10",
+            "medical_record_number": "MRNBATCHLIMITS",
+        },
+    )
+    patient_id = patient_response.json()["id"]
+    notes = [{"patient_id": patient_id, "content": f"Note {i}"} for i in range(3)]
+
+    # A stream that turns unreadable keeps the notes before it and reports it
+    monkeypatch.setattr(ingest, "MAX_LINE_CHARS", 100)
+    body = "\n".join(json.dumps(note) for note in notes[:2]) + "\n" + "x" * 200
+    response = client.post(
+        "/api/v1/notes/batch",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["index"] for item in data["created"]] == [0, 1]
+    assert [item["index"] for item in data["failed"]] == [2]
+    assert "longer than" in data["failed"][0]["errors"][0]
+
+    # JSON arrays over the cap are refused, and nothing is created
+    monkeypatch.setattr(settings, "NOTE_BATCH_MAX_ITEMS", 2)
+    response = client.post("/api/v1/notes/batch", json=notes)
+    assert response.status_code == 413
+    response = client.post("/api/v1/notes/batch", json=notes[:2])
+    assert len(response.json()["created"]) == 2
+    notes_response = client.get(f"/api/v1/patients/{patient_id}/notes")
+    assert notes_response.json()["total"] == 4
+
+    for body in ('{"patient_id": 1}', "[{}, ", "[{}] []"):
+        response = client.post(
+            "/api/v1/notes/batch",
+            content=body,
+            headers={"Content-Type": "application/json"},
+        )
+        assert response.status_code == 400
+
+
+def test_upload_note(client, monkeypatch):
+    from app.core.config import settings
+
+    patient_response = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Upload Patient",
+            "date_of_birth": "1975-03-09",
+            "medical_record_number": "MRNUPLOAD01",
+        },
+    )
+    patient_id = patient_response.json()["id"]
+    url = f"/api/v1/patients/{patient_id}/notes/upload"
+
+    # UTF-8, declared charset, and undeclared Windows-1252
+    response = client.post(
+        url, files={"file": ("note.txt", "Café visit".encode(), "text/plain")}
+    )
+    assert response.status_code == 200
+    assert response.json()["content"] == "Café visit"
+    response = client.post(
+        url,
+        files={
+            "file": (
+                "note.txt",
+                "Naïve".encode("utf-16"),
+                "text/plain; charset=utf-16",
+            )
+        },
+    )
+    assert response.json()["content"] == "Naïve"
+    response = client.post(
+        url, files={"file": ("note.txt", "Résumé".encode("cp1252"), "text/plain")}
+    )
+    assert response.json()["content"] == "Résumé"
+
+    # Binary content is rejected rather than failing to decode
+    response = client.post(
+        url, files={"file": ("scan.pdf", b"%PDF-1.7", "application/pdf")}
+    )
+    assert response.status_code == 415
+    response = client.post(
+        url, files={"file": ("note.txt", b"\x00\x01\x02", "text/plain")}
+    )
+    assert response.status_code == 415
+
+    # Oversized files are rejected by the handler and, well past the limit,
+    # by the middleware before the body is parsed
+    monkeypatch.setattr(settings, "MAX_UPLOAD_BYTES", 1024)
+    response = client.post(url, files={"file": ("note.txt", b"a" * 2048, "text/plain")})
+    assert response.status_code == 413
+    response = client.post(
+        url, files={"file": ("note.txt", b"a" * 200_000, "text/plain")}
+    )
+    assert response.status_code == 413
+
+
+def test_patient_summary_cache(client):
+    from app.crud.summary import summary_cache
+
+    patient_response = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Summary Patient",
+            "date_of_birth": "1960-07-21",
+            "medical_record_number": "MRNSUMMARY1",
+        },
+    )
+    patient_id = patient_response.json()["id"]
+    url = f"/api/v1/patients/{patient_id}/summary"
+
+    first = client.get(url).json()
+    assert first["cached"] is False
+    assert first["summary"] == "No clinical notes available for this patient."
+    second = client.get(url).json()
+    assert second["cached"] is True
+    assert second["generated_at"] == first["generated_at"]
+    assert second["cache_age_seconds"] >= 0
+
+    # A new note regenerates the summary
+    note_response = client.post(
+        f"/api/v1/patients/{patient_id}/notes",
+        json={"patient_id": patient_id, "content": "Blood pressure stable"},
+    )
+    note_id = note_response.json()["id"]
+    data = client.get(url).json()
+    assert data["cached"] is False
+    assert "Blood pressure stable" in data["summary"]
+
+    # Served from the summaries table once the in-process cache is gone
+    summary_cache.clear()
+    data = client.get(url).json()
+    assert data["cached"] is True
+    assert "Blood pressure stable" in data["summary"]
+
+    # Patient details are part of the summary too
+    client.put(f"/api/v1/patients/{patient_id}", json={"name": "Renamed Patient"})
+    data = client.get(url).json()
+    assert data["cached"] is False
+    assert "Renamed Patient" in data["patient_info"]
+
+    client.delete(f"/api/v1/patients/{patient_id}/notes/{note_id}")
+    data = client.get(url).json()
+    assert data["cached"] is False
+    assert data["summary"] == "No clinical notes available for this patient."
+
+    assert client.get("/api/v1/patients/999999/summary").status_code == 404
+
+    # The stored summary goes with the patient
+    assert client.delete(f"/api/v1/patients/{patient_id}").status_code == 200
+    assert client.get(url).status_code == 404
+
+
+def test_stream_patient_summary(client):
+    patient_response = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Stream Patient",
+            "date_of_birth": "1948-11-30",
+            "medical_record_number": "MRNSTREAM01",
+        },
+    )
+    patient_id = patient_response.json()["id"]
+    url = f"/api/v1/patients/{patient_id}/summary/stream"
+
+    def read_events(response):
+        events = []
+        for block in response.text.strip("\n").split("\n\n"):
+            lines = block.split("\n")
+            event = lines[0].removeprefix("event: ")
+            data = "\n".join(line.removeprefix("data: ") for line in lines[1:])
+            events.append((event, data))
+        return events
+
+    response = client.get(url)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert [event for event, _ in read_events(response)] == [
+        "patient_info",
+        "section",
+        "done",
+    ]
+
+    # Written out of order; the stream follows the timestamps
+    for day in (3, 1, 2):
+        client.post(
+            f"/api/v1/patients/{patient_id}/notes",
+            json={
+                "patient_id": patient_id,
+                "content": f"Visit on day {day}",
+                "timestamp": f"2024-02-0{day}T09:00:00",
+            },
+        )
+    events = read_events(client.get(url))
+    assert events[-1] == ("done", "")
+    timeline = [data for event, data in events if event == "timeline"]
+    assert [line[-14:] for line in timeline] == [
+        "Visit on day 1",
+        "Visit on day 2",
+        "Visit on day 3",
+    ]
+
+    # The streamed sections add up to the regular summary
+    sections = [data for event, data in events if event == "section"]
+    streamed = "\n\n".join(sections) + "\n" + "\n".join(timeline)
+    assert (
+        streamed
+        == client.get(f"/api/v1/patients/{patient_id}/summary").json()["summary"]
+    )
+
+    assert client.get("/api/v1/patients/999999/summary/stream").status_code == 404
+
+
+def test_stream_patient_summary_with_model_backend(client, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "LLM_BACKEND", "fake")
+    patient_id = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Model Stream Patient",
+            "date_of_birth": "1948-11-30",
+            "medical_record_number": "MRNSTREAM02",
+        },
+    ).json()["id"]
+    client.post(
+        f"/api/v1/patients/{patient_id}/notes",
+        json={"patient_id": patient_id, "content": "Seen for a cough"},
+    )
+
+    # The generated summary, not the mock's text, and generated once
+    response = client.get(f"/api/v1/patients/{patient_id}/summary/stream")
+    blocks = response.text.strip("\n").split("\n\n")
+    assert [block.split("\n")[0] for block in blocks] == [
+        "event: patient_info",
+        "event: section",
+        "event: done",
+    ]
+    streamed = "\n".join(
+        line.removeprefix("data: ") for line in blocks[1].split("\n")[1:]
+    )
+    summary = client.get(f"/api/v1/patients/{patient_id}/summary").json()
+    assert summary["cached"]
+    assert streamed == summary["summary"]
+    assert "Seen for a cough" in streamed
+    assert "Chief Complaints:\n- Based on clinical notes" not in streamed
+
+    assert client.get("/api/v1/patients/999999/summary/stream").status_code == 404
+
+
+def test_note_round_trips(client, query_counter):
+    patient_response = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Round Trip Patient",
+            "date_of_birth": "1982-04-12",
+            "medical_record_number": "MRNTRIPS001",
+        },
+    )
+    patient_id = patient_response.json()["id"]
+    notes_url = f"/api/v1/patients/{patient_id}/notes"
+
+    # INSERT ... SELECT WHERE EXISTS, plus dropping the cached summary and
+    # bumping the notes version
+    query_counter.clear()
+    response = client.post(
+        notes_url, json={"patient_id": patient_id, "content": "Follow-up"}
+    )
+    assert response.status_code == 200
+    note_id = response.json()["id"]
+    assert len(query_counter) == 3
+
+    query_counter.clear()
+    assert client.get(f"{notes_url}/{note_id}").status_code == 200
+    assert len(query_counter) == 1
+
+    # Notes version probe, which is also the existence check, plus the page
+    query_counter.clear()
+    client.get(notes_url, params={"include_total": False})
+    assert len(query_counter) == 2
+
+    # Misses spend one EXISTS to pick the right 404
+    query_counter.clear()
+    response = client.get(f"{notes_url}/{note_id + 1}")
+    assert response.json()["detail"] == "Note not found for this patient"
+    assert len(query_counter) == 2
+    response = client.get(f"/api/v1/patients/999999/notes/{note_id}")
+    assert response.json()["detail"] == "Patient not found"
+    response = client.post(
+        "/api/v1/patients/999999/notes",
+        json={"patient_id": 999999, "content": "Orphan"},
+    )
+    assert response.status_code == 404
+
+    query_counter.clear()
+    assert client.delete(f"{notes_url}/{note_id}").status_code == 200
+    assert len(query_counter) == 3
+    assert client.delete(f"{notes_url}/{note_id}").status_code == 404
+
+    # Children are deleted with one statement per relationship
+    query_counter.clear()
+    assert client.delete(f"/api/v1/patients/{patient_id}").status_code == 200
+    assert len(query_counter) == 4
+    assert client.get(f"/api/v1/patients/{patient_id}").status_code == 404
+
+
+def test_conditional_requests(client, query_budget):
+    response = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Conditional Patient",
+            "date_of_birth": "1975-05-05",
+            "medical_record_number": "MRNETAG001",
+        },
+    )
+    assert response.headers["Cache-Control"] == "no-store"
+    patient_id = response.json()["id"]
+    patient_url = f"/api/v1/patients/{patient_id}"
+    notes_url = f"{patient_url}/notes"
+
+    response = client.get(patient_url)
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    etag = response.headers["ETag"]
+    # A matching validator costs one probe and no body
+    with query_budget(1):
+        response = client.get(patient_url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    client.put(patient_url, json={"name": "Conditional Two"})
+    response = client.get(patient_url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    # Updates within the same second still change it
+    etag = response.headers["ETag"]
+    client.put(patient_url, json={"name": "Conditional Three"})
+    response = client.get(patient_url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Conditional Three"
+    etag = response.headers["ETag"]
+    assert (
+        client.get(
+            "/api/v1/patients/999999", headers={"If-None-Match": etag}
+        ).status_code
+        == 404
+    )
+
+    note_id = client.post(
+        notes_url, json={"patient_id": patient_id, "content": "First"}
+    ).json()["id"]
+    etag = client.get(f"{notes_url}/{note_id}").headers["ETag"]
+    with query_budget(1):
+        response = client.get(
+            f"{notes_url}/{note_id}", headers={"If-None-Match": f'"x", {etag}'}
+        )
+    assert response.status_code == 304
+
+    # Listings are versioned by the patient's notes, whatever the page
+    etag = client.get(notes_url).headers["ETag"]
+    with query_budget(1):
+        response = client.get(notes_url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    client.post(notes_url, json={"patient_id": patient_id, "content": "Second"})
+    response = client.get(notes_url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["total"] == 2
+    new_etag = response.headers["ETag"]
+    client.delete(f"{notes_url}/{note_id}")
+    assert client.get(notes_url).headers["ETag"] not in {etag, new_etag}
+
+
+def test_note_writes_keep_patient_etag(client):
+    patient_id = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Unchanged Patient",
+            "date_of_birth": "1975-05-05",
+            "medical_record_number": "MRNETAG002",
+        },
+    ).json()["id"]
+    patient_url = f"/api/v1/patients/{patient_id}"
+    etag = client.get(patient_url).headers["ETag"]
+
+    note_id = client.post(
+        f"{patient_url}/notes", json={"patient_id": patient_id, "content": "A note"}
+    ).json()["id"]
+    client.delete(f"{patient_url}/notes/{note_id}")
+    # The notes changed, the patient did not
+    assert client.get(patient_url).headers["ETag"] == etag
+
+
+def test_list_serialisation_matches_schema(client):
+    from datetime import datetime, timezone
+    from app import schemas
+    from app.utils.serialization import FastJSONResponse
+
+    patient_id = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Serialised Patient",
+            "date_of_birth": "1969-07-20",
+            "medical_record_number": "MRNJSON001",
+        },
+    ).json()["id"]
+    for content in ("First", "Second with ünïcode"):
+        client.post(
+            f"/api/v1/patients/{patient_id}/notes",
+            json={
+                "patient_id": patient_id,
+                "content": content,
+                "timestamp": "2024-03-01T12:30:45.123456Z",
+            },
+        )
+
+    # The fast path writes exactly what the response schemas would
+    for url, schema in (
+        (f"/api/v1/patients/{patient_id}/notes", schemas.PaginatedNotes),
+        ("/api/v1/patients/", schemas.PaginatedPatients),
+    ):
+        response = client.get(url, params={"limit": 1})
+        assert response.headers["content-type"] == "application/json"
+        expected = schema.model_validate_json(response.content).model_dump_json()
+        assert response.content == expected.encode()
+
+    # Including time zone aware datetimes, as PostgreSQL returns them
+    note = schemas.PatientNote(
+        id=1,
+        patient_id=patient_id,
+        content="Aware",
+        timestamp=datetime(2024, 3, 1, 12, 30, 45, 123456, tzinfo=timezone.utc),
+        note_type="general",
+        created_at=datetime(2024, 3, 1, tzinfo=timezone.utc),
+    )
+    body = FastJSONResponse({"note": note.model_dump()}).body
+    assert body == b'{"note":' + note.model_dump_json().encode() + b"}"
+
+
+def test_list_notes_projection(client, query_counter):
+    patient_id = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Projected Patient",
+            "date_of_birth": "1975-05-05",
+            "medical_record_number": "MRNPROJ001",
+        },
+    ).json()["id"]
+    for i in range(3):
+        client.post(
+            f"/api/v1/patients/{patient_id}/notes",
+            json={
+                "patient_id": patient_id,
+                "content": f"Note {i} " + "x" * 1000,
+                "note_type": "progress",
+            },
+        )
+    url = f"/api/v1/patients/{patient_id}/notes"
+
+    # Only the requested fields, plus id and the default timestamp sort key
+    response = client.get(url, params={"fields": "note_type"})
+    assert response.status_code == 200
+    notes = response.json()["notes"]
+    assert len(notes) == 3
+    assert all(set(note) == {"id", "timestamp", "note_type"} for note in notes)
+
+    # Cursors still work on a projection with another sort key
+    response = client.get(
+        url, params={"fields": "note_type", "sort_by": "id", "limit": 2}
+    )
+    page = response.json()
+    assert [set(note) for note in page["notes"]] == [{"id", "note_type"}] * 2
+    response = client.get(
+        url,
+        params={"fields": "note_type", "sort_by": "id", "cursor": page["next_cursor"]},
+    )
+    assert len(response.json()["notes"]) == 1
+
+    # Content is cut by the database, not after fetching it
+    query_counter.clear()
+    response = client.get(url, params={"fields": "content", "excerpt_len": 6})
+    assert [note["content"] for note in response.json()["notes"]] == [
+        "Note 2",
+        "Note 1",
+        "Note 0",
+    ]
+    assert any("substr" in statement.lower() for statement in query_counter)
+
+    # Excerpts apply to full listings too
+    response = client.get(url, params={"excerpt_len": 4})
+    notes = response.json()["notes"]
+    assert all(note["content"] == "Note" for note in notes)
+    assert "created_at" in notes[0]
+
+    response = client.get(url, params={"fields": "note_type,secret"})
+    assert response.status_code == 400
+    assert client.get(url, params={"excerpt_len": 0}).status_code == 422
+
+
+def test_summary_jobs(client, monkeypatch):
+    from sqlalchemy import event
+    from sqlalchemy.pool import Pool
+    from app.core.config import settings
+    from app.core.jobs import summary_jobs
+
+    patient_id = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Queued Patient",
+            "date_of_birth": "1975-05-05",
+            "medical_record_number": "MRNJOB001",
+        },
+    ).json()["id"]
+    client.post(
+        f"/api/v1/patients/{patient_id}/notes",
+        json={"patient_id": patient_id, "content": "Stable on current dose"},
+    )
+
+    # Take jobs off the workers to run them one at a time here; the shared
+    # in-memory test database cannot hold a worker and requests at once
+    submitted = []
+    monkeypatch.setattr(summary_jobs, "submit", lambda *job: submitted.append(job))
+
+    def run_submitted():
+        while submitted:
+            job_id, _, engine = submitted.pop(0)
+            client.portal.call(summary_jobs.run, job_id, engine)
+
+    response = client.post(f"/api/v1/patients/{patient_id}/summary:generate")
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    assert response.headers["Location"] == f"/api/v1/summary-jobs/{job['id']}"
+    # Asking again while it is pending returns the same job
+    again = client.post(f"/api/v1/patients/{patient_id}/summary:generate")
+    assert again.json()["id"] == job["id"]
+    assert len(submitted) == 1
+
+    # Count connections checked out while the (mock) model runs
+    checked_out = 0
+
+    def checkout(*args):
+        nonlocal checked_out
+        checked_out += 1
+
+    def checkin(*args):
+        nonlocal checked_out
+        checked_out -= 1
+
+    generate = summary_jobs.generate
+    during_generation = []
+
+    async def watched_generate(patient, notes):
+        during_generation.append(checked_out)
+        return await generate(patient, notes)
+
+    monkeypatch.setattr(summary_jobs, "generate", watched_generate)
+    monkeypatch.setattr(settings, "LLM_MOCK_LATENCY_SECONDS", 0.01)
+    event.listen(Pool, "checkout", checkout)
+    event.listen(Pool, "checkin", checkin)
+    try:
+        run_submitted()
+    finally:
+        event.remove(Pool, "checkout", checkout)
+        event.remove(Pool, "checkin", checkin)
+    assert during_generation == [0]
+
+    job = client.get(f"/api/v1/summary-jobs/{job['id']}").json()
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 1
+    assert "Stable on current dose" in job["summary"]
+    # The result is the summary the summary endpoint now serves from cache
+    data = client.get(f"/api/v1/patients/{patient_id}/summary").json()
+    assert data["cached"] is True
+    assert data["summary"] == job["summary"]
+
+    # A failing generator fails the job with its error
+    async def failing_generate(patient, notes):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(summary_jobs, "generate", failing_generate)
+    client.post(
+        f"/api/v1/patients/{patient_id}/notes",
+        json={"patient_id": patient_id, "content": "New symptoms"},
+    )
+    job = client.post(f"/api/v1/patients/{patient_id}/summary:generate").json()
+    run_submitted()
+    job = client.get(f"/api/v1/summary-jobs/{job['id']}").json()
+    assert job["status"] == "failed"
+    assert job["error"] == "RuntimeError: model unavailable"
+
+    assert client.post("/api/v1/patients/999999/summary:generate").status_code == 404
+    assert client.get("/api/v1/summary-jobs/999999").status_code == 404
+
+    # Without running workers nothing is queued
+    monkeypatch.setattr(summary_jobs, "_queue", None)
+    client.post(
+        f"/api/v1/patients/{patient_id}/notes",
+        json={"patient_id": patient_id, "content": "Another visit"},
+    )
+    response = client.post(f"/api/v1/patients/{patient_id}/summary:generate")
+    assert response.status_code == 503
+    assert submitted == []
+
+
+def test_note_classification(client):
+    patient_response = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Classified Patient",
+            "date_of_birth": "1962-07-21",
+            "medical_record_number": "MRNCLASS01",
+        },
+    )
+    patient_id = patient_response.json()["id"]
+    url = f"/api/v1/patients/{patient_id}/notes"
+
+    # Notes sent as general (the default) are typed from their content
+    response = client.post(
+        url,
+        json={
+            "patient_id": patient_id,
+            "content": "CBC: hemoglobin 11.2 g/dL, WBC 7.4, creatinine 1.1 mg/dL",
+        },
+    )
+    assert response.json()["note_type"] == "lab"
+    # A type chosen by the client is kept
+    response = client.post(
+        url,
+        json={
+            "patient_id": patient_id,
+            "content": "Chest x-ray: no acute cardiopulmonary findings",
+            "note_type": "progress",
+        },
+    )
+    assert response.json()["note_type"] == "progress"
+    # Even when that type is general
+    response = client.post(
+        url,
+        json={
+            "patient_id": patient_id,
+            "content": "CBC: hemoglobin 11.2 g/dL, WBC 7.4",
+            "note_type": "general",
+        },
+    )
+    assert response.json()["note_type"] == "general"
+    # Notes the model is unsure of stay general
+    response = client.post(url, json={"patient_id": patient_id, "content": "Hello"})
+    assert response.json()["note_type"] == "general"
+
+    response = client.post(
+        f"{url}/upload",
+        files={
+            "file": ("ct.txt", b"CT scan of the abdomen with contrast", "text/plain")
+        },
+    )
+    assert response.json()["note_type"] == "imaging"
+    response = client.post(
+        f"{url}/upload",
+        params={"note_type": "general"},
+        files={
+            "file": ("ct.txt", b"CT scan of the abdomen with contrast", "text/plain")
+        },
+    )
+    assert response.json()["note_type"] == "general"
+
+    response = client.post(
+        "/api/v1/notes/batch",
+        json=[
+            {
+                "patient_id": patient_id,
+                "content": "Discharged home in stable condition",
+            },
+            {"patient_id": patient_id, "content": "Procedure note: sterile fashion"},
+            {
+                "patient_id": patient_id,
+                "content": "Discharged home in stable condition",
+                "note_type": "general",
+            },
+        ],
+    )
+    types = [
+        client.get(f"{url}/{item['id']}").json()["note_type"]
+        for item in response.json()["created"]
+    ]
+    assert types == ["discharge", "procedure", "general"]
+
+
+def test_similar_notes(client):
+    patient_ids = []
+    for i in range(2):
+        response = client.post(
+            "/api/v1/patients/",
+            json={
+                "name": f"Similar Patient {i}",
+                "date_of_birth": "1970-02-02",
+                "medical_record_number": f"MRNSIMILAR{i}",
+            },
+        )
+        patient_ids.append(response.json()["id"])
+    contents = [
+        (0, "Hemoglobin 9.8 g/dL, iron studies ordered for anaemia"),
+        (0, "Knee sprain after a fall, ice and rest advised"),
+        (0, "Haemoglobin 10.4 g/dL, anaemia improving on iron"),
+        (1, "Hemoglobin 8.9 g/dL, iron deficiency anaemia confirmed"),
+        (1, "Routine dental review, no caries"),
+    ]
+    note_ids = []
+    for patient, content in contents:
+        response = client.post(
+            f"/api/v1/patients/{patient_ids[patient]}/notes",
+            json={"patient_id": patient_ids[patient], "content": content},
+        )
+        note_ids.append(response.json()["id"])
+    url = f"/api/v1/patients/{patient_ids[0]}/notes/{note_ids[0]}/similar"
+
+    # The patient's other notes, most similar first, without the note itself
+    results = client.get(url).json()["results"]
+    assert [note["id"] for note in results] == [note_ids[2], note_ids[1]]
+    assert results[0]["score"] > results[1]["score"]
+    assert results[0]["content"] == contents[2][1]
+
+    # Across all patients
+    results = client.get(url, params={"scope": "all", "k": 2}).json()["results"]
+    assert {note["id"] for note in results} == {note_ids[2], note_ids[3]}
+
+    # Free-text queries, optionally for one patient
+    response = client.get("/api/v1/notes/similar", params={"q": "dental caries"})
+    assert response.json()["results"][0]["id"] == note_ids[4]
+    response = client.get(
+        "/api/v1/notes/similar",
+        params={"q": "iron anaemia", "patient_id": patient_ids[1]},
+    )
+    assert [note["id"] for note in response.json()["results"]] == note_ids[3:]
+
+    # Deleted notes and patients drop out of the index
+    client.delete(f"/api/v1/patients/{patient_ids[0]}/notes/{note_ids[2]}")
+    results = client.get(url).json()["results"]
+    assert [note["id"] for note in results] == [note_ids[1]]
+    client.delete(f"/api/v1/patients/{patient_ids[1]}")
+    results = client.get(url, params={"scope": "all"}).json()["results"]
+    assert [note["id"] for note in results] == [note_ids[1]]
+
+    assert client.get(url, params={"scope": "ward"}).status_code == 400
+    missing = f"/api/v1/patients/{patient_ids[0]}/notes/{note_ids[4]}/similar"
+    assert client.get(missing).status_code == 404
@@ -1,5 +1,3 @@
-
-
 def test_create_patient(client):
     response = client.post(
         "/api/v1/patients/",
@@ -40,3 +38,362 @@ def test_list_patients(client):
     data = response.json()
     assert "patients" in data
     assert "total" in data
+
+
+def test_list_patients_with_cursor(client):
+    for i in range(5):
+        client.post(
+            "/api/v1/patients/",
+            json={
+                "name": f"Cursor Patient {i}",
+                "date_of_birth": "1990-01-01",
+                "medical_record_number": f"MRNCURSOR{i}",
+            },
+        )
+
+    # Walk all pages by name, newest name first
+    names, cursor = [], None
+    while True:
+        params = {"limit": 2, "sort_by": "name", "sort_order": "desc"}
+        if cursor:
+            params["cursor"] = cursor
+        data = client.get("/api/v1/patients/", params=params).json()
+        names.extend(p["name"] for p in data["patients"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert names == [f"Cursor Patient {i}" for i in reversed(range(5))]
+
+    # Sort keys outside the schema still make cursors, and are not returned
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 2, "sort_by": "created_at"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/v1/patients/", params=params)
+        assert response.status_code == 200
+        data = response.json()
+        assert all("created_at" not in p for p in data["patients"])
+        ids.extend(p["id"] for p in data["patients"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert len(ids) == len(set(ids)) == 5
+    response = client.get(
+        "/api/v1/patients/", params={"limit": 2, "skip": 2, "sort_by": "created_at"}
+    )
+    assert response.status_code == 200
+
+    # A cursor only works with the sort it was issued for
+    first = client.get("/api/v1/patients/", params={"limit": 2}).json()
+    response = client.get(
+        "/api/v1/patients/",
+        params={"limit": 2, "sort_by": "name", "cursor": first["next_cursor"]},
+    )
+    assert response.status_code == 400
+
+    response = client.get("/api/v1/patients/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_search_patients_ranked(client):
+    for i, name in enumerate(["Hannah Smith", "Ann Lee", "Joanna Annabel", "Bob"]):
+        client.post(
+            "/api/v1/patients/",
+            json={
+                "name": name,
+                "date_of_birth": "1990-01-01",
+                "medical_record_number": f"MRNSEARCH{i}",
+            },
+        )
+
+    # Substring matches, case-insensitive, ranked by relevance
+    data = client.get("/api/v1/patients/", params={"search": "ANN"}).json()
+    names = [p["name"] for p in data["patients"]]
+    assert sorted(names) == ["Ann Lee", "Hannah Smith", "Joanna Annabel"]
+    assert data["total"] == 3
+    assert data["next_cursor"] is None
+
+    # Short terms and wildcard characters are matched literally
+    data = client.get("/api/v1/patients/", params={"search": "bo"}).json()
+    assert [p["name"] for p in data["patients"]] == ["Bob"]
+    data = client.get("/api/v1/patients/", params={"search": "%"}).json()
+    assert data["patients"] == []
+
+    # Renamed patients are found under their new name only
+    bob_id = client.get("/api/v1/patients/", params={"search": "bob"}).json()[
+        "patients"
+    ][0]["id"]
+    client.put(f"/api/v1/patients/{bob_id}", json={"name": "Robert"})
+    assert (
+        client.get("/api/v1/patients/", params={"search": "bob"}).json()["patients"]
+        == []
+    )
+    assert (
+        client.get("/api/v1/patients/", params={"search": "robert"}).json()["total"]
+        == 1
+    )
+
+    response = client.get("/api/v1/patients/", params={"sort_by": "relevance"})
+    assert response.status_code == 400
+
+
+def test_bulk_import_patients(client):
+    import json
+
+    client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Existing Patient",
+            "date_of_birth": "1970-01-01",
+            "medical_record_number": "MRNBULK0",
+        },
+    )
+
+    rows = [
+        {
+            "name": "Bulk One",
+            "date_of_birth": "1990-01-01",
+            "medical_record_number": "MRNBULK1",
+        },
+        {
+            "name": "Bulk Zero",
+            "date_of_birth": "1990-01-01",
+            "medical_record_number": "MRNBULK0",
+        },
+        {"name": "No Birthday", "medical_record_number": "MRNBULK2"},
+        {
+            "name": "Bulk Two",
+            "date_of_birth": "1991-02-02",
+            "medical_record_number": "MRNBULK3",
+        },
+        {
+            "name": "Bulk One Again",
+            "date_of_birth": "1990-01-01",
+            "medical_record_number": "MRNBULK1",
+        },
+    ]
+    body = "\n".join(json.dumps(row) for row in rows) + "\nnot json\n"
+    response = client.post(
+        "/api/v1/patients/bulk",
+        params={"chunk_size": 2},
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    report = [json.loads(line) for line in response.text.splitlines()]
+    assert [entry.get("status") for entry in report[:-1]] == [
+        "accepted",
+        "duplicate",
+        "invalid",
+        "accepted",
+        "duplicate",
+        "invalid",
+    ]
+    assert report[-1]["summary"] == {"accepted": 2, "duplicate": 2, "invalid": 2}
+
+    # CSV with a quoted name containing a comma
+    body = (
+        "name,date_of_birth,medical_record_number\n"
+        '"Doe, Jane",1985-05-15,MRNBULK4\n'
+        "Short Row,1985-05-15\n"
+    )
+    response = client.post(
+        "/api/v1/patients/bulk", content=body, headers={"Content-Type": "text/csv"}
+    )
+    report = [json.loads(line) for line in response.text.splitlines()]
+    assert report[0]["status"] == "accepted"
+    assert report[1]["status"] == "invalid"
+    assert client.get(f"/api/v1/patients/{report[0]['id']}").json()["name"] == (
+        "Doe, Jane"
+    )
+
+    response = client.post(
+        "/api/v1/patients/bulk", content="{}", headers={"Content-Type": "text/plain"}
+    )
+    assert response.status_code == 415
+
+
+def test_patient_query_budgets(client, query_budget):
+    with query_budget(2):
+        response = client.post(
+            "/api/v1/patients/",
+            json={
+                "name": "Budget Patient",
+                "date_of_birth": "1977-02-14",
+                "medical_record_number": "MRNBUDGET01",
+            },
+        )
+    patient_id = response.json()["id"]
+
+    with query_budget(1):
+        client.get(f"/api/v1/patients/{patient_id}")
+    with query_budget(1):
+        client.put(f"/api/v1/patients/{patient_id}", json={"name": "Budget Two"})
+    # Page plus count
+    with query_budget(2):
+        client.get("/api/v1/patients/", params={"search": "Budget"})
+    with query_budget(1):
+        client.get("/api/v1/patients/", params={"include_total": False})
+    # A repeat view of an unchanged chart is one lookup
+    client.get(f"/api/v1/patients/{patient_id}/summary")
+    with query_budget(1):
+        client.get(f"/api/v1/patients/{patient_id}/summary")
+
+
+def test_read_replica_routing(client, monkeypatch, tmp_path):
+    import asyncio
+    from datetime import date
+    from app.db import base
+    from app.db.base import Base, create_db_engine
+    from app.db.replicas import STICKY_COOKIE, ReplicaRouter
+    from app.models.patient import Patient
+
+    # Two file databases stand in for replicas, each with its own patient
+    replicas = []
+    for name in ("replica_a", "replica_b"):
+        engine = create_db_engine(f"sqlite+aiosqlite:///{tmp_path}/{name}.db")
+
+        async def seed(engine=engine, name=name):
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(
+                    Patient.__table__.insert().values(
+                        name=name,
+                        date_of_birth=date(1980, 1, 1),
+                        medical_record_number=f"MRN{name.upper()}",
+                    )
+                )
+            await engine.dispose()
+
+        asyncio.run(seed())
+        replicas.append(engine)
+    # Unreachable: its directory does not exist
+    broken = create_db_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/replica.db")
+    router = ReplicaRouter([broken, *replicas], retry_seconds=60)
+    monkeypatch.setattr(base, "replica_router", router)
+
+    # Reads rotate over the healthy replicas, skipping the broken one
+    names = {client.get("/api/v1/patients/1").json()["name"] for _ in range(4)}
+    assert names == {"replica_a", "replica_b"}
+    assert router.candidates() and broken not in router.candidates()
+
+    # A write sets the sticky cookie, so the next read sees the primary
+    response = client.post(
+        "/api/v1/patients/",
+        json={
+            "name": "Primary Patient",
+            "date_of_birth": "1990-01-01",
+            "medical_record_number": "MRNPRIMARY",
+        },
+    )
+    assert STICKY_COOKIE in response.cookies
+    response = client.get(f"/api/v1/patients/{response.json()['id']}")
+    assert response.json()["name"] == "Primary Patient"
+
+    client.cookies.clear()
+    assert client.get("/api/v1/patients/1").json()["name"].startswith("replica_")
+
+
+def test_list_patients_with_notes(client, query_budget):
+    patient_ids = []
+    for i, note_count in enumerate((0, 2, 4)):
+        patient_id = client.post(
+            "/api/v1/patients/",
+            json={
+                "name": f"Dashboard Patient {i}",
+                "date_of_birth": "1980-10-10",
+                "medical_record_number": f"MRNDASH{i}",
+            },
+        ).json()["id"]
+        patient_ids.append(patient_id)
+        for n in range(note_count):
+            client.post(
+                f"/api/v1/patients/{patient_id}/notes",
+                json={
+                    "patient_id": patient_id,
+                    "content": f"Note {n}",
+                    "timestamp": f"2024-01-0{n + 1}T09:00:00Z",
+                },
+            )
+
+    # Count, page and one query for every patient's notes, however many
+    with query_budget(3):
+        response = client.get(
+            "/api/v1/patients/", params={"include": "notes", "notes_limit": 3}
+        )
+    assert response.status_code == 200
+    patients = {item["id"]: item for item in response.json()["patients"]}
+    assert patients[patient_ids[0]]["notes"] == []
+    assert [n["content"] for n in patients[patient_ids[1]]["notes"]] == [
+        "Note 1",
+        "Note 0",
+    ]
+    # Latest first, cut at notes_limit
+    assert [n["content"] for n in patients[patient_ids[2]]["notes"]] == [
+        "Note 3",
+        "Note 2",
+        "Note 1",
+    ]
+    assert all(
+        n["patient_id"] == patient_ids[2] for n in patients[patient_ids[2]]["notes"]
+    )
+
+    # Without include the listing is unchanged
+    response = client.get("/api/v1/patients/")
+    assert all("notes" not in item for item in response.json()["patients"])
+    response = client.get("/api/v1/patients/", params={"include": "visits"})
+    assert response.status_code == 400
+
+
+def test_batch_get(client, query_budget, monkeypatch):
+    from app.core.config import settings
+
+    patient_ids = []
+    note_ids = []
+    for i in range(3):
+        patient_id = client.post(
+            "/api/v1/patients/",
+            json={
+                "name": f"Batch Get Patient {i}",
+                "date_of_birth": "1980-10-10",
+                "medical_record_number": f"MRNBATCHGET{i}",
+            },
+        ).json()["id"]
+        patient_ids.append(patient_id)
+        note_ids.append(
+            client.post(
+                f"/api/v1/patients/{patient_id}/notes",
+                json={"patient_id": patient_id, "content": f"Note {i}"},
+            ).json()["id"]
+        )
+
+    # One query, in the requested order, with unknown ids reported
+    requested = [patient_ids[2], 999999, patient_ids[0]]
+    with query_budget(1):
+        response = client.get(
+            "/api/v1/patients:batchGet",
+            params={"ids": ",".join(map(str, requested))},
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert [p["id"] for p in data["patients"]] == [patient_ids[2], patient_ids[0]]
+    assert data["patients"][0]["name"] == "Batch Get Patient 2"
+    assert data["missing"] == [999999]
+
+    # Repeated parameters work too, and duplicates are returned once
+    with query_budget(1):
+        response = client.get(
+            "/api/v1/notes:batchGet",
+            params=[("ids", note_ids[1]), ("ids", note_ids[0]), ("ids", note_ids[1])],
+        )
+    data = response.json()
+    assert [n["content"] for n in data["notes"]] == ["Note 1", "Note 0"]
+    assert data["missing"] == []
+
+    assert (
+        client.get("/api/v1/notes:batchGet", params={"ids": "1,x"}).status_code == 400
+    )
+    monkeypatch.setattr(settings, "BATCH_GET_MAX_IDS", 2)
+    response = client.get("/api/v1/patients:batchGet", params={"ids": "1,2,3"})
+    assert response.status_code == 400
@@ -0,0 +1,122 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import update
+
+from app.core.jobs import SummaryJobQueue
+from app.crud.summary_job import summary_job
+from app.db.base import AsyncSessionLocal, create_db_engine
+from app.db.init_db import upgrade_db
+from app.models import Patient, SummaryJob
+from app.schemas import PatientSummary
+
+
+@pytest.mark.asyncio
+async def test_summary_jobs_run_by_priority_and_survive_restarts(tmp_path):
+    engine = create_db_engine(f"sqlite+aiosqlite:///{tmp_path}/jobs.db")
+    await upgrade_db(engine)
+    async with AsyncSessionLocal(bind=engine) as db:
+        db.add_all(
+            Patient(
+                name=f"Restart Patient {i}",
+                date_of_birth=date(1980, 1, 1),
+                medical_record_number=f"MRNRESTART{i}",
+            )
+            for i in range(4)
+        )
+        await db.commit()
+        jobs = [
+            await summary_job.create(db, patient_id=1, priority=0),
+            await summary_job.create(db, patient_id=2, priority=5),
+            await summary_job.create(db, patient_id=3, priority=0),
+            # Left running by a process that stopped long ago
+            await summary_job.create(db, patient_id=4, priority=1),
+        ]
+        await db.execute(
+            update(SummaryJob)
+            .where(SummaryJob.id == jobs[3].id)
+            .values(
+                status="running", started_at=datetime(2000, 1, 1, tzinfo=timezone.utc)
+            )
+        )
+        await db.commit()
+
+    order = []
+
+    async def generate(patient, notes):
+        order.append(patient.id)
+        return PatientSummary(patient_info="", summary="Done")
+
+    queue = SummaryJobQueue(workers=1, timeout_seconds=60, generate=generate)
+    queue.start()
+    try:
+        await queue.recover(engine)
+        await queue.join()
+    finally:
+        await queue.stop()
+
+    # Priority first, then submission order
+    assert order == [2, 4, 1, 3]
+    async with AsyncSessionLocal(bind=engine) as db:
+        for job in jobs:
+            job = await summary_job.get(db, id=job.id)
+            await db.refresh(job)
+            assert (job.status, job.summary) == ("succeeded", "Done")
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_one_active_summary_job_per_patient(tmp_path):
+    engine = create_db_engine(f"sqlite+aiosqlite:///{tmp_path}/active.db")
+    await upgrade_db(engine)
+    async with AsyncSessionLocal(bind=engine) as db:
+        db.add(
+            Patient(
+                name="Busy Patient",
+                date_of_birth=date(1980, 1, 1),
+                medical_record_number="MRNBUSY",
+            )
+        )
+        await db.commit()
+        job = await summary_job.create(db, patient_id=1)
+        # A second insert loses to the unique index rather than adding a job
+        assert await summary_job.create(db, patient_id=1, priority=5) is None
+        await summary_job.claim(db, id=job.id)
+        assert await summary_job.create(db, patient_id=1) is None
+        # Finished jobs do not count
+        await summary_job.finish(db, id=job.id, summary="Done")
+        assert await summary_job.create(db, patient_id=1) is not None
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_summary_job_for_deleted_patient(tmp_path):
+    from app import crud
+    from app.models import CachedSummary
+
+    engine = create_db_engine(f"sqlite+aiosqlite:///{tmp_path}/deleted.db")
+    await upgrade_db(engine)
+    async with AsyncSessionLocal(bind=engine) as db:
+        db.add(
+            Patient(
+                name="Departed Patient",
+                date_of_birth=date(1980, 1, 1),
+                medical_record_number="MRNGONE",
+            )
+        )
+        await db.commit()
+        job = await summary_job.create(db, patient_id=1)
+
+    async def generate(patient, notes):
+        # The patient is deleted while their summary is being written
+        async with AsyncSessionLocal(bind=engine) as db:
+            await crud.patient.remove(db, id=patient.id)
+        return PatientSummary(patient_info="", summary="Too late")
+
+    queue = SummaryJobQueue(workers=1, timeout_seconds=60, generate=generate)
+    await queue.run(job.id, engine)
+
+    async with AsyncSessionLocal(bind=engine) as db:
+        assert await db.get(CachedSummary, 1) is None
+        assert await summary_job.get(db, id=job.id) is None
+    await engine.dispose()